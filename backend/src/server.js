@@ -987,6 +987,13 @@ app.post(
   })
 );
 
+// Mesmas regras de escrita do backfill direto (tools/ml/backfill_lead_scores.py, DIRECT_MERGE_SQL):
+// lead ENVIADO mantem o status; lead ja mexido pelo CRM mantem status/score/motivos/diagnosticos;
+// score_meta e mesclado e recebe o profile_hash lido pelo rescore_worker.
+const SCORE_CRM_MANAGED_SQL = "l.score_meta ?| array['crm_manual_move', 'crm_rule_engine']";
+const SCORE_PROFILE_HASH_SQL =
+  "md5(json_build_array(l.nome, l.uf, l.cidade, l.segmento_interesse, l.orcamento_faixa, l.prazo_compra)::text)";
+
 app.post(
   "/leads/:id/score",
   asyncHandler(async (req, res) => {
@@ -1028,17 +1035,18 @@ app.post(
     const scoreProbability = toFiniteNumberOrNull(meta.probability_qualified);
 
     await query(
-      `UPDATE leads
-       SET score=$1,
-           status=$2,
-           score_motivos=$3,
-           score_engine=$4,
-           score_model_name=$5,
-           score_probability=$6,
-           score_scored_at=now(),
-           score_meta=$7,
-           updated_at=now()
-       WHERE id=$8`,
+      `UPDATE leads l
+       SET score = CASE WHEN ${SCORE_CRM_MANAGED_SQL} THEN l.score ELSE $1 END,
+           status = CASE WHEN l.status = 'ENVIADO' OR ${SCORE_CRM_MANAGED_SQL} THEN l.status ELSE $2 END,
+           score_motivos = CASE WHEN ${SCORE_CRM_MANAGED_SQL} THEN l.score_motivos ELSE $3::jsonb END,
+           score_engine = CASE WHEN ${SCORE_CRM_MANAGED_SQL} THEN l.score_engine ELSE $4 END,
+           score_model_name = CASE WHEN ${SCORE_CRM_MANAGED_SQL} THEN l.score_model_name ELSE $5 END,
+           score_probability = CASE WHEN ${SCORE_CRM_MANAGED_SQL} THEN l.score_probability ELSE $6::float8 END,
+           score_scored_at = now(),
+           score_meta = COALESCE(l.score_meta, '{}'::jsonb) || COALESCE($7::jsonb, '{}'::jsonb)
+                        || jsonb_build_object('profile_hash', ${SCORE_PROFILE_HASH_SQL}),
+           updated_at = now()
+       WHERE l.id = $8`,
       [
         scored.score,
         scored.status,
@@ -1062,6 +1070,9 @@ app.post(
     const diagnostics = serializeScoreDiagnostics(leadRows[0] || {});
     res.json({
       ...scored,
+      // score/status efetivamente gravados (podem ter sido mantidos pelas regras acima)
+      score: leadRows[0]?.score ?? scored.score,
+      status: leadRows[0]?.status ?? scored.status,
       diagnostics,
       meta: diagnostics
         ? {
@@ -1075,6 +1086,8 @@ app.post(
   })
 );
 
+// Conta registros brutos (duplicatas incluidas): e o mesmo universo percorrido por /leads/page,
+// que informa em raw_count/hidden_duplicates quantos registros da pagina ficaram ocultos.
 app.get(
   "/leads/count",
   asyncHandler(async (req, res) => {
@@ -1161,6 +1174,136 @@ app.get(
   })
 );
 
+// Paginacao por keyset (created_at, id) desc para listas grandes (painel admin).
+// O cursor e opaco (base64url) e carrega o created_at com microssegundos: o Date do JS
+// perderia precisao e repetiria/pularia leads com o mesmo milissegundo.
+// created_at aceita NULL: a chave e COALESCE(created_at, '-infinity') (NULLs no fim), a mesma do
+// backfill (idx_leads_created_at_keyset); o cursor de um lead sem created_at leva "-infinity".
+const LEADS_PAGE_MAX = 500;
+const LEAD_KEYSET_TS_SQL = "COALESCE(created_at, '-infinity'::timestamptz)";
+const LEAD_CURSOR_TS_SQL = `CASE WHEN created_at IS NULL THEN '-infinity'
+  ELSE to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') END`;
+
+function encodeLeadCursor(row) {
+  return Buffer.from(JSON.stringify([row.__cursor_ts, String(row.id)]), "utf8").toString("base64url");
+}
+
+function decodeLeadCursor(raw) {
+  if (!raw) return null;
+  try {
+    const [ts, id] = JSON.parse(Buffer.from(String(raw), "base64url").toString("utf8"));
+    if (typeof ts !== "string" || !parseLeadIds([id]).ids.length) return undefined;
+    return { ts, id };
+  } catch {
+    return undefined;
+  }
+}
+
+// Leads fora da pagina que podem ser duplicata (ou a versao mantida) de alguma linha dela:
+// mesma UF e updated_at/created_at dentro da janela de duplicidade em torno da pagina.
+const LEADS_DEDUPE_NEIGHBOURS_MAX = 2000;
+
+async function fetchLeadDedupeNeighbours(rows, filterWhere, filterParams) {
+  if (!rows.length) return [];
+  const windowMs = LEAD_DUPLICATE_WINDOW_MINUTES * 60 * 1000;
+  const stamps = rows.map(leadTimestampMs);
+  const ufs = [...new Set(rows.map((row) => normalizeIdentityToken(row.uf, 2)))];
+  const where = [...filterWhere];
+  const params = [...filterParams];
+  let i = params.length + 1;
+  where.push(`NOT (id = ANY($${i++}::uuid[]))`);
+  params.push(rows.map((row) => String(row.id)));
+  where.push(`upper(COALESCE(uf, '')) = ANY($${i++}::text[])`);
+  params.push(ufs);
+  where.push(`COALESCE(updated_at, created_at) BETWEEN $${i++}::timestamptz AND $${i++}::timestamptz`);
+  params.push(new Date(Math.min(...stamps) - windowMs).toISOString(), new Date(Math.max(...stamps) + windowMs).toISOString());
+  params.push(LEADS_DEDUPE_NEIGHBOURS_MAX);
+  const r = await query(`SELECT * FROM leads WHERE ${where.join(" AND ")} LIMIT $${i++}`, params);
+  return r.rows;
+}
+
+app.get(
+  "/leads/page",
+  asyncHandler(async (req, res) => {
+    const { status, minScore, uf, segment } = req.query;
+    const requestedSize = parseInt(String(req.query?.page_size ?? "50"), 10);
+    const pageSize = Number.isFinite(requestedSize) ? Math.max(1, Math.min(requestedSize, LEADS_PAGE_MAX)) : 50;
+    const after = decodeLeadCursor(req.query?.after);
+    const before = decodeLeadCursor(req.query?.before);
+    if (after === undefined || before === undefined || (after && before)) {
+      return res.status(400).json({ error: "cursor invalido (use after OU before de uma resposta anterior)" });
+    }
+
+    const where = [];
+    const params = [];
+    let i = 1;
+
+    if (status) {
+      where.push(`status=$${i++}`);
+      params.push(status);
+    }
+    if (uf) {
+      where.push(`uf=$${i++}`);
+      params.push(uf);
+    }
+    if (segment) {
+      where.push(`segmento_interesse=$${i++}`);
+      params.push(segment);
+    }
+    if (minScore) {
+      where.push(`score >= $${i++}`);
+      params.push(Number(minScore));
+    }
+
+    const filterWhere = [...where];
+    const filterParams = [...params];
+
+    // before: le para tras (ordem crescente) e inverte, para a pagina anterior ter o mesmo tamanho.
+    const cursor = after || before;
+    if (cursor) {
+      where.push(`(${LEAD_KEYSET_TS_SQL}, id) ${after ? "<" : ">"} ($${i++}::timestamptz, $${i++}::uuid)`);
+      params.push(cursor.ts, cursor.id);
+    }
+    const dir = before ? "ASC" : "DESC";
+    params.push(pageSize + 1);
+
+    const sql = `SELECT *, ${LEAD_CURSOR_TS_SQL} AS __cursor_ts
+                 FROM leads
+                 ${where.length ? "WHERE " + where.join(" AND ") : ""}
+                 ORDER BY ${LEAD_KEYSET_TS_SQL} ${dir}, id ${dir}
+                 LIMIT $${i++}`;
+
+    const r = await query(sql, params);
+    const hasMore = r.rows.length > pageSize;
+    const rows = r.rows.slice(0, pageSize);
+    if (before) rows.reverse();
+
+    const first = rows[0];
+    const last = rows[rows.length - 1];
+    const nextCursor = last && (before || hasMore) ? encodeLeadCursor(last) : null;
+    const prevCursor = first && (after || (before && hasMore)) ? encodeLeadCursor(first) : null;
+
+    // Cursores saem das linhas cruas; a deduplicacao (mesma do GET /leads) vale so para a exibicao.
+    // Os "vizinhos" (mesmos filtros, mesma UF, dentro da janela de duplicidade) entram na comparacao,
+    // entao duplicatas que caem em paginas diferentes tambem sao ocultadas.
+    const neighbours = await fetchLeadDedupeNeighbours(rows, filterWhere, filterParams);
+    const duplicateIds = new Set(
+      buildDuplicateLeadPairs([...rows, ...neighbours], LEAD_DUPLICATE_WINDOW_MINUTES).map((x) => String(x.dup_id))
+    );
+    const items = rows
+      .filter((row) => !duplicateIds.has(String(row.id)))
+      .map(({ __cursor_ts, ...row }) => serializeLead(row));
+    res.json({
+      items,
+      page_size: pageSize,
+      raw_count: rows.length,
+      hidden_duplicates: rows.length - items.length,
+      next_cursor: nextCursor,
+      prev_cursor: prevCursor,
+    });
+  })
+);
+
 app.post(
   "/leads/bulk-delete",
   asyncHandler(async (req, res) => {
@@ -2639,10 +2782,11 @@ app.get(
     const offsetParamIndex = i++;
     params.push(offset);
 
+    // cnpj (unico) desempata: paginas por limit/offset (exportacao do admin) nao repetem nem pulam parceiros.
     const sql = `SELECT *
                  FROM partners
                  ${where.length ? "WHERE " + where.join(" AND ") : ""}
-                 ORDER BY prioridade ASC, nome_fantasia ASC NULLS LAST
+                 ORDER BY prioridade ASC, nome_fantasia ASC NULLS LAST, cnpj ASC
                  LIMIT $${limitParamIndex}
                  OFFSET $${offsetParamIndex}`;
 
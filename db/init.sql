@@ -47,5 +47,7 @@ CREATE TABLE IF NOT EXISTS partners (
 
 CREATE INDEX IF NOT EXISTS idx_leads_score ON leads(score);
 CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status);
+CREATE INDEX IF NOT EXISTS idx_leads_created_at_keyset ON leads ((COALESCE(created_at, '-infinity'::timestamptz)) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_events_lead_id ON events(lead_id);
 CREATE INDEX IF NOT EXISTS idx_partners_uf_municipio ON partners(uf, municipio_cod);
 CREATE INDEX IF NOT EXISTS idx_partners_cnae_principal ON partners(cnae_principal);
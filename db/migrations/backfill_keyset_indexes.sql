@@ -0,0 +1,11 @@
+-- Indices para o backfill paginado por keyset (tools/ml/backfill_lead_scores.py)
+-- Pagina por (created_at, id) desc e agrega eventos apenas dos leads da pagina.
+-- created_at aceita NULL: a chave usa COALESCE(created_at, '-infinity'), com os NULL no fim.
+
+DROP INDEX IF EXISTS idx_leads_created_at_id;
+
+CREATE INDEX IF NOT EXISTS idx_leads_created_at_keyset
+  ON leads ((COALESCE(created_at, '-infinity'::timestamptz)) DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_events_lead_id
+  ON events(lead_id);
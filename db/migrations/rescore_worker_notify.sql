@@ -0,0 +1,20 @@
+-- Suporte ao worker de rescoring incremental (tools/ml/rescore_worker.py)
+-- Indices para o watermark e NOTIFY opcional para acordar o worker (--listen lead_changed)
+
+CREATE INDEX IF NOT EXISTS idx_events_ts
+  ON events(ts);
+
+CREATE INDEX IF NOT EXISTS idx_leads_updated_at
+  ON leads(updated_at);
+
+CREATE OR REPLACE FUNCTION notify_lead_changed() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('lead_changed', NEW.lead_id::text);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_events_notify_lead_changed ON events;
+CREATE TRIGGER trg_events_notify_lead_changed
+  AFTER INSERT ON events
+  FOR EACH ROW EXECUTE FUNCTION notify_lead_changed();
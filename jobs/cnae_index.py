@@ -0,0 +1,244 @@
+"""Indice CNAE compilado: subclasse -> classe -> grupo -> divisao (-> secao), com tags de segmento.
+
+Compilado a partir do lookup oficial de subclasses e do seed de CNAEs do MVP e salvo
+como arrays numpy (.npz, sem pickle): codigos inteiros ordenados, indices para o
+nivel de cima, descricoes num unico blob UTF-8 com offsets e o segmento/prioridade
+do seed por subclasse. Carrega em poucos milissegundos; o hash dos CSVs de origem
+vai junto, e `load_or_compile` recompila quando o lookup/seed mudam.
+
+O seed aceita codigos de qualquer nivel e faz casamento por prefixo:
+- 7 digitos (0152-1/02): a subclasse;
+- 4-5 digitos (0152-1 ou 0152): todas as subclasses da classe;
+- 3 digitos (015): grupo; 2 digitos (01): divisao;
+- datas do Excel (02/02/4930 = 4930-2/02) sao reparadas;
+- 6 digitos = subclasse que perdeu o zero a esquerda (mesmo zfill do job).
+Subclasse coberta por mais de um codigo fica com o mais especifico (e, no empate,
+a menor prioridade). O lookup so traz descricao de subclasse: classe/grupo/divisao
+guardam apenas codigo (e a divisao, a secao).
+"""
+
+import hashlib
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+INDEX_VERSION = 1
+# Excel converte "4930-2/02" em data: 02/02/4930 (DD/MM/AAAA = subclasse/digito/classe).
+_EXCEL_DATE_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+
+def parse_cnae_code(raw) -> str:
+    """Digitos do codigo CNAE (prefixo de 2 a 7 digitos); vazio se nao for um codigo valido."""
+    if raw is None or (isinstance(raw, float) and np.isnan(raw)):
+        return ""
+    s = str(raw).strip()
+    m = _EXCEL_DATE_RE.match(s)
+    if m:
+        sub, dv, classe = m.groups()
+        return classe + str(int(dv)) + sub.zfill(2)
+    digits = re.sub(r"[^0-9]", "", s)
+    if len(digits) == 6:
+        return digits.zfill(7)
+    return digits if 2 <= len(digits) <= 7 else ""
+
+
+def _source_hash(*paths) -> str:
+    h = hashlib.sha1(f"cnae-index-v{INDEX_VERSION}".encode())
+    for p in paths:
+        h.update(Path(p).read_bytes())
+    return h.hexdigest()
+
+
+def _pack_texts(texts: List[str]):
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+@dataclass(frozen=True)
+class CnaeIndex:
+    sub_code: np.ndarray        # int32, ordenado (0152102 -> 152102)
+    sub_class: np.ndarray       # int32 -> posicao em class_code
+    class_code: np.ndarray      # int32 (0152-1 -> 1521)
+    class_group: np.ndarray     # int32 -> posicao em group_code
+    group_code: np.ndarray      # int32 (015 -> 15)
+    group_division: np.ndarray  # int32 -> posicao em division_code
+    division_code: np.ndarray   # int32 (01 -> 1)
+    division_section: np.ndarray  # letra da secao (A..U)
+    desc_blob: np.ndarray       # uint8: descricoes UTF-8 concatenadas
+    desc_offsets: np.ndarray    # int32, len = subclasses + 1
+    segment_names: np.ndarray   # nomes dos segmentos do seed
+    sub_segment: np.ndarray     # int8 -> segment_names (-1 = fora do seed)
+    sub_priority: np.ndarray    # int8 (0 = fora do seed)
+    sub_seed_level: np.ndarray  # int8: digitos do codigo do seed que cobriu a subclasse (0 = nenhum)
+    source_hash: str = ""
+
+    # ---------- compilacao / IO ----------
+
+    @classmethod
+    def compile(cls, lookup_path, seed_path, sep=";") -> "CnaeIndex":
+        lookup = pd.read_csv(lookup_path, sep=sep, dtype=str)
+        if "subclasse_num7" not in lookup.columns:
+            raise ValueError("lookup precisa ter coluna subclasse_num7")
+        desc = lookup["subclasse_desc"] if "subclasse_desc" in lookup.columns else pd.Series(pd.NA, index=lookup.index)
+        if "denominacao" in lookup.columns:
+            desc = desc.fillna(lookup["denominacao"])
+        lk = pd.DataFrame({
+            "code": lookup["subclasse_num7"].astype(str).str.zfill(7),
+            "desc": desc.fillna(""),
+            "secao": lookup["secao"].fillna("") if "secao" in lookup.columns else "",
+        })
+        # mesma regra do to_dict legado: codigo repetido fica com a ultima linha
+        lk = lk.drop_duplicates("code", keep="last").sort_values("code", kind="stable").reset_index(drop=True)
+
+        sub_code = lk["code"].astype(np.int32).to_numpy()
+        class_code, sub_class = np.unique(sub_code // 100, return_inverse=True)
+        group_code, class_group = np.unique(class_code // 100, return_inverse=True)
+        division_code, group_division = np.unique(group_code // 10, return_inverse=True)
+        first_sub_of_division = np.searchsorted(sub_code // 100000, division_code)
+        division_section = lk["secao"].to_numpy(dtype=str)[first_sub_of_division]
+        desc_blob, desc_offsets = _pack_texts(lk["desc"].tolist())
+
+        seed = pd.read_csv(seed_path, sep=sep, dtype=str)
+        code_col = "subclasse_num7" if "subclasse_num7" in seed.columns else seed.columns[0]
+        seg_col = seed["segmento"].fillna("").str.strip().str.upper() if "segmento" in seed.columns else pd.Series("", index=seed.index)
+        prio_col = pd.to_numeric(seed["prioridade"], errors="coerce") if "prioridade" in seed.columns else pd.Series(np.nan, index=seed.index)
+        segment_names = sorted({s for s in seg_col if s})
+        seg_pos = {s: i for i, s in enumerate(segment_names)}
+
+        n = len(sub_code)
+        sub_segment = np.full(n, -1, dtype=np.int8)
+        sub_priority = np.zeros(n, dtype=np.int8)
+        sub_seed_level = np.zeros(n, dtype=np.int8)
+        for raw, seg, prio in zip(seed[code_col], seg_col, prio_col):
+            prefix = parse_cnae_code(raw)
+            lo, hi = _prefix_range(sub_code, prefix)
+            if lo == hi:
+                print(f"[cnae] codigo do seed fora do lookup (ignorado): {raw!r}", file=sys.stderr)
+                continue
+            prio = int(prio) if pd.notna(prio) else 2
+            for i in range(lo, hi):
+                level = sub_seed_level[i]
+                # mais especifico vence; no empate, menor prioridade
+                if len(prefix) > level or (len(prefix) == level and prio < sub_priority[i]):
+                    sub_seed_level[i] = len(prefix)
+                    sub_priority[i] = prio
+                    sub_segment[i] = seg_pos.get(seg, -1)
+
+        return cls(
+            sub_code=sub_code, sub_class=sub_class.astype(np.int32),
+            class_code=class_code.astype(np.int32), class_group=class_group.astype(np.int32),
+            group_code=group_code.astype(np.int32), group_division=group_division.astype(np.int32),
+            division_code=division_code.astype(np.int32), division_section=division_section,
+            desc_blob=desc_blob, desc_offsets=desc_offsets,
+            segment_names=np.array(segment_names, dtype=str),
+            sub_segment=sub_segment, sub_priority=sub_priority, sub_seed_level=sub_seed_level,
+            source_hash=_source_hash(lookup_path, seed_path),
+        )
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {k: v for k, v in self.__dict__.items() if isinstance(v, np.ndarray)}
+        with open(path, "wb") as fh:
+            np.savez(fh, version=INDEX_VERSION, source_hash=self.source_hash, **arrays)
+
+    @classmethod
+    def load(cls, path) -> "CnaeIndex":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                raise ValueError(f"Indice CNAE com versao diferente: {path}")
+            fields = {k: data[k] for k in data.files if k not in {"version", "source_hash"}}
+            return cls(source_hash=str(data["source_hash"]), **fields)
+
+    # ---------- consultas ----------
+
+    def __len__(self) -> int:
+        return len(self.sub_code)
+
+    def code7(self, i) -> str:
+        return f"{int(self.sub_code[i]):07d}"
+
+    def description(self, code) -> str:
+        i = self._find(code)
+        if i is None:
+            return ""
+        a, b = self.desc_offsets[i], self.desc_offsets[i + 1]
+        return self.desc_blob[a:b].tobytes().decode("utf-8")
+
+    def hierarchy(self, code) -> Optional[Dict[str, str]]:
+        """Codigos de todos os niveis de uma subclasse (formato oficial)."""
+        i = self._find(code)
+        if i is None:
+            return None
+        c = self.sub_class[i]
+        g = self.class_group[c]
+        d = self.group_division[g]
+        cls5 = f"{int(self.class_code[c]):05d}"
+        seg = int(self.sub_segment[i])
+        return {
+            "secao": str(self.division_section[d]),
+            "divisao": f"{int(self.division_code[d]):02d}",
+            "grupo": f"{int(self.group_code[g]):03d}",
+            "classe": f"{cls5[:4]}-{cls5[4]}",
+            "subclasse": f"{cls5[:4]}-{cls5[4]}/{self.code7(i)[5:]}",
+            "segmento": str(self.segment_names[seg]) if seg >= 0 else "",
+        }
+
+    def subclasses_under(self, code) -> List[str]:
+        """Subclasses (7 digitos) sob um codigo de qualquer nivel (ex.: classe 4930-2)."""
+        lo, hi = _prefix_range(self.sub_code, parse_cnae_code(code))
+        return [self.code7(i) for i in range(lo, hi)]
+
+    def seed7(self) -> set:
+        """Subclasses cobertas pelo seed (ja expandido por classe/grupo/divisao)."""
+        return {self.code7(i) for i in np.flatnonzero(self.sub_seed_level)}
+
+    def reference_frame(self) -> pd.DataFrame:
+        """cnae_principal -> cnae_descricao, segmento, prioridade (para merge por lote no job)."""
+        starts, ends = self.desc_offsets[:-1], self.desc_offsets[1:]
+        blob = self.desc_blob.tobytes()
+        seeded = self.sub_seed_level > 0
+        return pd.DataFrame({
+            "cnae_principal": [f"{c:07d}" for c in self.sub_code.tolist()],
+            "cnae_descricao": [blob[a:b].decode("utf-8") for a, b in zip(starts.tolist(), ends.tolist())],
+            "segmento": pd.Series(self.sub_segment).map(dict(enumerate(self.segment_names.tolist()))).astype(object),
+            # fora do seed: prioridade padrao da tabela partners (2)
+            "prioridade": np.where(seeded, self.sub_priority, 2).astype(np.int64),
+        })
+
+    def _find(self, code) -> Optional[int]:
+        digits = parse_cnae_code(code)
+        if len(digits) != 7:
+            return None
+        value = int(digits)
+        i = int(np.searchsorted(self.sub_code, value))
+        return i if i < len(self.sub_code) and self.sub_code[i] == value else None
+
+
+def _prefix_range(sub_code: np.ndarray, prefix: str):
+    """[lo, hi) das subclasses cujo codigo de 7 digitos comeca com `prefix`."""
+    if not prefix:
+        return 0, 0
+    lo = np.searchsorted(sub_code, int(prefix.ljust(7, "0")), side="left")
+    hi = np.searchsorted(sub_code, int(prefix.ljust(7, "9")), side="right")
+    return int(lo), int(hi)
+
+
+def load_or_compile(index_path, lookup_path, seed_path, sep=";", save=True) -> CnaeIndex:
+    """Usa o .npz se ele foi compilado destes CSVs; senao recompila (e salva, se `save`)."""
+    if index_path and Path(index_path).exists():
+        index = CnaeIndex.load(index_path)
+        if index.source_hash == _source_hash(lookup_path, seed_path):
+            return index
+    index = CnaeIndex.compile(lookup_path, seed_path, sep)
+    if index_path and save and Path(index_path).parent.is_dir():
+        index.save(index_path)
+        print(f"[cnae] indice recompilado -> {index_path}", file=sys.stderr)
+    return index
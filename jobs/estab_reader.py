@@ -0,0 +1,278 @@
+"""Leitura do arquivo Estabelecimentos (CNPJ / Receita Federal) para os jobs de parceiros.
+
+Conhece o layout oficial (30 colunas, sem header, ';', latin-1), projeta so as
+colunas usadas pelo job e filtra por UF antes de converter o lote para pandas.
+Com pyarrow instalado usa o leitor CSV em streaming do Arrow (tipos fixos e
+colunas categoricas); sem pyarrow cai no parser C do pandas com usecols/dtype.
+
+Aceita tanto o arquivo oficial (sem header) quanto CSVs com header (ex.:
+amostras exportadas), detectando automaticamente pela primeira linha.
+
+Entradas: CSVs soltos ou os ZIPs do dump (Estabelecimentos0.zip ... 9.zip),
+lidos membro a membro em streaming, sem extrair para disco. Para paralelizar,
+cada arquivo/membro vira uma `EstabSource`; CSVs soltos grandes ainda podem ser
+divididos em faixas de bytes alinhadas a inicio de linha (`split_sources`).
+"""
+
+import glob
+import io
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:  # pragma: no cover
+    pa = None
+
+# Layout oficial do arquivo Estabelecimentos (dicionario de dados da Receita Federal).
+ESTAB_LAYOUT = [
+    "cnpj_basico", "cnpj_ordem", "cnpj_dv", "identificador_matriz_filial", "nome_fantasia",
+    "situacao_cadastral", "data_situacao_cadastral", "motivo_situacao_cadastral",
+    "nome_cidade_exterior", "pais", "data_inicio_atividade", "cnae_fiscal_principal",
+    "cnae_fiscal_secundaria", "tipo_logradouro", "logradouro", "numero", "complemento",
+    "bairro", "cep", "uf", "municipio", "ddd_1", "telefone_1", "ddd_2", "telefone_2",
+    "ddd_fax", "fax", "correio_eletronico", "situacao_especial", "data_situacao_especial",
+]
+# Colunas que o job de parceiros usa (nomes do layout oficial).
+ESTAB_USECOLS = [
+    "cnpj_basico", "cnpj_ordem", "cnpj_dv", "nome_fantasia", "situacao_cadastral",
+    "data_inicio_atividade", "cnae_fiscal_principal", "cnae_fiscal_secundaria",
+    "cep", "uf", "municipio", "correio_eletronico",
+]
+# Baixa cardinalidade: categoria (dicionario) em vez de um objeto str por linha.
+ESTAB_CATEGORY_COLS = {"uf", "situacao_cadastral", "municipio"}
+# Nomes internos do job para colunas do layout oficial.
+ESTAB_RENAME = {"correio_eletronico": "email"}
+# O leitor Arrow decodifica ~32 blocos a frente do consumidor: blocos pequenos limitam o pico de memoria;
+# os lotes ja filtrados sao reagrupados ate `chunksize` linhas antes de ir para o pandas.
+ARROW_BLOCK_BYTES = 2 << 20
+
+
+class _RangeFile(io.RawIOBase):
+    """Le [start, end) de um arquivo, com as duas pontas alinhadas ao inicio da linha seguinte.
+
+    Cada linha pertence a faixa em que ela comeca; supoe (como no dump oficial) que
+    campos nao contem quebra de linha.
+    """
+
+    def __init__(self, path, start: int, end: Optional[int]):
+        self._f = open(path, "rb")
+        self._end = self._align(end) if end is not None else None
+        self._f.seek(self._align(start))
+
+    def _align(self, offset: int) -> int:
+        if offset <= 0:
+            return 0
+        self._f.seek(offset - 1)
+        self._f.readline()
+        return self._f.tell()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        size = len(buf)
+        if self._end is not None:
+            size = min(size, self._end - self._f.tell())
+        if size <= 0:
+            return 0
+        data = self._f.read(size)
+        buf[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+@dataclass(frozen=True)
+class EstabSource:
+    """Uma unidade de leitura: CSV solto, membro de ZIP ou faixa de bytes de um CSV."""
+
+    path: str
+    member: Optional[str] = None
+    start: int = 0
+    end: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        name = f"{self.path}:{self.member}" if self.member else self.path
+        if self.start or self.end is not None:
+            name += f"[{self.start}:{'' if self.end is None else self.end}]"
+        return name
+
+    @contextmanager
+    def open(self, whole: bool = False) -> Iterator[io.BufferedIOBase]:
+        """Stream binario do conteudo; `whole` ignora a faixa (para ler o header do arquivo)."""
+        if self.member:
+            with zipfile.ZipFile(self.path) as zf, zf.open(self.member) as fh:
+                yield fh
+            return
+        start, end = (0, None) if whole else (self.start, self.end)
+        with io.BufferedReader(_RangeFile(self.path, start, end), buffer_size=1 << 20) as fh:
+            yield fh
+
+
+def expand_inputs(patterns) -> List[Path]:
+    """Expande globs (ex.: data/cnpj/Estabelecimentos*.zip) mantendo a ordem e sem duplicar."""
+    paths, seen = [], set()
+    for pattern in [patterns] if isinstance(patterns, (str, Path)) else patterns:
+        matches = sorted(glob.glob(str(pattern))) or [str(pattern)]
+        for m in matches:
+            if m not in seen:
+                seen.add(m)
+                paths.append(Path(m))
+    return paths
+
+
+def list_sources(patterns) -> List[EstabSource]:
+    """Um EstabSource por CSV ou por membro (arquivo) de cada ZIP."""
+    sources = []
+    for path in expand_inputs(patterns):
+        if not path.exists():
+            raise FileNotFoundError(f"Arquivo de estabelecimentos nao encontrado: {path}")
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zf:
+                members = [i.filename for i in zf.infolist() if not i.is_dir()]
+            sources.extend(EstabSource(str(path), member=m) for m in members)
+        else:
+            sources.append(EstabSource(str(path)))
+    return sources
+
+
+def split_sources(sources: List[EstabSource], pieces: int, min_bytes: int = 32 << 20) -> List[EstabSource]:
+    """Divide CSVs soltos em faixas de bytes ate ~`pieces` tarefas no total (ZIPs nao permitem seek)."""
+    sizes = [Path(s.path).stat().st_size if not s.member else 0 for s in sources]
+    target = max(min_bytes, sum(sizes) // max(1, pieces))
+    out = []
+    for src, size in zip(sources, sizes):
+        if src.member or size <= target:
+            out.append(src)
+            continue
+        n = max(1, round(size / target))
+        bounds = [size * i // n for i in range(n + 1)]
+        out.extend(replace(src, start=a, end=b) for a, b in zip(bounds[:-1], bounds[1:]))
+    return out
+
+
+def _first_line(source: EstabSource, encoding: str) -> str:
+    with source.open(whole=True) as fh:
+        return fh.readline().decode(encoding, errors="replace")
+
+
+def has_header(source, sep=";", encoding="latin-1") -> bool:
+    """Arquivo oficial nao tem header: a primeira linha comeca com o CNPJ basico numerico."""
+    source = source if isinstance(source, EstabSource) else EstabSource(str(source))
+    cells = [c.strip().strip('"').lstrip("\ufeff").lower() for c in _first_line(source, encoding).split(sep)]
+    return "uf" in cells or "cnpj_basico" in cells or "cnae_fiscal_principal" in cells
+
+
+def _resolve_columns(source, sep, header, encoding):
+    """Colunas a ler (projecao) e nomes de coluna do arquivo (o header, se houver, e pulado na leitura)."""
+    if not header:
+        return list(ESTAB_USECOLS), list(ESTAB_LAYOUT)
+    names = [c.strip().strip('"').lstrip("\ufeff") for c in _first_line(source, encoding).rstrip("\r\n").split(sep)]
+    wanted = set(ESTAB_USECOLS) | set(ESTAB_RENAME.values())
+    return [c for c in names if c in wanted], names
+
+
+def _finish(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=ESTAB_RENAME)
+    if "uf" in df.columns:
+        df["uf"] = df["uf"].astype("string").str.upper().astype(object)
+    return df
+
+
+def _iter_arrow(fh, sep, encoding, usecols, names, skip_header, ufs, chunksize):
+    column_types = {
+        c: (pa.dictionary(pa.int32(), pa.string()) if c in ESTAB_CATEGORY_COLS else pa.string())
+        for c in usecols
+    }
+    # Stream comum (sem mmap): o RSS nao cresce com o tamanho do arquivo.
+    reader = pacsv.open_csv(
+        fh,
+        read_options=pacsv.ReadOptions(
+            column_names=names,
+            skip_rows=1 if skip_header else 0,
+            encoding=encoding,
+            block_size=ARROW_BLOCK_BYTES,
+        ),
+        parse_options=pacsv.ParseOptions(delimiter=sep),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=usecols,
+            column_types=column_types,
+            strings_can_be_null=True,
+        ),
+    )
+    value_set = pa.array(sorted(ufs)) if ufs else None
+    pending, pending_rows = [], 0
+    for batch in reader:
+        if value_set is not None:
+            uf = batch.column("uf")
+            # Filtro no dicionario do lote (poucas UFs) e expansao pelos indices: sem decodificar strings.
+            hit = pc.is_in(pc.utf8_upper(uf.dictionary), value_set=value_set)
+            mask = pc.fill_null(pc.take(hit, uf.indices), False)
+            batch = batch.filter(mask)
+        if not batch.num_rows:
+            continue
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= chunksize:
+            yield _finish(pa.Table.from_batches(pending).to_pandas())
+            pending, pending_rows = [], 0
+    if pending:
+        yield _finish(pa.Table.from_batches(pending).to_pandas())
+
+
+def _iter_pandas(fh, sep, encoding, usecols, names, skip_header, ufs, chunksize):
+    dtype = {c: ("category" if c in ESTAB_CATEGORY_COLS else str) for c in usecols}
+    for chunk in pd.read_csv(
+        fh,
+        sep=sep,
+        header=None,
+        names=names,
+        skiprows=1 if skip_header else 0,
+        usecols=usecols,
+        dtype=dtype,
+        encoding=encoding,
+        chunksize=chunksize,
+    ):
+        if ufs:
+            chunk = chunk[chunk["uf"].astype("string").str.upper().isin(ufs).fillna(False)]
+        if len(chunk):
+            yield _finish(chunk)
+
+
+def iter_estab_chunks(source, sep=";", chunksize=200000, ufs=None, layout="auto", encoding="", engine="auto"):
+    """Gera DataFrames ja projetados e filtrados por UF (coluna `uf` em maiusculas).
+
+    source: caminho de CSV ou EstabSource (membro de ZIP / faixa de bytes)
+    layout: auto | official (sem header) | header
+    encoding: vazio = latin-1 no layout oficial, utf-8 com header
+    engine: auto (pyarrow se disponivel) | pyarrow | pandas
+    """
+    source = source if isinstance(source, EstabSource) else EstabSource(str(source))
+    header = has_header(source, sep) if layout == "auto" else layout == "header"
+    encoding = encoding or ("utf-8" if header else "latin-1")
+    usecols, names = _resolve_columns(source, sep, header, encoding)
+    if "uf" not in usecols or "cnae_fiscal_principal" not in usecols:
+        raise ValueError("O CSV de estabelecimentos precisa ter colunas: uf, cnae_fiscal_principal (ajuste o script se seu header for diferente)")
+    ufs = {u.upper() for u in ufs} if ufs else None
+
+    if engine == "pyarrow" and pa is None:
+        raise RuntimeError("engine=pyarrow requer o pacote pyarrow (pip install pyarrow)")
+    use_arrow = pa is not None and engine in {"auto", "pyarrow"}
+    iter_fn = _iter_arrow if use_arrow else _iter_pandas
+    # Header so existe no inicio do arquivo: faixas seguintes comecam direto nos dados.
+    skip_header = header and source.start == 0
+    with source.open() as fh:
+        if not fh.peek(1):
+            return  # faixa vazia (ex.: alinhamento caiu no fim do arquivo)
+        yield from iter_fn(fh, sep, encoding, usecols, names, skip_header, ufs, chunksize)
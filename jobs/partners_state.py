@@ -0,0 +1,123 @@
+"""Estado do refresh incremental de parceiros: fingerprint por CNPJ da ultima execucao.
+
+O store guarda so dois arrays ordenados (cnpj como int64 e hash uint64 das colunas
+de saida), ~16 bytes por parceiro, num .npz. A cada execucao o job compara cada
+parceiro encontrado com o store e emite so o changeset:
+- upsert: CNPJ novo ou com alguma coluna diferente da execucao anterior;
+- delete: CNPJ que estava no store e agora esta fechado (situacao_cadastral
+  nula/baixada) ou nao aparece mais (saiu do dump, da UF ou do seed).
+"""
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Situacao cadastral (Receita): 01 nula, 02 ativa, 03 suspensa, 04 inapta, 08 baixada.
+CLOSED_SITUACOES = {1, 8}
+STORE_VERSION = 1
+
+
+def fingerprint(df: pd.DataFrame, columns) -> np.ndarray:
+    """Hash (uint64) por linha das colunas de saida; estavel entre execucoes e processos."""
+    return pd.util.hash_pandas_object(df[list(columns)], index=False).to_numpy(np.uint64)
+
+
+@dataclass
+class FingerprintStore:
+    cnpj: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    fp: np.ndarray = field(default_factory=lambda: np.empty(0, np.uint64))
+    ufs: tuple = ()
+
+    @classmethod
+    def load(cls, path) -> "FingerprintStore":
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        with np.load(path) as data:
+            if int(data["version"]) != STORE_VERSION:
+                raise ValueError(f"Store incremental com versao diferente: {path} (apague para refazer a carga completa)")
+            return cls(data["cnpj"], data["fp"], tuple(str(u) for u in data["ufs"]))
+
+    @classmethod
+    def build(cls, cnpj, fp, ufs) -> "FingerprintStore":
+        order = np.argsort(cnpj, kind="stable")
+        return cls(np.asarray(cnpj, np.int64)[order], np.asarray(fp, np.uint64)[order], tuple(sorted(ufs)))
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.savez(fh, version=STORE_VERSION, cnpj=self.cnpj, fp=self.fp, ufs=np.array(self.ufs, dtype=str))
+        os.replace(tmp, path)
+
+    def __len__(self) -> int:
+        return len(self.cnpj)
+
+    def lookup(self, cnpj: np.ndarray):
+        """(encontrado, fingerprint anterior) para cada CNPJ, por busca binaria no array ordenado."""
+        if not len(self.cnpj):
+            return np.zeros(len(cnpj), bool), np.zeros(len(cnpj), np.uint64)
+        pos = np.minimum(np.searchsorted(self.cnpj, cnpj), len(self.cnpj) - 1)
+        return self.cnpj[pos] == cnpj, self.fp[pos]
+
+
+@dataclass
+class Seen:
+    """CNPJs vistos num lote/parte: todos (para achar os que sumiram) e o fingerprint dos ativos."""
+
+    cnpj: np.ndarray
+    active: np.ndarray
+    fp: np.ndarray
+    counts: dict
+
+    @classmethod
+    def concat(cls, items) -> "Seen":
+        items = list(items)
+        counts = {}
+        for item in items:
+            for k, v in item.counts.items():
+                counts[k] = counts.get(k, 0) + v
+        if not items:
+            return cls(np.empty(0, np.int64), np.empty(0, bool), np.empty(0, np.uint64), counts)
+        return cls(
+            np.concatenate([i.cnpj for i in items]),
+            np.concatenate([i.active for i in items]),
+            np.concatenate([i.fp for i in items]),
+            counts,
+        )
+
+
+def diff_frame(df: pd.DataFrame, store: FingerprintStore, columns):
+    """Changeset do lote (coluna `op` = upsert/delete) e os CNPJs vistos."""
+    cnpj = pd.to_numeric(df["cnpj"], errors="coerce")
+    df, cnpj = df[cnpj.notna()], cnpj.dropna().to_numpy(np.int64)  # sem CNPJ nao da para rastrear
+    situacao = pd.to_numeric(df["situacao_cadastral"], errors="coerce")
+    active = ~situacao.isin(CLOSED_SITUACOES).to_numpy()
+    fp = fingerprint(df, columns)
+    found, old = store.lookup(cnpj)
+
+    new = active & ~found
+    changed = active & found & (old != fp)
+    closed = ~active & found
+    emit = new | changed | closed
+    out = df[emit].copy()
+    out.insert(0, "op", np.where(closed[emit], "delete", "upsert"))
+
+    counts = {
+        "novos": int(new.sum()),
+        "alterados": int(changed.sum()),
+        "fechados": int(closed.sum()),
+        "inalterados": int((active & found & ~changed).sum()),
+    }
+    return out, Seen(cnpj, active, fp, counts)
+
+
+def finish(store: FingerprintStore, seen: Seen, ufs):
+    """Novo store (so ativos) e os CNPJs do store anterior que nao apareceram nesta execucao."""
+    seen_all = np.unique(seen.cnpj)
+    gone = store.cnpj[~np.isin(store.cnpj, seen_all, assume_unique=True)]
+    return FingerprintStore.build(seen.cnpj[seen.active], seen.fp[seen.active], ufs), gone
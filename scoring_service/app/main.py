@@ -3,6 +3,7 @@ from __future__ import annotations
 import json
 import os
 import time
+from bisect import bisect_right
 from datetime import datetime, timezone
 from pathlib import Path
 from threading import RLock
@@ -65,6 +66,16 @@ class ScoreRequest(BaseModel):
     events: List[Event] = []
 
 
+class BatchScoreRequest(BaseModel):
+    """
+    PT-BR: Payload do endpoint /score/batch (lista de leads com eventos).
+    ES: Payload del endpoint /score/batch (lista de leads con eventos).
+    EN: /score/batch payload (list of leads with their events).
+    """
+
+    items: List[ScoreRequest] = []
+
+
 class RetrainRequest(BaseModel):
     expected_leads: Optional[int] = None
     ignore_expected_mismatch: bool = False
@@ -72,6 +83,9 @@ class RetrainRequest(BaseModel):
     min_rows: int = 200
     search_mode: str = "quick"
     affect_existing_scores: bool = False
+    distill_surrogate: bool = False
+    calibration: str = "none"
+    use_cache: bool = True
 
 
 FEATURE_COLUMNS = [
@@ -90,8 +104,18 @@ FEATURE_COLUMNS = [
 # Paths default dentro do container (montados via volume ./data -> /app/data).
 DEFAULT_MODEL_PATH = "/app/data/ml/artifacts/lead_scoring_best_model.joblib"
 DEFAULT_RUNNER_UP_MODEL_PATH = "/app/data/ml/artifacts/lead_scoring_runner_up_model.joblib"
+DEFAULT_SURROGATE_MODEL_PATH = "/app/data/ml/artifacts/lead_scoring_surrogate_model.joblib"
 DEFAULT_MODEL_REPORT_PATH = "/app/data/ml/artifacts/model_selection_report.json"
+DEFAULT_CALIBRATION_PATH = "/app/data/ml/artifacts/lead_scoring_calibration.json"
+DEFAULT_TRAINING_REGISTRY_DIR = "/app/data/ml/artifacts/registry"
 DEFAULT_TRAIN_DATABASE_URL = "postgresql://app:app@db:5432/appdb"
+# Distancia (em pontos de score) dos limiares 40/70 em que o surrogate delega ao campeao.
+DEFAULT_SURROGATE_BAND = 8
+
+MAX_BATCH_ITEMS = 5000
+
+QUALIFIED_THRESHOLD = 70
+WARMING_THRESHOLD = 40
 
 
 def _safe_iso_to_dt(value: Optional[str]) -> Optional[datetime]:
@@ -144,7 +168,11 @@ def _extract_event_features(events: List[Event]) -> Dict[str, float]:
 
 def _build_feature_row(lead: Lead, events: List[Event]) -> Dict[str, Any]:
     """Monta uma linha tabular de features para inferência do pipeline sklearn."""
-    event_features = _extract_event_features(events)
+    return _build_feature_row_from_event_features(lead, _extract_event_features(events))
+
+
+def _build_feature_row_from_event_features(lead: Lead, event_features: Dict[str, float]) -> Dict[str, Any]:
+    """Mesma linha de _build_feature_row, com eventos já agregados (ex.: agregação SQL no backfill)."""
     return {
         "uf": str(lead.uf or "").strip().upper(),
         "cidade": str(lead.cidade or "").strip(),
@@ -157,13 +185,18 @@ def _build_feature_row(lead: Lead, events: List[Event]) -> Dict[str, Any]:
 
 def _score_to_status(score: int) -> str:
     """Mapeia score numérico para status comercial padronizado."""
-    if score >= 70:
+    if score >= QUALIFIED_THRESHOLD:
         return "QUALIFICADO"
-    if score >= 40:
+    if score >= WARMING_THRESHOLD:
         return "AQUECENDO"
     return "CURIOSO"
 
 
+def _near_status_threshold(score: int, band: int) -> bool:
+    """Indica se o score esta perto o bastante de um limiar para mudar de status."""
+    return any(abs(score - threshold) <= band for threshold in (WARMING_THRESHOLD, QUALIFIED_THRESHOLD))
+
+
 def _budget_points(budget: Optional[str]) -> int:
     """Heurística legado: pontos por faixa de orçamento."""
     if not budget:
@@ -200,7 +233,14 @@ def _baseline_score(lead: Lead, events: List[Event]) -> Tuple[int, str, List[Dic
     - artefatos ML não existem
     - modelo falha na inferência em tempo de execução
     """
-    etypes = [str(e.event_type or "").strip().lower() for e in (events or [])]
+    return _baseline_score_from_features(lead, _extract_event_features(events))
+
+
+def _baseline_score_from_features(
+    lead: Lead,
+    features: Dict[str, Any],
+) -> Tuple[int, str, List[Dict[str, Any]]]:
+    """Regras do fallback a partir das contagens agregadas de eventos."""
     motivos: List[Dict[str, Any]] = []
     score = 0
 
@@ -214,15 +254,15 @@ def _baseline_score(lead: Lead, events: List[Event]) -> Tuple[int, str, List[Dic
         score += pp
         motivos.append({"fator": "Prazo", "impacto": pp, "detalhe": lead.prazo_compra})
 
-    if "hook_complete" in etypes:
+    if features["n_hook_complete"] > 0:
         score += 15
         motivos.append({"fator": "Completou o hook (quiz/calculadora)", "impacto": 15})
 
-    if "cta_click" in etypes or "whatsapp_click" in etypes:
+    if features["n_cta_click"] > 0:
         score += 20
         motivos.append({"fator": "Clique em CTA/WhatsApp", "impacto": 20})
 
-    if etypes.count("page_view") >= 3:
+    if features["n_page_view"] >= 3:
         score += 10
         motivos.append({"fator": "Alta navegacao (>=3 paginas)", "impacto": 10})
 
@@ -238,7 +278,15 @@ def _build_ml_motivos(model_name: str, probability: float, lead: Lead, events: L
     """
     Gera justificativas legíveis para UI (sem expor detalhes internos do pipeline).
     """
-    features = _extract_event_features(events)
+    return _build_ml_motivos_from_features(model_name, probability, lead, _extract_event_features(events))
+
+
+def _build_ml_motivos_from_features(
+    model_name: str,
+    probability: float,
+    lead: Lead,
+    features: Dict[str, Any],
+) -> List[Dict[str, Any]]:
     score = int(round(max(0.0, min(1.0, probability)) * 100))
     motivos: List[Dict[str, Any]] = [
         {
@@ -302,6 +350,72 @@ def _load_model(path_value: str):
         return None, f"error:{path}:{exc}"
 
 
+def _load_calibration(path_value: str):
+    """Carrega tabelas de calibracao (x/y monotonos por modelo) exportadas no treino."""
+    path = Path(path_value)
+    if not path.exists():
+        return None, f"missing:{path}"
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        tables: Dict[str, Tuple[List[float], List[float]]] = {}
+        for role, table in (payload or {}).items():
+            xs = [float(v) for v in table["x"]]
+            ys = [float(v) for v in table["y"]]
+            if not xs or len(xs) != len(ys) or xs != sorted(xs):
+                raise ValueError(f"tabela invalida para {role}")
+            tables[str(role)] = (xs, ys)
+        return tables, f"loaded:{path}"
+    except Exception as exc:
+        return None, f"error:{path}:{exc}"
+
+
+def _load_model_version(path_value: str) -> Optional[str]:
+    """Versao do par de modelos ativo: `trained_at` do relatorio de selecao (gravado em score_meta)."""
+    path = Path(path_value)
+    try:
+        report = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    value = (report or {}).get("trained_at")
+    return str(value) if value else None
+
+
+def load_champion_dir(path_value: str) -> Dict[str, Any]:
+    """
+    Carrega um conjunto de artefatos com os mesmos nomes de arquivo do campeao publicado
+    (ex.: um run do registry de treinos), para pontuar com outro modelo via `champion=`.
+    """
+    base = Path(path_value)
+    best_model, _ = _load_model(str(base / Path(DEFAULT_MODEL_PATH).name))
+    runner_up_model, _ = _load_model(str(base / Path(DEFAULT_RUNNER_UP_MODEL_PATH).name))
+    surrogate_model, _ = _load_model(str(base / Path(DEFAULT_SURROGATE_MODEL_PATH).name))
+    calibration, _ = _load_calibration(str(base / Path(DEFAULT_CALIBRATION_PATH).name))
+    return {
+        "best_model": best_model,
+        "runner_up_model": runner_up_model,
+        "surrogate_model": surrogate_model,
+        "calibration": calibration,
+        "model_version": _load_model_version(str(base / Path(DEFAULT_MODEL_REPORT_PATH).name)),
+    }
+
+
+def _calibrate_probability(table: Optional[Tuple[List[float], List[float]]], probability: float) -> float:
+    """Aplica tabela monotona com busca binaria + interpolacao linear (clamp nas pontas)."""
+    if not table:
+        return probability
+    xs, ys = table
+    if probability <= xs[0]:
+        return ys[0]
+    if probability >= xs[-1]:
+        return ys[-1]
+    idx = bisect_right(xs, probability)
+    x0, x1 = xs[idx - 1], xs[idx]
+    y0, y1 = ys[idx - 1], ys[idx]
+    if x1 <= x0:
+        return y1
+    return y0 + (y1 - y0) * (probability - x0) / (x1 - x0)
+
+
 def _format_model_label(model_id: str) -> str:
     key = str(model_id or "").strip().lower()
     if key == "logit_fine":
@@ -312,21 +426,57 @@ def _format_model_label(model_id: str) -> str:
         return "Best model"
     if key == "runner_up_model":
         return "Runner-up model"
+    if key in {"surrogate_model", "surrogate_gbr"}:
+        return "Surrogate (destilado do campeao)"
     return str(model_id or "-")
 
 
 MODEL_PATH = os.environ.get("SCORING_MODEL_PATH", DEFAULT_MODEL_PATH)
 RUNNER_UP_MODEL_PATH = os.environ.get("SCORING_RUNNER_UP_MODEL_PATH", DEFAULT_RUNNER_UP_MODEL_PATH)
+SURROGATE_MODEL_PATH = os.environ.get("SCORING_SURROGATE_MODEL_PATH", DEFAULT_SURROGATE_MODEL_PATH)
 MODEL_REPORT_PATH = os.environ.get("SCORING_MODEL_REPORT_PATH", DEFAULT_MODEL_REPORT_PATH)
+CALIBRATION_PATH = os.environ.get("SCORING_CALIBRATION_PATH", DEFAULT_CALIBRATION_PATH)
+# Vazio desativa o cache de treinos (toda chamada refaz a busca completa).
+TRAINING_REGISTRY_DIR = os.environ.get("SCORING_TRAINING_REGISTRY_DIR", DEFAULT_TRAINING_REGISTRY_DIR)
 TRAIN_DATABASE_URL = os.environ.get(
     "SCORING_TRAIN_DATABASE_URL",
     os.environ.get("DATABASE_URL", DEFAULT_TRAIN_DATABASE_URL),
 )
+try:
+    SURROGATE_BAND = max(0, int(os.environ.get("SCORING_SURROGATE_BAND", DEFAULT_SURROGATE_BAND)))
+except ValueError:
+    SURROGATE_BAND = DEFAULT_SURROGATE_BAND
 MODEL_LOCK = RLock()
 
 # Carregamento no startup: evita overhead de I/O em toda requisição.
 BEST_MODEL, BEST_MODEL_STATUS = _load_model(MODEL_PATH)
 RUNNER_UP_MODEL, RUNNER_UP_MODEL_STATUS = _load_model(RUNNER_UP_MODEL_PATH)
+SURROGATE_MODEL, SURROGATE_MODEL_STATUS = _load_model(SURROGATE_MODEL_PATH)
+CALIBRATION, CALIBRATION_STATUS = _load_calibration(CALIBRATION_PATH)
+MODEL_VERSION = _load_model_version(MODEL_REPORT_PATH)
+
+
+def _ml_result(
+    model_name: str,
+    probability: float,
+    lead: Lead,
+    feature_row: Dict[str, Any],
+    calibrated: bool,
+) -> Dict[str, Any]:
+    """Monta a resposta do motor ML (score híbrido + motivos) a partir da probabilidade final."""
+    motivos = _build_ml_motivos_from_features(model_name, probability, lead, feature_row)
+    score = _compute_hybrid_score_from_motivos(probability, motivos)
+    return {
+        "score": score,
+        "status": _score_to_status(score),
+        "motivos": motivos,
+        "meta": {
+            "engine": "ml",
+            "model_name": model_name,
+            "probability_qualified": round(probability, 6),
+            "calibrated": calibrated,
+        },
+    }
 
 
 def _predict_ml(
@@ -335,35 +485,47 @@ def _predict_ml(
     feature_row: Dict[str, Any],
     best_model: Any,
     runner_up_model: Any,
+    surrogate_model: Any = None,
+    surrogate_band: int = DEFAULT_SURROGATE_BAND,
+    calibration: Optional[Dict[str, Tuple[List[float], List[float]]]] = None,
 ):
     """
     Inference com estratégia champion/challenger.
 
     Ordem:
+    0) surrogate_model (caminho rapido), exceto quando o score cai a ate
+       `surrogate_band` pontos dos limiares 40/70 -> segue para o campeão
     1) best_model (campeão)
     2) runner_up_model (fallback técnico de ML)
     3) None (deixa caller cair no fallback por regras)
+
+    Com `calibration`, a probabilidade bruta passa pela tabela do papel correspondente
+    (o surrogate imita o campeão, então usa a tabela do best_model).
     """
+    best_table = (calibration or {}).get("best_model")
+    runner_up_table = (calibration or {}).get("runner_up_model")
+
     # Frame com ordem de colunas fixa para manter compatibilidade com o pipeline salvo.
     frame = pd.DataFrame([feature_row], columns=FEATURE_COLUMNS)
 
+    # Tentativa 0: surrogate destilado (so faz sentido com o campeão disponível para desempate).
+    if surrogate_model is not None and best_model is not None:
+        try:
+            proba = float(surrogate_model.predict(frame)[0])
+            proba = _calibrate_probability(best_table, max(0.0, min(1.0, proba)))
+            result = _ml_result("surrogate_model", proba, lead, feature_row, best_table is not None)
+            if not _near_status_threshold(result["score"], surrogate_band):
+                result["meta"]["fast_path"] = True
+                return result
+        except Exception as exc:
+            print(f"[score] surrogate model inference failed: {exc}")
+
     # Tentativa 1: campeão.
     if best_model is not None:
         try:
             proba = float(best_model.predict_proba(frame)[0][1])
-            proba = max(0.0, min(1.0, proba))
-            motivos = _build_ml_motivos("best_model", proba, lead, events)
-            score = _compute_hybrid_score_from_motivos(proba, motivos)
-            return {
-                "score": score,
-                "status": _score_to_status(score),
-                "motivos": motivos,
-                "meta": {
-                    "engine": "ml",
-                    "model_name": "best_model",
-                    "probability_qualified": round(proba, 6),
-                },
-            }
+            proba = _calibrate_probability(best_table, max(0.0, min(1.0, proba)))
+            return _ml_result("best_model", proba, lead, feature_row, best_table is not None)
         except Exception as exc:
             print(f"[score] best model inference failed: {exc}")
 
@@ -371,25 +533,98 @@ def _predict_ml(
     if runner_up_model is not None:
         try:
             proba = float(runner_up_model.predict_proba(frame)[0][1])
-            proba = max(0.0, min(1.0, proba))
-            motivos = _build_ml_motivos("runner_up_model", proba, lead, events)
-            score = _compute_hybrid_score_from_motivos(proba, motivos)
-            return {
-                "score": score,
-                "status": _score_to_status(score),
-                "motivos": motivos,
-                "meta": {
-                    "engine": "ml",
-                    "model_name": "runner_up_model",
-                    "probability_qualified": round(proba, 6),
-                },
-            }
+            proba = _calibrate_probability(runner_up_table, max(0.0, min(1.0, proba)))
+            return _ml_result("runner_up_model", proba, lead, feature_row, runner_up_table is not None)
         except Exception as exc:
             print(f"[score] runner-up model inference failed: {exc}")
 
     return None
 
 
+def score_feature_batch(
+    leads: List[Lead],
+    event_features: List[Dict[str, float]],
+    champion: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Score em lote com a mesma política de /score, usando eventos já agregados.
+
+    Uma chamada predict/predict_proba por modelo para o lote inteiro (em vez de uma por lead);
+    usado por /score/batch e pelo backfill direto no banco (tools/ml/backfill_lead_scores.py).
+    Com `champion` (ver load_champion_dir) pontua com esses artefatos em vez dos ativos.
+    """
+    rows = [_build_feature_row_from_event_features(lead, ef) for lead, ef in zip(leads, event_features)]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+    if not rows:
+        return []
+
+    if champion is not None:
+        best_model = champion.get("best_model")
+        runner_up_model = champion.get("runner_up_model")
+        surrogate_model = champion.get("surrogate_model")
+        calibration = champion.get("calibration") or {}
+        model_version = champion.get("model_version")
+    else:
+        with MODEL_LOCK:
+            best_model = BEST_MODEL
+            runner_up_model = RUNNER_UP_MODEL
+            surrogate_model = SURROGATE_MODEL
+            calibration = CALIBRATION or {}
+            model_version = MODEL_VERSION
+    best_table = calibration.get("best_model")
+    runner_up_table = calibration.get("runner_up_model")
+
+    frame = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    pending = list(range(len(rows)))
+
+    if surrogate_model is not None and best_model is not None:
+        try:
+            probas = surrogate_model.predict(frame)
+            still_pending = []
+            for i in pending:
+                proba = _calibrate_probability(best_table, max(0.0, min(1.0, float(probas[i]))))
+                result = _ml_result("surrogate_model", proba, leads[i], rows[i], best_table is not None)
+                if _near_status_threshold(result["score"], SURROGATE_BAND):
+                    still_pending.append(i)
+                    continue
+                result["meta"]["fast_path"] = True
+                results[i] = result
+            pending = still_pending
+        except Exception as exc:
+            print(f"[score] surrogate model batch inference failed: {exc}")
+
+    for model_name, model, table in (
+        ("best_model", best_model, best_table),
+        ("runner_up_model", runner_up_model, runner_up_table),
+    ):
+        if model is None or not pending:
+            continue
+        try:
+            probas = model.predict_proba(frame.iloc[pending])[:, 1]
+        except Exception as exc:
+            print(f"[score] {model_name} batch inference failed: {exc}")
+            continue
+        for i, raw in zip(pending, probas):
+            proba = _calibrate_probability(table, max(0.0, min(1.0, float(raw))))
+            results[i] = _ml_result(model_name, proba, leads[i], rows[i], table is not None)
+        pending = []
+
+    if model_version:
+        for result in results:
+            if result is not None:
+                result["meta"]["model_version"] = model_version
+
+    for i in pending:
+        fallback_score, fallback_status, fallback_motivos = _baseline_score_from_features(leads[i], rows[i])
+        results[i] = {
+            "score": fallback_score,
+            "status": fallback_status,
+            "motivos": fallback_motivos,
+            "meta": {"engine": "rules"},
+        }
+    return results
+
+
 @app.get("/health")
 def health():
     """
@@ -401,6 +636,9 @@ def health():
     with MODEL_LOCK:
         best_status = BEST_MODEL_STATUS
         runner_status = RUNNER_UP_MODEL_STATUS
+        surrogate_status = SURROGATE_MODEL_STATUS
+        calibration_status = CALIBRATION_STATUS
+        model_version = MODEL_VERSION
         enabled = bool(BEST_MODEL is not None or RUNNER_UP_MODEL is not None)
 
     return {
@@ -409,6 +647,10 @@ def health():
             # Exibe status detalhado para facilitar diagnóstico de deploy/paths.
             "best_model": best_status,
             "runner_up_model": runner_status,
+            "surrogate_model": surrogate_status,
+            "surrogate_band": SURROGATE_BAND,
+            "calibration": calibration_status,
+            "model_version": model_version,
             "enabled": enabled,
             "report_path": MODEL_REPORT_PATH,
         },
@@ -423,6 +665,7 @@ def admin_retrain(req: RetrainRequest):
     """
 
     global BEST_MODEL, RUNNER_UP_MODEL, BEST_MODEL_STATUS, RUNNER_UP_MODEL_STATUS
+    global SURROGATE_MODEL, SURROGATE_MODEL_STATUS, CALIBRATION, CALIBRATION_STATUS, MODEL_VERSION
 
     if req.affect_existing_scores:
         raise HTTPException(
@@ -437,6 +680,12 @@ def admin_retrain(req: RetrainRequest):
     search_mode = str(req.search_mode or "quick").strip().lower()
     if search_mode not in {"quick", "full"}:
         raise HTTPException(status_code=400, detail="search_mode deve ser 'quick' ou 'full'.")
+    calibration_method = str(req.calibration or "none").strip().lower()
+    if calibration_method not in {"auto", "isotonic", "sigmoid", "none"}:
+        raise HTTPException(
+            status_code=400,
+            detail="calibration deve ser 'auto', 'isotonic', 'sigmoid' ou 'none'.",
+        )
 
     started = time.perf_counter()
     try:
@@ -464,6 +713,10 @@ def admin_retrain(req: RetrainRequest):
             dataset,
             random_state=random_state,
             search_mode=search_mode,
+            distill_surrogate=bool(req.distill_surrogate),
+            calibration_method=calibration_method,
+            registry_dir=TRAINING_REGISTRY_DIR or None,
+            use_cache=bool(req.use_cache),
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -472,6 +725,8 @@ def admin_retrain(req: RetrainRequest):
 
     model_path = Path(MODEL_PATH)
     runner_up_path = Path(RUNNER_UP_MODEL_PATH)
+    surrogate_path = Path(SURROGATE_MODEL_PATH)
+    calibration_path = Path(CALIBRATION_PATH)
     report_path = Path(MODEL_REPORT_PATH)
     model_path.parent.mkdir(parents=True, exist_ok=True)
     runner_up_path.parent.mkdir(parents=True, exist_ok=True)
@@ -480,22 +735,48 @@ def admin_retrain(req: RetrainRequest):
     try:
         joblib.dump(artifacts.best_model, model_path)
         joblib.dump(artifacts.runner_up_model, runner_up_path)
+        if artifacts.surrogate_model is not None:
+            surrogate_path.parent.mkdir(parents=True, exist_ok=True)
+            joblib.dump(artifacts.surrogate_model, surrogate_path)
+        else:
+            # Surrogate antigo foi destilado de outro campeão: não pode continuar servindo.
+            surrogate_path.unlink(missing_ok=True)
+        if artifacts.calibration:
+            calibration_path.parent.mkdir(parents=True, exist_ok=True)
+            calibration_path.write_text(json.dumps(artifacts.calibration), encoding="utf-8")
+        else:
+            calibration_path.unlink(missing_ok=True)
         report_path.write_text(json.dumps(artifacts.report, ensure_ascii=False, indent=2), encoding="utf-8")
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Falha ao persistir artefatos: {exc}") from exc
 
     loaded_best, loaded_best_status = _load_model(str(model_path))
     loaded_runner, loaded_runner_status = _load_model(str(runner_up_path))
+    loaded_surrogate, loaded_surrogate_status = _load_model(str(surrogate_path))
+    loaded_calibration, loaded_calibration_status = _load_calibration(str(calibration_path))
+    loaded_version = _load_model_version(str(report_path))
     with MODEL_LOCK:
+        previous_version = MODEL_VERSION
         BEST_MODEL = loaded_best
         RUNNER_UP_MODEL = loaded_runner
         BEST_MODEL_STATUS = loaded_best_status
         RUNNER_UP_MODEL_STATUS = loaded_runner_status
+        SURROGATE_MODEL = loaded_surrogate
+        SURROGATE_MODEL_STATUS = loaded_surrogate_status
+        CALIBRATION = loaded_calibration
+        CALIBRATION_STATUS = loaded_calibration_status
+        MODEL_VERSION = loaded_version
 
     elapsed_ms = int((time.perf_counter() - started) * 1000)
     return {
         "ok": True,
-        "message": "Modelo retreinado com base atual e ativado para novos calculos.",
+        "message": (
+            "Base inalterada: artefatos do treino anterior reativados (cache)."
+            if artifacts.cache_hit
+            else "Modelo retreinado com base atual e ativado para novos calculos."
+        ),
+        "cache_hit": artifacts.cache_hit,
+        "dataset_fingerprint": artifacts.dataset_fingerprint,
         "search_mode": search_mode,
         "random_state": random_state,
         "dataset_rows": artifacts.dataset_rows,
@@ -511,9 +792,20 @@ def admin_retrain(req: RetrainRequest):
         "model_paths": {
             "best_model": str(model_path),
             "runner_up_model": str(runner_up_path),
+            "surrogate_model": str(surrogate_path) if artifacts.surrogate_model is not None else None,
         },
+        "surrogate": artifacts.report.get("surrogate"),
+        "calibration": artifacts.report.get("calibration"),
+        "calibration_path": str(calibration_path) if artifacts.calibration else None,
+        "model_version": loaded_version,
+        "previous_model_version": previous_version,
         "affects_existing_scores": False,
         "applies_to": "Apenas novos scores apos este treino (sem backfill automatico).",
+        "rescoring_hint": (
+            None
+            if previous_version == loaded_version
+            else "python tools/ml/plan_rescoring.py --apply (prioriza leads perto dos limiares 40/70)"
+        ),
         "elapsed_ms": elapsed_ms,
     }
 
@@ -538,8 +830,22 @@ def score(req: ScoreRequest):
     with MODEL_LOCK:
         best_model = BEST_MODEL
         runner_up_model = RUNNER_UP_MODEL
-    ml_result = _predict_ml(lead, events, features, best_model, runner_up_model)
+        surrogate_model = SURROGATE_MODEL
+        calibration = CALIBRATION
+        model_version = MODEL_VERSION
+    ml_result = _predict_ml(
+        lead,
+        events,
+        features,
+        best_model,
+        runner_up_model,
+        surrogate_model=surrogate_model,
+        surrogate_band=SURROGATE_BAND,
+        calibration=calibration,
+    )
     if ml_result is not None:
+        if model_version:
+            ml_result["meta"]["model_version"] = model_version
         return ml_result
 
     # Caminho de segurança: fallback por regras para manter endpoint sempre disponível.
@@ -550,3 +856,18 @@ def score(req: ScoreRequest):
         "motivos": fallback_motivos,
         "meta": {"engine": "rules"},
     }
+
+
+@app.post("/score/batch")
+def score_batch(req: BatchScoreRequest):
+    """
+    PT-BR: Score em lote (mesma politica do /score, uma inferencia por modelo para o lote).
+    ES: Score en lote (misma politica de /score, una inferencia por modelo para el lote).
+    EN: Batch scoring (same policy as /score, one inference call per model for the batch).
+    """
+
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Lote acima do limite de {MAX_BATCH_ITEMS} itens.")
+    leads = [item.lead for item in req.items]
+    event_features = [_extract_event_features(item.events or []) for item in req.items]
+    return {"items": score_feature_batch(leads, event_features)}
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import shutil
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
+import joblib
+import numpy as np
 import pandas as pd
 import psycopg
 from psycopg.rows import dict_row
 from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
 from sklearn.impute import SimpleImputer
+from sklearn.isotonic import IsotonicRegression
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (
     average_precision_score,
@@ -40,6 +47,29 @@ CATEGORICAL_FEATURES = [
 ]
 FEATURE_COLS = NUMERIC_FEATURES + CATEGORICAL_FEATURES
 
+SURROGATE_MODEL_ID = "surrogate_gbr"
+# Limiares de status (mesmos de _score_to_status no servico) para medir concordancia de faixa.
+STATUS_THRESHOLDS = (0.40, 0.70)
+
+# Calibracao e opt-in: o padrao "none" mantem as probabilidades brutas do campeao.
+CALIBRATION_METHODS = {"auto", "isotonic", "sigmoid", "none"}
+# Abaixo disso a isotonica tende a decorar a validacao; "auto" usa Platt (sigmoid).
+ISOTONIC_MIN_VALID_ROWS = 200
+SIGMOID_TABLE_POINTS = 101
+
+# recency_last_event_hours depende de now(); a impressao digital usa o timestamp absoluto.
+FINGERPRINT_COLS = [c for c in FEATURE_COLS if c != "recency_last_event_hours"] + ["last_event_at", TARGET_COL]
+TRAINING_REGISTRY_FILE = "training_registry.json"
+TRAINING_REGISTRY_MAX_RUNS = 5
+# Sobe quando o layout de run_<key>/ muda; entradas de outra versao nao servem de cache.
+REGISTRY_FORMAT_VERSION = 2
+REGISTRY_RUN_META_FILE = "run.json"
+REGISTRY_REPORT_FILE = "model_selection_report.json"
+REGISTRY_CALIBRATION_FILE = "lead_scoring_calibration.json"
+REGISTRY_BEST_MODEL_FILE = "lead_scoring_best_model.joblib"
+REGISTRY_RUNNER_UP_MODEL_FILE = "lead_scoring_runner_up_model.joblib"
+REGISTRY_SURROGATE_MODEL_FILE = "lead_scoring_surrogate_model.joblib"
+
 TRAINING_SQL = """
 WITH event_agg AS (
   SELECT
@@ -48,7 +78,8 @@ WITH event_agg AS (
     COUNT(*) FILTER (WHERE event_type = 'page_view')::int AS n_page_view,
     COUNT(*) FILTER (WHERE event_type = 'hook_complete')::int AS n_hook_complete,
     COUNT(*) FILTER (WHERE event_type IN ('cta_click', 'whatsapp_click'))::int AS n_cta_click,
-    EXTRACT(EPOCH FROM (now() - MAX(ts))) / 3600.0 AS recency_last_event_hours
+    EXTRACT(EPOCH FROM (now() - MAX(ts))) / 3600.0 AS recency_last_event_hours,
+    MAX(ts) AS last_event_at
   FROM events
   GROUP BY lead_id
 )
@@ -65,6 +96,7 @@ SELECT
   COALESCE(e.n_hook_complete, 0) AS n_hook_complete,
   COALESCE(e.n_cta_click, 0) AS n_cta_click,
   COALESCE(e.recency_last_event_hours, 9999) AS recency_last_event_hours,
+  e.last_event_at,
   CASE
     WHEN UPPER(COALESCE(l.status, '')) IN ('QUALIFICADO', 'ENVIADO') THEN 1
     ELSE 0
@@ -84,6 +116,10 @@ class RetrainArtifacts:
     dataset_rows: int
     class_balance: Dict[str, float]
     report: Dict[str, Any]
+    surrogate_model: Any = None
+    calibration: Optional[Dict[str, Any]] = None
+    dataset_fingerprint: Optional[str] = None
+    cache_hit: bool = False
 
 
 def _json_safe(value: Any) -> Any:
@@ -106,6 +142,34 @@ def _normalize_db_url(value: str) -> str:
     return raw
 
 
+def compute_dataset_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Hash de conteudo do frame de treino: contagem de linhas + linhas ordenadas por lead_id.
+
+    Sem `last_event_at` (ex.: CSV exportado), cai para a recencia arredondada em horas.
+    """
+    cols = [c for c in FINGERPRINT_COLS if c in df.columns]
+    if "last_event_at" not in df.columns and "recency_last_event_hours" in df.columns:
+        cols.append("recency_last_event_hours")
+    sort_cols = ["lead_id"] if "lead_id" in df.columns else cols
+    frame = df[list(dict.fromkeys(sort_cols + cols))].copy()
+
+    for col in frame.columns:
+        if col in NUMERIC_FEATURES or col == TARGET_COL:
+            values = pd.to_numeric(frame[col], errors="coerce").astype(float)
+            if col == "recency_last_event_hours":
+                values = values.round(0)
+            frame[col] = values
+        else:
+            frame[col] = frame[col].map(lambda v: "" if v is None or v != v else str(v))
+    frame = frame.sort_values(sort_cols, kind="mergesort").reset_index(drop=True)
+
+    digest = hashlib.sha256()
+    digest.update(f"rows={len(frame)};cols={','.join(frame.columns)}".encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
 def fetch_training_dataset(database_url: str) -> pd.DataFrame:
     db_url = _normalize_db_url(database_url)
     if not db_url:
@@ -123,6 +187,7 @@ def fetch_training_dataset(database_url: str) -> pd.DataFrame:
     for col in NUMERIC_FEATURES:
         df[col] = pd.to_numeric(df[col], errors="coerce")
     df[TARGET_COL] = pd.to_numeric(df[TARGET_COL], errors="coerce").fillna(0).astype(int).clip(0, 1)
+    df.attrs["fingerprint"] = compute_dataset_fingerprint(df)
     return df
 
 
@@ -332,6 +397,272 @@ def _evaluate_model(
     }
 
 
+def _build_surrogate_pipeline(seed: int) -> Pipeline:
+    """Modelo compacto (arvores rasas) que aprende a probabilidade prevista pelo campeao."""
+    preprocess = ColumnTransformer(
+        transformers=[
+            (
+                "num",
+                Pipeline(steps=[("imputer", SimpleImputer(strategy="median"))]),
+                NUMERIC_FEATURES,
+            ),
+            (
+                "cat",
+                Pipeline(
+                    steps=[
+                        ("imputer", SimpleImputer(strategy="most_frequent")),
+                        ("onehot", OneHotEncoder(handle_unknown="ignore")),
+                    ]
+                ),
+                CATEGORICAL_FEATURES,
+            ),
+        ]
+    )
+    return Pipeline(
+        steps=[
+            ("prep", preprocess),
+            (
+                "model",
+                GradientBoostingRegressor(
+                    n_estimators=60,
+                    max_depth=3,
+                    learning_rate=0.1,
+                    subsample=0.8,
+                    random_state=seed,
+                ),
+            ),
+        ]
+    )
+
+
+def _probability_band(values: np.ndarray) -> np.ndarray:
+    low, high = STATUS_THRESHOLDS
+    return np.where(values >= high, 2, np.where(values >= low, 1, 0))
+
+
+def _distill_champion(
+    champion: Pipeline,
+    x_train: pd.DataFrame,
+    x_valid: pd.DataFrame,
+    y_valid: pd.Series,
+    seed: int,
+) -> Tuple[Pipeline, Dict[str, Any]]:
+    """
+    Destila o campeao em um surrogate treinado sobre as probabilidades do proprio campeao.
+
+    O alvo e a probabilidade (nao o label), entao o surrogate e um regressor;
+    a fidelidade e medida no split de validacao contra o campeao.
+    """
+    teacher_train = champion.predict_proba(x_train)[:, 1]
+    surrogate = _build_surrogate_pipeline(seed)
+    surrogate.fit(x_train, teacher_train)
+
+    teacher_valid = champion.predict_proba(x_valid)[:, 1]
+    start = datetime.now(timezone.utc)
+    student_valid = np.clip(surrogate.predict(x_valid), 0.0, 1.0)
+    latency_ms = (datetime.now(timezone.utc) - start).total_seconds() * 1000 / max(1, len(x_valid))
+
+    abs_err = np.abs(student_valid - teacher_valid)
+    metrics = {
+        "model": SURROGATE_MODEL_ID,
+        "val_mae_vs_champion": float(abs_err.mean()),
+        "val_max_abs_err_vs_champion": float(abs_err.max()),
+        "val_band_agreement": float((_probability_band(student_valid) == _probability_band(teacher_valid)).mean()),
+        "val_roc_auc": float(roc_auc_score(y_valid, student_valid)),
+        "val_latency_ms": float(latency_ms),
+    }
+    return surrogate, metrics
+
+
+def _fit_calibration_table(p_valid: np.ndarray, y_valid: pd.Series, method: str) -> Optional[Dict[str, Any]]:
+    """
+    Ajusta calibracao no split de validacao e exporta como tabela monotona (x -> y).
+
+    O servico aplica a tabela com busca binaria + interpolacao linear, sem sklearn no caminho quente.
+    Devolve None quando o Platt sai com inclinacao negativa: nesse caso o papel fica sem calibracao.
+    """
+    if method == "isotonic":
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, increasing=True, out_of_bounds="clip")
+        iso.fit(p_valid, y_valid.to_numpy())
+        xs = np.asarray(iso.X_thresholds_, dtype=float)
+        ys = np.asarray(iso.y_thresholds_, dtype=float)
+    else:
+        platt = LogisticRegression(C=1e6, solver="lbfgs")
+        platt.fit(p_valid.reshape(-1, 1), y_valid.to_numpy())
+        xs = np.linspace(0.0, 1.0, SIGMOID_TABLE_POINTS)
+        if platt.coef_[0][0] < 0:
+            # Sinal invertido indica validacao degenerada; achatar a curva esconderia o problema.
+            return None
+        ys = platt.predict_proba(xs.reshape(-1, 1))[:, 1]
+
+    return {
+        "method": method,
+        "x": [round(float(v), 6) for v in xs],
+        "y": [round(float(v), 6) for v in ys],
+    }
+
+
+def _apply_calibration_table(table: Dict[str, Any], values: np.ndarray) -> np.ndarray:
+    return np.interp(values, table["x"], table["y"])
+
+
+def _calibrate_models(
+    models: Dict[str, Pipeline],
+    method: str,
+    x_valid: pd.DataFrame,
+    y_valid: pd.Series,
+    x_test: pd.DataFrame,
+    y_test: pd.Series,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Gera uma tabela por papel (best_model/runner_up_model) e o antes/depois de Brier no teste."""
+    if method == "auto":
+        method = "isotonic" if len(x_valid) >= ISOTONIC_MIN_VALID_ROWS else "sigmoid"
+
+    tables: Dict[str, Dict[str, Any]] = {}
+    summary: Dict[str, Dict[str, Any]] = {}
+    for role, estimator in models.items():
+        p_valid = estimator.predict_proba(x_valid)[:, 1]
+        p_test = estimator.predict_proba(x_test)[:, 1]
+        table = _fit_calibration_table(p_valid, y_valid, method)
+        if table is None:
+            summary[role] = {
+                "method": "none",
+                "requested_method": method,
+                "reason": "platt_negative_slope",
+                "test_brier_raw": float(brier_score_loss(y_test, p_test)),
+            }
+            continue
+        tables[role] = table
+        summary[role] = {
+            "method": method,
+            "knots": len(table["x"]),
+            "test_brier_raw": float(brier_score_loss(y_test, p_test)),
+            "test_brier_calibrated": float(brier_score_loss(y_test, _apply_calibration_table(table, p_test))),
+        }
+    return tables, summary
+
+
+def _registry_key(fingerprint: str, options: Dict[str, Any]) -> str:
+    raw = json.dumps({"fingerprint": fingerprint, **options}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _load_registry(registry_dir: Path) -> List[Dict[str, Any]]:
+    path = registry_dir / TRAINING_REGISTRY_FILE
+    if not path.exists():
+        return []
+    try:
+        runs = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return []
+    return runs if isinstance(runs, list) else []
+
+
+def _load_run_dir(run_dir: Path) -> Optional[RetrainArtifacts]:
+    """Remonta os artefatos de uma execucao salva por _store_run; None se faltar algo ou a versao mudou."""
+    try:
+        meta = json.loads((run_dir / REGISTRY_RUN_META_FILE).read_text(encoding="utf-8"))
+        if meta.get("format_version") != REGISTRY_FORMAT_VERSION:
+            return None
+        report = json.loads((run_dir / REGISTRY_REPORT_FILE).read_text(encoding="utf-8"))
+        best_model = joblib.load(run_dir / REGISTRY_BEST_MODEL_FILE)
+        runner_up_model = joblib.load(run_dir / REGISTRY_RUNNER_UP_MODEL_FILE)
+        surrogate_path = run_dir / REGISTRY_SURROGATE_MODEL_FILE
+        surrogate_model = joblib.load(surrogate_path) if surrogate_path.exists() else None
+        calibration_path = run_dir / REGISTRY_CALIBRATION_FILE
+        calibration = (
+            json.loads(calibration_path.read_text(encoding="utf-8")) if calibration_path.exists() else None
+        )
+    except Exception:
+        return None
+    return RetrainArtifacts(
+        best_model=best_model,
+        runner_up_model=runner_up_model,
+        winner_id=str(meta.get("winner_id") or ""),
+        runner_up_id=str(meta.get("runner_up_id") or ""),
+        cv_folds=int(meta.get("cv_folds") or 0),
+        dataset_rows=int(meta.get("dataset_rows") or 0),
+        class_balance=dict(meta.get("class_balance") or {}),
+        report=report,
+        surrogate_model=surrogate_model,
+        calibration=calibration,
+        dataset_fingerprint=meta.get("dataset_fingerprint"),
+    )
+
+
+def _find_cached_run(registry_dir: Path, key: str) -> Optional[RetrainArtifacts]:
+    for run in _load_registry(registry_dir):
+        if run.get("key") != key:
+            continue
+        # Entradas antigas (dataclass inteira em pickle) nao tem format_version e sao ignoradas.
+        if run.get("format_version") != REGISTRY_FORMAT_VERSION:
+            return None
+        cached = _load_run_dir(registry_dir / str(run.get("artifact", "")))
+        if cached is not None:
+            cached.cache_hit = True
+        return cached
+    return None
+
+
+def _remove_run_artifact(registry_dir: Path, artifact: str) -> None:
+    if not artifact:
+        return
+    path = registry_dir / artifact
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _store_run(registry_dir: Path, key: str, options: Dict[str, Any], artifacts: RetrainArtifacts) -> None:
+    """
+    Guarda o resultado do treino e mantem apenas as ultimas TRAINING_REGISTRY_MAX_RUNS execucoes.
+
+    Cada execucao vira um diretorio com os mesmos arquivos do campeao publicado (modelos via
+    joblib, calibracao e relatorio em JSON) mais um run.json com os metadados e a versao do formato.
+    """
+    artifact_name = f"run_{key}"
+    run_dir = registry_dir / artifact_name
+    _remove_run_artifact(registry_dir, artifact_name)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    joblib.dump(artifacts.best_model, run_dir / REGISTRY_BEST_MODEL_FILE)
+    joblib.dump(artifacts.runner_up_model, run_dir / REGISTRY_RUNNER_UP_MODEL_FILE)
+    if artifacts.surrogate_model is not None:
+        joblib.dump(artifacts.surrogate_model, run_dir / REGISTRY_SURROGATE_MODEL_FILE)
+    if artifacts.calibration:
+        (run_dir / REGISTRY_CALIBRATION_FILE).write_text(json.dumps(artifacts.calibration), encoding="utf-8")
+    (run_dir / REGISTRY_REPORT_FILE).write_text(
+        json.dumps(artifacts.report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    meta = {
+        "format_version": REGISTRY_FORMAT_VERSION,
+        "winner_id": artifacts.winner_id,
+        "runner_up_id": artifacts.runner_up_id,
+        "cv_folds": int(artifacts.cv_folds),
+        "dataset_rows": int(artifacts.dataset_rows),
+        "class_balance": _json_safe(artifacts.class_balance),
+        "dataset_fingerprint": artifacts.dataset_fingerprint,
+    }
+    (run_dir / REGISTRY_RUN_META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    runs = [r for r in _load_registry(registry_dir) if r.get("key") != key]
+    runs.append(
+        {
+            "key": key,
+            "format_version": REGISTRY_FORMAT_VERSION,
+            "fingerprint": artifacts.dataset_fingerprint,
+            **options,
+            "winner": artifacts.winner_id,
+            "trained_at": artifacts.report.get("trained_at"),
+            "artifact": artifact_name,
+        }
+    )
+    for stale in runs[:-TRAINING_REGISTRY_MAX_RUNS]:
+        _remove_run_artifact(registry_dir, str(stale.get("artifact", "")))
+    runs = runs[-TRAINING_REGISTRY_MAX_RUNS:]
+    (registry_dir / TRAINING_REGISTRY_FILE).write_text(json.dumps(runs, indent=2), encoding="utf-8")
+
+
 def _select_winner(results_df: pd.DataFrame) -> Tuple[str, List[str]]:
     eps_auc = 0.005
     eps_pr = 0.003
@@ -372,10 +703,39 @@ def train_models_from_dataframe(
     *,
     random_state: int = 42,
     search_mode: str = "quick",
+    distill_surrogate: bool = False,
+    calibration_method: str = "none",
+    registry_dir: Optional[str] = None,
+    use_cache: bool = True,
 ) -> RetrainArtifacts:
+    """
+    Treina campeao + vice (GridSearch + fine tuning).
+
+    Com `registry_dir`, o resultado fica registrado pela impressao digital da base e pelas
+    opcoes de treino; uma nova chamada com a mesma chave devolve os artefatos em cache
+    (`cache_hit=True`) sem refazer a busca.
+    """
     if df is None or df.empty:
         raise ValueError("Base de treino vazia. Gere leads antes de retreinar.")
 
+    calibration_method = str(calibration_method or "none").strip().lower()
+    if calibration_method not in CALIBRATION_METHODS:
+        raise ValueError(f"calibration_method invalido: {calibration_method}. Use {sorted(CALIBRATION_METHODS)}.")
+
+    fingerprint = df.attrs.get("fingerprint") or compute_dataset_fingerprint(df)
+    run_options = {
+        "random_state": int(random_state),
+        "search_mode": str(search_mode or "quick"),
+        "distill_surrogate": bool(distill_surrogate),
+        "calibration_method": calibration_method,
+    }
+    run_key = _registry_key(fingerprint, run_options)
+    registry_path = Path(registry_dir) if registry_dir else None
+    if registry_path is not None and use_cache:
+        cached = _find_cached_run(registry_path, run_key)
+        if cached is not None:
+            return cached
+
     missing = set(FEATURE_COLS).difference(df.columns)
     if missing:
         raise ValueError(f"Base de treino sem colunas obrigatorias: {sorted(missing)}")
@@ -480,9 +840,37 @@ def train_models_from_dataframe(
         "search_mode": str(search_mode or "quick"),
         "trained_at": datetime.now(timezone.utc).isoformat(),
         "dataset": class_balance,
+        "dataset_fingerprint": fingerprint,
     }
 
-    return RetrainArtifacts(
+    surrogate_model = None
+    if distill_surrogate:
+        surrogate_model, surrogate_metrics = _distill_champion(
+            model_map[winner_name],
+            x_train,
+            x_valid,
+            y_valid,
+            seed=random_state,
+        )
+        report["surrogate"] = {"teacher": winner_name, **surrogate_metrics}
+
+    calibration = None
+    if calibration_method != "none":
+        calibration, calibration_summary = _calibrate_models(
+            {
+                "best_model": model_map[winner_name],
+                "runner_up_model": model_map[runner_up_name],
+            },
+            calibration_method,
+            x_valid,
+            y_valid,
+            x_test,
+            y_test,
+        )
+        report["calibration"] = calibration_summary
+        calibration = calibration or None
+
+    artifacts = RetrainArtifacts(
         best_model=model_map[winner_name],
         runner_up_model=model_map[runner_up_name],
         winner_id=winner_name,
@@ -491,4 +879,10 @@ def train_models_from_dataframe(
         dataset_rows=int(len(work_df)),
         class_balance=class_balance,
         report=report,
+        surrogate_model=surrogate_model,
+        calibration=calibration,
+        dataset_fingerprint=fingerprint,
     )
+    if registry_path is not None:
+        _store_run(registry_path, run_key, run_options, artifacts)
+    return artifacts
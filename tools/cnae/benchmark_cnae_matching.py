@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CNAE seed matching of jobs/build_partners_from_cnpj.py (legacy x vectorized).
+
+Generates a synthetic Estabelecimentos-like sample (principal + secondary CNAE
+lists drawn from the official subclass lookup, with the real seed codes mixed
+in) and times, per chunk:
+- legacy: `apply(norm_cnae_to7)` + per-row lambda that regex-splits the
+  secondary list;
+- vectorized: `norm_cnae_series` + single-pass seed regex on the whole list.
+
+Both masks are compared row by row (parity) before reporting rows/s.
+
+Examples:
+  python tools/cnae/benchmark_cnae_matching.py
+  python tools/cnae/benchmark_cnae_matching.py --rows 5000000 --legacy-rows 500000
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "jobs"))
+
+from build_partners_from_cnpj import (  # noqa: E402
+    norm_cnae_series,
+    secondary_seed_mask,
+    seed_token_pattern,
+)
+from cnae_index import CnaeIndex  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark CNAE seed matching (legacy x vectorized).")
+    ap.add_argument("--rows", type=int, default=5_000_000, help="Synthetic rows (vectorized path).")
+    ap.add_argument(
+        "--legacy-rows",
+        type=int,
+        default=500_000,
+        help="Rows also run through the legacy path (parity + rows/s); 0 = all rows.",
+    )
+    ap.add_argument("--chunksize", type=int, default=200_000)
+    ap.add_argument("--seed-rate", type=float, default=0.02, help="Share of CNAE codes drawn from the seed.")
+    ap.add_argument("--seed", default="data/cnae_seed_mvp_mg_sp_go.csv")
+    ap.add_argument("--lookup", default="data/cnae_lookup_subclasses_2_3_corrigido.csv")
+    ap.add_argument("--sep", default=";")
+    ap.add_argument("--random-state", type=int, default=42)
+    ap.add_argument("--output", default="", help="Optional JSON file for the results.")
+    return ap.parse_args()
+
+
+def make_chunk(rng: np.random.Generator, n: int, codes: np.ndarray, seed_codes: np.ndarray, seed_rate: float) -> pd.DataFrame:
+    """Chunk sintetico no formato oficial: principal com 7 digitos, secundarios separados por virgula."""
+
+    def draw(size: int) -> np.ndarray:
+        picked = rng.choice(codes, size)
+        from_seed = rng.random(size) < seed_rate
+        picked[from_seed] = rng.choice(seed_codes, int(from_seed.sum()))
+        return picked
+
+    principal = draw(n)
+    # ~metade sem secundario; o resto com 1..12 codigos (cauda longa, como no arquivo da Receita)
+    n_sec = np.where(rng.random(n) < 0.5, 0, np.minimum(rng.geometric(0.25, n), 12))
+    flat = draw(int(n_sec.sum()))
+    bounds = np.concatenate([[0], np.cumsum(n_sec)])
+    secondary = [",".join(flat[bounds[i] : bounds[i + 1]]) if n_sec[i] else None for i in range(n)]
+    return pd.DataFrame({"cnae_fiscal_principal": principal, "cnae_fiscal_secundaria": secondary})
+
+
+def norm_cnae_to7(x: str) -> str:
+    """Normalizacao por valor do job antigo (referencia do caminho legacy)."""
+    if pd.isna(x):
+        return ""
+    s = re.sub(r"[^0-9]", "", str(x).strip())
+    return s.zfill(7) if s else ""
+
+
+def legacy_mask(chunk: pd.DataFrame, seed7: set) -> pd.Series:
+    cnae7 = chunk["cnae_fiscal_principal"].apply(norm_cnae_to7)
+    sec = chunk["cnae_fiscal_secundaria"].fillna("")
+    return cnae7.isin(seed7) | sec.apply(
+        lambda s: any(norm_cnae_to7(x) in seed7 for x in re.split(r"[;, ]+", str(s)) if x.strip())
+    )
+
+
+def vectorized_mask(chunk: pd.DataFrame, seed7: set, pattern: re.Pattern) -> pd.Series:
+    cnae7 = norm_cnae_series(chunk["cnae_fiscal_principal"])
+    return cnae7.isin(seed7) | secondary_seed_mask(chunk["cnae_fiscal_secundaria"], pattern)
+
+
+def main() -> int:
+    args = parse_args()
+    seed = pd.read_csv(REPO_ROOT / args.seed, sep=args.sep, dtype=str)
+    # Mesmo seed7 do job: resolvido pelo indice CNAE (hierarquia + codigos estragados pelo Excel).
+    seed7 = CnaeIndex.compile(REPO_ROOT / args.lookup, REPO_ROOT / args.seed, args.sep).seed7()
+    lookup = pd.read_csv(REPO_ROOT / args.lookup, sep=args.sep, dtype=str)
+    codes = lookup["subclasse_num7"].dropna().astype(str).to_numpy()
+    # Mistura formatos do seed (ex.: 0152-1/02) e sem zeros a esquerda para exercitar a normalizacao.
+    seed_codes = np.array(sorted(seed7) + [c.lstrip("0") for c in sorted(seed7)] + list(seed.iloc[:, 0].dropna()))
+    pattern = seed_token_pattern(seed7)
+
+    rng = np.random.default_rng(args.random_state)
+    legacy_limit = args.rows if args.legacy_rows <= 0 else min(args.legacy_rows, args.rows)
+    totals = {"gen_sec": 0.0, "vectorized_sec": 0.0, "legacy_sec": 0.0}
+    rows_done = legacy_done = matched = mismatches = 0
+
+    while rows_done < args.rows:
+        n = min(args.chunksize, args.rows - rows_done)
+        t0 = time.perf_counter()
+        chunk = make_chunk(rng, n, codes, seed_codes, args.seed_rate)
+        t1 = time.perf_counter()
+        fast = vectorized_mask(chunk, seed7, pattern)
+        t2 = time.perf_counter()
+        totals["gen_sec"] += t1 - t0
+        totals["vectorized_sec"] += t2 - t1
+        matched += int(fast.sum())
+
+        if legacy_done < legacy_limit:
+            part = chunk.iloc[: legacy_limit - legacy_done]
+            t3 = time.perf_counter()
+            slow = legacy_mask(part, seed7)
+            totals["legacy_sec"] += time.perf_counter() - t3
+            mismatches += int((slow != fast.iloc[: len(part)]).sum())
+            legacy_done += len(part)
+        rows_done += n
+        print(f"[chunk] rows={rows_done}/{args.rows} matched={matched}", flush=True)
+
+    vec_rps = rows_done / totals["vectorized_sec"] if totals["vectorized_sec"] else None
+    legacy_rps = legacy_done / totals["legacy_sec"] if totals["legacy_sec"] else None
+    result = {
+        "rows": rows_done,
+        "legacy_rows": legacy_done,
+        "chunksize": args.chunksize,
+        "matched": matched,
+        "parity_mismatches": mismatches,
+        "vectorized_sec": round(totals["vectorized_sec"], 3),
+        "legacy_sec": round(totals["legacy_sec"], 3),
+        "vectorized_rows_per_sec": round(vec_rps, 1) if vec_rps else None,
+        "legacy_rows_per_sec": round(legacy_rps, 1) if legacy_rps else None,
+        "speedup": round(vec_rps / legacy_rps, 2) if vec_rps and legacy_rps else None,
+        "generation_sec": round(totals["gen_sec"], 3),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        out = Path(args.output)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
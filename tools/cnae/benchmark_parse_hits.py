@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CONCLA result page parsing of tools/cnae/generate_cnae_map.py (BeautifulSoup x lxml).
+
+Runs both parsers over:
+- the saved page corpus in tools/cnae/fixtures/concla (list / table / loose
+  anchor layouts, comments, script/style/template, entities, broken markup);
+- synthetic large result pages (stub server layout, plus a variant with all
+  anchors in one container, where the legacy parent-text fallback is quadratic).
+
+Every page must yield identical CnaeHit lists (parity) before pages/s and
+MB/s are reported; exits 1 on any mismatch.
+
+Examples:
+  python tools/cnae/benchmark_parse_hits.py
+  python tools/cnae/benchmark_parse_hits.py --results 5000 --repeat 5
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+from urllib.parse import urljoin
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from concla_stub_server import DEFAULT_LOOKUP, DEFAULT_PAGES, render_results
+from generate_cnae_map import BASE, CNAE_RE, CnaeHit, clean_text, parse_hits
+
+
+def legacy_parse_hits(html: str) -> List[CnaeHit]:
+    """parse_hits original (BeautifulSoup), mantido como referencia de paridade."""
+    soup = BeautifulSoup(html, "lxml")
+
+    hits: List[CnaeHit] = []
+    seen = set()
+
+    for a in soup.find_all("a", href=True):
+        t = a.get_text(" ", strip=True)
+        m = CNAE_RE.search(t)
+        if not m:
+            continue
+
+        cnae = m.group(0)
+        url_detalhe = urljoin(BASE, a["href"])
+
+        desc = ""
+        if a.next_sibling and isinstance(a.next_sibling, str):
+            desc = clean_text(a.next_sibling)
+
+        if not desc:
+            parent_text = a.parent.get_text(" ", strip=True)
+            desc = clean_text(parent_text.replace(cnae, ""))
+
+        key = (cnae, desc, url_detalhe)
+        if cnae and key not in seen:
+            seen.add(key)
+            hits.append(CnaeHit(cnae=cnae, descricao=desc or "—", url_detalhe=url_detalhe))
+
+    hits.sort(key=lambda x: x.cnae)
+    return hits
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark CONCLA page parsing (BeautifulSoup x lxml).")
+    ap.add_argument("--pages", default=str(DEFAULT_PAGES), help="Directory with saved result pages (*.html).")
+    ap.add_argument("--lookup", default=str(DEFAULT_LOOKUP))
+    ap.add_argument("--results", type=int, default=2000, help="Results per synthetic large page.")
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per page (best run is kept).")
+    ap.add_argument("--output", default="", help="Optional JSON file for the results.")
+    return ap.parse_args()
+
+
+def synthetic_pages(lookup_path: Path, n: int) -> dict:
+    lookup = pd.read_csv(lookup_path, sep=";", dtype=str)
+    rows = list(zip(lookup["subclasse"], lookup["denominacao"]))
+    rows = (rows * (n // max(1, len(rows)) + 1))[:n]
+    listed = render_results("sintetico", rows)
+    # mesmos links soltos num unico <div> separados por <br>: a descricao vem do texto do pai
+    loose = listed.replace('<ul class="resultado">', '<div class="resultado">').replace("</ul>", "</div>")
+    loose = loose.replace("<li>", "").replace("</a> - ", "</a><br>").replace("</li>", "<br>")
+    return {f"synthetic_list_{n}": listed, f"synthetic_loose_{n}": loose}
+
+
+def best_time(fn, html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    args = parse_args()
+    pages = {p.stem: p.read_text(encoding="utf-8") for p in sorted(Path(args.pages).glob("*.html"))}
+    if not pages:
+        print(f"[WARN] nenhuma pagina salva em {args.pages}", file=sys.stderr)
+    pages.update(synthetic_pages(Path(args.lookup), args.results))
+
+    mismatches = 0
+    per_page = []
+    totals = {"bytes": 0, "legacy_sec": 0.0, "lxml_sec": 0.0}
+    for name, html in pages.items():
+        expected, got = legacy_parse_hits(html), parse_hits(html)
+        if expected != got:
+            mismatches += 1
+            print(f"[MISMATCH] {name}: legacy={len(expected)} lxml={len(got)}", file=sys.stderr)
+            for old, new in zip(expected, got):
+                if old != new:
+                    print(f"  legacy: {old}\n  lxml:   {new}", file=sys.stderr)
+                    break
+        legacy_sec = best_time(legacy_parse_hits, html, args.repeat)
+        lxml_sec = best_time(parse_hits, html, args.repeat)
+        size = len(html.encode("utf-8"))
+        totals["bytes"] += size
+        totals["legacy_sec"] += legacy_sec
+        totals["lxml_sec"] += lxml_sec
+        per_page.append({
+            "page": name,
+            "kb": round(size / 1024, 1),
+            "hits": len(got),
+            "legacy_ms": round(legacy_sec * 1000, 2),
+            "lxml_ms": round(lxml_sec * 1000, 2),
+            "speedup": round(legacy_sec / lxml_sec, 1) if lxml_sec else None,
+        })
+        print(f"[page] {name}: {len(got)} hits | legacy {legacy_sec * 1000:.1f} ms | lxml {lxml_sec * 1000:.1f} ms", flush=True)
+
+    mb = totals["bytes"] / (1 << 20)
+    result = {
+        "pages": len(pages),
+        "parity_mismatches": mismatches,
+        "legacy_pages_per_sec": round(len(pages) / totals["legacy_sec"], 1) if totals["legacy_sec"] else None,
+        "lxml_pages_per_sec": round(len(pages) / totals["lxml_sec"], 1) if totals["lxml_sec"] else None,
+        "legacy_mb_per_sec": round(mb / totals["legacy_sec"], 2) if totals["legacy_sec"] else None,
+        "lxml_mb_per_sec": round(mb / totals["lxml_sec"], 2) if totals["lxml_sec"] else None,
+        "speedup": round(totals["legacy_sec"] / totals["lxml_sec"], 2) if totals["lxml_sec"] else None,
+        "per_page": per_page,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        out = Path(args.output)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
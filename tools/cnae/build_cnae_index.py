@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compile the CNAE index used by jobs/build_partners_from_cnpj.py.
+
+Reads the official subclass lookup and the MVP seed and writes a compact .npz
+(subclass -> class -> group -> division -> section, subclass descriptions and
+seed segment/priority tags). The partner job recompiles it on its own when the
+CSVs change; this script is for building it ahead of time and inspecting it.
+
+Examples:
+  python tools/cnae/build_cnae_index.py
+  python tools/cnae/build_cnae_index.py --show 4930-2 --show 0152-1/02
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "jobs"))
+
+from cnae_index import CnaeIndex  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Compile the CNAE hierarchy index (.npz).")
+    ap.add_argument("--seed", default="data/cnae_seed_mvp_mg_sp_go.csv")
+    ap.add_argument("--lookup", default="data/cnae_lookup_subclasses_2_3_corrigido.csv")
+    ap.add_argument("--sep", default=";")
+    ap.add_argument("--out", default="data/cnae_index.npz")
+    ap.add_argument("--show", action="append", default=[], help="CNAE code (any level) to print after compiling.")
+    return ap.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    t0 = time.perf_counter()
+    index = CnaeIndex.compile(REPO_ROOT / args.lookup, REPO_ROOT / args.seed, args.sep)
+    compile_ms = (time.perf_counter() - t0) * 1000
+    out = REPO_ROOT / args.out
+    index.save(out)
+
+    t0 = time.perf_counter()
+    index = CnaeIndex.load(out)
+    load_ms = (time.perf_counter() - t0) * 1000
+    summary = {
+        "out": str(out.relative_to(REPO_ROOT)) if out.is_relative_to(REPO_ROOT) else str(out),
+        "bytes": out.stat().st_size,
+        "subclasses": len(index),
+        "classes": len(index.class_code),
+        "groups": len(index.group_code),
+        "divisions": len(index.division_code),
+        "seeded_subclasses": len(index.seed7()),
+        "segments": index.segment_names.tolist(),
+        "compile_ms": round(compile_ms, 2),
+        "load_ms": round(load_ms, 2),
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+    for code in args.show:
+        under = index.subclasses_under(code)
+        print(f"\n{code}: {len(under)} subclass(es)")
+        for code7 in under:
+            info = index.hierarchy(code7)
+            print(f"  {info['subclasse']} [{info['segmento'] or '-'}] {index.description(code7)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+"""
+Single-file SQLite cache for CONCLA search pages (used by generate_cnae_map.py).
+
+One row per search URL with the raw HTML (zlib), the parsed hits (JSON), the
+validators returned by the server (ETag / Last-Modified) and when the entry
+was last fetched or revalidated. Entries younger than the TTL are served
+locally; older ones are revalidated with a conditional GET (304 keeps the
+stored hits). Hits parsed by an older parser version are re-parsed from the
+stored HTML, without network.
+
+Only the main thread touches the connection; workers just fetch.
+"""
+
+import json
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+  url TEXT PRIMARY KEY,
+  keyword TEXT NOT NULL,
+  etag TEXT,
+  last_modified TEXT,
+  fetched_at REAL NOT NULL,
+  parser_version INTEGER NOT NULL,
+  body BLOB,
+  hits TEXT NOT NULL
+)
+"""
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    keyword: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    parser_version: int
+    body: Optional[bytes]
+    hits: List[Dict[str, str]]
+
+    @property
+    def html(self) -> str:
+        return zlib.decompress(self.body).decode("utf-8") if self.body else ""
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now or time.time()) - self.fetched_at
+
+    def validators(self) -> Dict[str, str]:
+        """Headers do GET condicional."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HitCache:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        row = self._conn.execute(
+            "SELECT url, keyword, etag, last_modified, fetched_at, parser_version, body, hits FROM pages WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(*row[:7], hits=json.loads(row[7]))
+
+    def put(
+        self,
+        url: str,
+        keyword: str,
+        html: str,
+        hits: List[Dict[str, str]],
+        parser_version: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pages (url, keyword, etag, last_modified, fetched_at, parser_version, body, hits)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                url, keyword, etag, last_modified, time.time(), parser_version,
+                zlib.compress(html.encode("utf-8"), 6),
+                json.dumps(hits, ensure_ascii=False, separators=(",", ":")),
+            ),
+        )
+        self._conn.commit()
+
+    def touch(self, url: str) -> None:
+        """304: o conteudo continua valido, so renova o relogio do TTL."""
+        self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+        self._conn.commit()
+
+    def update_hits(self, url: str, hits: List[Dict[str, str]], parser_version: int) -> None:
+        self._conn.execute(
+            "UPDATE pages SET hits = ?, parser_version = ? WHERE url = ?",
+            (json.dumps(hits, ensure_ascii=False, separators=(",", ":")), parser_version, url),
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM pages").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the CONCLA "busca online CNAE" search, for testing
+tools/cnae/generate_cnae_map.py without hitting the IBGE site.
+
+For each request to /busca-online-cnae.html?chave=<keyword> it serves, in order:
+1. a saved page from --pages (file name = keyword slug, e.g. criacao_de_equinos.html);
+2. otherwise a page rendered from the official subclass lookup (descriptions
+   containing the keyword, accent-insensitive).
+
+Responses carry ETag/Last-Modified and conditional requests get 304, like a
+well-behaved origin, so the client cache revalidation can be exercised too.
+
+Fault injection to exercise the client's rate limiter and retries:
+--latency (seconds per response), --fail-every N (every Nth request -> 503)
+and --max-rps (requests above this rate -> 429 with Retry-After).
+
+Examples:
+  python tools/cnae/concla_stub_server.py --port 8765
+  python tools/cnae/generate_cnae_map.py --in tools/cnae/cnae_keywords.csv --out /tmp/cnae_map.csv \
+      --cache /tmp/cache_cnae.sqlite --base-url http://127.0.0.1:8765/
+"""
+
+import argparse
+import hashlib
+import html
+import re
+import threading
+import time
+import unicodedata
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_PAGES = REPO_ROOT / "tools" / "cnae" / "fixtures" / "concla"
+DEFAULT_LOOKUP = REPO_ROOT / "data" / "cnae_lookup_subclasses_2_3_corrigido.csv"
+
+
+def keyword_slug(keyword: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", fold(keyword)).strip("_")
+
+
+def fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def render_results(keyword: str, rows) -> str:
+    """Pagina no formato da lista de resultados do CONCLA (link com o codigo + descricao)."""
+    items = []
+    for code, desc in rows:
+        params = urlencode({"option": "com_cnae", "view": "subclasse", "tipo": "cnae", "subclasse": code.replace("-", "").replace("/", "")})
+        items.append(
+            f'<li><a href="busca-online-cnae.html?{params}">{html.escape(code)}</a> - {html.escape(desc.upper())}</li>'
+        )
+    body = "\n".join(items) or "<p>Nenhum resultado encontrado.</p>"
+    return (
+        "<!DOCTYPE html><html lang=\"pt-br\"><head><meta charset=\"utf-8\">"
+        "<title>CONCLA - Busca online CNAE</title></head><body>"
+        f"<div id=\"conteudo\"><h2>Resultado da pesquisa por &quot;{html.escape(keyword)}&quot;</h2>"
+        f"<ul class=\"resultado\">\n{body}\n</ul></div></body></html>"
+    )
+
+
+class StubState:
+    def __init__(self, pages_dir: Path, lookup_path: Path, latency: float, fail_every: int, max_rps: float):
+        self.pages_dir = Path(pages_dir)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.max_rps = max_rps
+        self.requests = 0
+        self.not_modified = 0
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._recent = []
+        self._lock = threading.Lock()
+        lookup = pd.read_csv(lookup_path, sep=";", dtype=str)
+        self._lookup = list(zip(lookup["subclasse"], lookup["denominacao"], lookup["denominacao"].map(fold)))
+
+    def page_for(self, keyword: str) -> str:
+        saved = self.pages_dir / f"{keyword_slug(keyword)}.html"
+        if saved.exists():
+            return saved.read_text(encoding="utf-8")
+        needle = fold(keyword)
+        rows = [(code, desc) for code, desc, folded in self._lookup if needle and needle in folded]
+        return render_results(keyword, rows)
+
+    def admit(self):
+        """(status, retry_after) para o proximo request, aplicando as falhas configuradas."""
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            self._recent.append(now)
+            if self.max_rps and len(self._recent) > self.max_rps:
+                return 429, 1
+            if self.fail_every and n % self.fail_every == 0:
+                return 503, None
+            return 200, None
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with state._lock:
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                if state.latency:
+                    time.sleep(state.latency)
+                status, retry_after = state.admit()
+                query = parse_qs(urlparse(self.path).query)
+                body = b"" if status != 200 else state.page_for((query.get("chave") or [""])[0]).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+                    with state._lock:
+                        state.not_modified += 1
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if status in (200, 304):
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", state.last_modified)
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with state._lock:
+                    state.in_flight -= 1
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=0, pages_dir=DEFAULT_PAGES, lookup_path=DEFAULT_LOOKUP, latency=0.0, fail_every=0, max_rps=0.0):
+    """Sobe o servidor numa thread; devolve (server, state). Porta 0 = porta livre (server.server_port)."""
+    state = StubState(pages_dir, lookup_path, latency, fail_every, max_rps)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Local stand-in for the CONCLA CNAE search.")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--pages", default=str(DEFAULT_PAGES), help="Directory with saved result pages (<slug>.html).")
+    ap.add_argument("--lookup", default=str(DEFAULT_LOOKUP))
+    ap.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+    ap.add_argument("--fail-every", type=int, default=0, help="Every Nth request answers 503 (0 = never).")
+    ap.add_argument("--max-rps", type=float, default=0.0, help="Answer 429 above this many requests/s (0 = no limit).")
+    return ap.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    server, state = serve(args.port, args.pages, args.lookup, args.latency, args.fail_every, args.max_rps)
+    print(f"CONCLA stub on http://127.0.0.1:{server.server_port}/ (Ctrl+C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"requests: {state.requests} | 304: {state.not_modified} | max in flight: {state.max_in_flight}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,32 @@
 import argparse
 import csv
-import json
+import random
 import re
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 from urllib.parse import urlencode, urljoin
 
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from cnae_cache import HitCache
 
 BASE = "https://concla.ibge.gov.br/"
 SEARCH_PATH = "busca-online-cnae.html"
 CNAE_RE = re.compile(r"\b\d{4}-\d(?:/\d{2})?\b")
+_WS_RE = re.compile(r"\s+")
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; GrowthEquestreBot/1.0)"}
+# Respostas que valem nova tentativa (limite de taxa / indisponibilidade temporaria).
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Mude quando parse_hits mudar: hits do cache com versao antiga sao refeitos a partir do HTML salvo.
+PARSER_VERSION = 1
 
 
 @dataclass
@@ -23,42 +36,131 @@ class CnaeHit:
     url_detalhe: str
 
 
-def build_search_url(keyword: str) -> str:
+def build_search_url(keyword: str, base: str = BASE) -> str:
     params = {
         "Itemid": "6160",
         "chave": keyword,
         "option": "com_cnae",
         "view": "atividades",
     }
-    return urljoin(BASE, SEARCH_PATH) + "?" + urlencode(params)
+    return urljoin(base, SEARCH_PATH) + "?" + urlencode(params)
 
 
 def clean_text(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "")).strip(" -–\t\r\n")
+    return _WS_RE.sub(" ", (s or "")).strip(" -–\t\r\n")
+
+
+# Como no BeautifulSoup: texto dentro destas tags nao entra no get_text das tags comuns.
+_STRING_CONTAINERS = {"rt", "rp", "style", "script", "template"}
+
+
+def _container_of(el) -> Optional[str]:
+    """Container de string mais interno que envolve `el` (ou o proprio `el`)."""
+    while el is not None:
+        if el.tag in _STRING_CONTAINERS:
+            return el.tag
+        el = el.getparent()
+    return None
+
+
+def _text_of(el) -> str:
+    """Equivalente a Tag.get_text(" ", strip=True) do BeautifulSoup: sem comentarios
+    e, numa tag comum, sem o texto de script/style/template/rt/rp."""
+    if not len(el) and el.tag not in _STRING_CONTAINERS:
+        # caso comum (<a>0152-1/02</a>): um unico no de texto
+        text = (el.text or "").strip()
+        return text if text and _container_of(el.getparent()) is None else ""
+
+    want = el.tag if el.tag in _STRING_CONTAINERS else None
+    parts: List[str] = []
+
+    def walk(node, container):
+        if node.text and container == want:
+            text = node.text.strip()
+            if text:
+                parts.append(text)
+        for child in node:
+            if isinstance(child.tag, str):  # comentarios / PIs nao tem tag textual
+                walk(child, child.tag if child.tag in _STRING_CONTAINERS else container)
+            if child.tail and container == want:
+                text = child.tail.strip()
+                if text:
+                    parts.append(text)
+
+    walk(el, _container_of(el))
+    return " ".join(parts)
+
+
+def _next_sibling_text(a) -> Optional[str]:
+    """Texto do next_sibling do bs4 quando ele e string: o tail do <a> ou, sem tail, um comentario logo depois."""
+    if a.tail:
+        return a.tail
+    nxt = a.getnext()
+    if nxt is not None and not isinstance(nxt.tag, str):
+        return nxt.text
+    return None
+
+
+def _without_code(parent_text: str, cnae: str) -> str:
+    """clean_text(texto_do_pai.replace(cnae, "")) com o texto do pai ja normalizado por _WS_RE.
+
+    O codigo nao tem espaco, entao remove-lo so pode juntar espacos simples nas emendas:
+    basta corrigi-las, sem repassar a regex no texto inteiro a cada link.
+    """
+    pieces = parent_text.split(cnae)
+    out = [pieces[0]]
+    ends_with_space = pieces[0].endswith(" ")
+    for piece in pieces[1:]:
+        if ends_with_space and piece.startswith(" "):
+            piece = piece[1:]
+        if piece:
+            out.append(piece)
+            ends_with_space = piece.endswith(" ")
+    return "".join(out).strip(" -–\t\r\n")
 
 
 def parse_hits(html: str) -> List[CnaeHit]:
-    soup = BeautifulSoup(html, "lxml")
+    """Hits (codigo, descricao, link) de uma pagina de resultados do CONCLA.
+
+    Percorre direto a arvore do lxml (sem montar o BeautifulSoup) com a mesma
+    semantica do parser antigo; a paridade e verificada por benchmark_parse_hits.py
+    contra o corpus em fixtures/concla. O texto do pai (fallback da descricao) e
+    calculado uma vez por pai, nao uma vez por link.
+    """
+    if not html or not html.strip():
+        return []
+    parser = etree.HTMLParser()
+    parser.feed(html)
+    root = parser.close()
+    if root is None:
+        return []
 
     hits: List[CnaeHit] = []
     seen = set()
+    parent_texts: Dict[object, str] = {}
 
-    for a in soup.find_all("a", href=True):
-        t = a.get_text(" ", strip=True)
+    for a in root.iter("a"):
+        href = a.get("href")
+        if href is None:
+            continue
+        t = _text_of(a)
         m = CNAE_RE.search(t)
         if not m:
             continue
 
         cnae = m.group(0)
-        url_detalhe = urljoin(BASE, a["href"])
+        url_detalhe = urljoin(BASE, href)
 
         desc = ""
-        if a.next_sibling and isinstance(a.next_sibling, str):
-            desc = clean_text(a.next_sibling)
+        sibling = _next_sibling_text(a)
+        if sibling:
+            desc = clean_text(sibling)
 
         if not desc:
-            parent_text = a.parent.get_text(" ", strip=True)
-            desc = clean_text(parent_text.replace(cnae, ""))
+            parent = a.getparent()
+            if parent not in parent_texts:
+                parent_texts[parent] = _WS_RE.sub(" ", _text_of(parent))
+            desc = _without_code(parent_texts[parent], cnae)
 
         key = (cnae, desc, url_detalhe)
         if cnae and key not in seen:
@@ -69,14 +171,149 @@ def parse_hits(html: str) -> List[CnaeHit]:
     return hits
 
 
-def fetch_hits(keyword: str, timeout: int, sleep_s: float) -> List[CnaeHit]:
-    url = build_search_url(keyword)
-    headers = {"User-Agent": "Mozilla/5.0 (compatible; GrowthEquestreBot/1.0)"}
-    r = requests.get(url, headers=headers, timeout=timeout)
-    r.raise_for_status()
-    r.encoding = r.apparent_encoding or r.encoding
-    time.sleep(sleep_s)
-    return parse_hits(r.text)
+class RateLimiter:
+    """Token bucket (requests/s com rajada de `burst`) + limite de requests em voo.
+
+    Uso: `with limiter: session.get(...)` — bloqueia ate haver vaga e token.
+    Um 429 chama `throttle`: todos os workers pausam e a taxa cai pela metade.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, max_in_flight: int = 4):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max(1, int(max_in_flight)))
+
+    def _take_token(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._resume_at:
+                    wait = self._resume_at - now
+                elif self.rate <= 0:  # sem limite de taxa (so o de requests em voo)
+                    return
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, pause: float, min_rate: float = 0.2) -> None:
+        """Reacao a 429: pausa global de `pause` s, zera a rajada e reduz a taxa pela metade."""
+        with self._lock:
+            resume = time.monotonic() + max(0.0, pause)
+            if resume > self._resume_at:
+                self._resume_at = resume
+            self._tokens = 0.0
+            self._updated = self._resume_at
+            if self.rate > 0:
+                self.rate = max(min_rate, self.rate / 2)
+
+    def __enter__(self):
+        self._in_flight.acquire()
+        try:
+            self._take_token()
+        except BaseException:
+            self._in_flight.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._in_flight.release()
+        return False
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """Session unica (keep-alive) com pool do tamanho da concorrencia; retry fica em fetch_html."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    value = (resp.headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_html(
+    session: requests.Session,
+    url: str,
+    timeout: float,
+    limiter: RateLimiter,
+    retries: int = 3,
+    backoff: float = 0.5,
+    headers: Optional[Dict[str, str]] = None,
+) -> requests.Response:
+    """GET com limite de taxa e retry (backoff exponencial com jitter; respeita Retry-After).
+
+    `headers` leva os validadores do cache; a resposta pode ser 304 (sem corpo).
+    """
+    attempt = 0
+    while True:
+        wait = None
+        try:
+            with limiter:
+                r = session.get(url, timeout=timeout, headers=headers)
+            if r.status_code not in RETRY_STATUS:
+                r.raise_for_status()
+                if r.status_code != 304:
+                    r.encoding = r.apparent_encoding or r.encoding
+                return r
+            wait = _retry_after(r)
+            if r.status_code == 429:
+                limiter.throttle(wait if wait is not None else backoff)
+                wait = 0.0  # a pausa ja fica no limiter (vale para todos os workers)
+            error: Exception = requests.HTTPError(f"{r.status_code} para {url}", response=r)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt >= retries:
+            raise error
+        attempt += 1
+        delay = backoff * (2 ** (attempt - 1))
+        time.sleep(wait if wait is not None else delay + random.uniform(0, delay / 2))
+
+
+def fetch_all(keywords: List[str], args, validators: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, object]:
+    """Busca as keywords em paralelo; devolve keyword -> Response (200/304) ou a excecao final."""
+    concurrency = max(1, args.concurrency)
+    limiter = RateLimiter(args.rate, burst=args.burst, max_in_flight=concurrency)
+    session = make_session(concurrency)
+    results: Dict[str, object] = {}
+
+    def task(keyword: str):
+        t0 = time.perf_counter()
+        try:
+            url = build_search_url(keyword, args.base_url)
+            headers = (validators or {}).get(keyword)
+            r = fetch_html(session, url, args.timeout, limiter, args.retries, args.backoff, headers)
+            results[keyword] = r
+            print(f"[fetch] {keyword!r} | {r.status_code} | {len(r.content)} bytes | {time.perf_counter() - t0:.2f}s", flush=True)
+        except Exception as e:  # falha de uma keyword nao derruba as outras
+            results[keyword] = e
+            print(f"[fetch] {keyword!r} | ERRO: {e}", file=sys.stderr, flush=True)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(task, keywords))
+    finally:
+        session.close()
+    return results
 
 
 def load_keywords(path: str) -> List[Dict[str, str]]:
@@ -99,20 +336,77 @@ def main():
     ap.add_argument("--in", dest="inp", required=True, help="CSV de entrada (segmento;keyword;prioridade;uf)")
     ap.add_argument("--out", default="cnae_map.csv", help="CSV de saída (separador ;)")
 
-    ap.add_argument("--timeout", type=int, default=20)
-    ap.add_argument("--sleep", type=float, default=0.35, help="Delay entre requests (evita bloqueio)")
+    ap.add_argument("--timeout", type=float, default=20)
+    ap.add_argument("--sleep", type=float, default=0.35, help="Intervalo médio entre requests (usado se --rate não for informado)")
+    ap.add_argument("--rate", type=float, default=None, help="Requests por segundo (token bucket); padrão = 1/--sleep")
+    ap.add_argument("--burst", type=int, default=1, help="Rajada máxima de requests acima da taxa")
+    ap.add_argument("--concurrency", type=int, default=4, help="Máximo de requests em voo")
+    ap.add_argument("--retries", type=int, default=3, help="Novas tentativas em timeout/conexão/429/5xx")
+    ap.add_argument("--backoff", type=float, default=0.5, help="Backoff base em segundos (exponencial, com jitter)")
+    ap.add_argument("--base-url", default=BASE, help="Base do CONCLA (ex.: servidor local de teste)")
     ap.add_argument("--max-per-keyword", type=int, default=50, help="Limita resultados por keyword")
 
-    ap.add_argument("--cache-dir", default="cache_cnae", help="Pasta de cache local (json por keyword)")
+    ap.add_argument("--cache", default="cache_cnae.sqlite", help="Cache SQLite (HTML + hits por busca)")
+    ap.add_argument("--ttl-hours", type=float, default=24 * 30, help="Idade máxima antes de revalidar (GET condicional)")
+    ap.add_argument("--cache-only", action="store_true", help="Offline: usa só o cache (mesmo vencido), sem rede")
     args = ap.parse_args()
-
-    cache_dir = Path(args.cache_dir)
-    cache_dir.mkdir(parents=True, exist_ok=True)
+    if args.rate is None:
+        args.rate = 1.0 / args.sleep if args.sleep > 0 else 0.0
 
     keywords = load_keywords(args.inp)
     if not keywords:
         raise SystemExit(f"Nenhuma keyword válida encontrada em: {args.inp}")
 
+    cache = HitCache(args.cache)
+    ttl_s = args.ttl_hours * 3600
+    stats = {"cache": 0, "reparse": 0, "304": 0, "200": 0}
+    hits_by_keyword: Dict[str, List[CnaeHit]] = {}
+    entries = {}
+    to_fetch, offline_missing = [], []
+
+    # 1) Resolve localmente o que der (cada keyword uma vez); o resto vai para a rede.
+    for keyword in dict.fromkeys(item["keyword"] for item in keywords):
+        url = build_search_url(keyword, args.base_url)
+        entry = entries[keyword] = cache.get(url)
+        if entry is not None and entry.parser_version != PARSER_VERSION and entry.body:
+            hits = parse_hits(entry.html)
+            entry.hits = [asdict(h) for h in hits]
+            cache.update_hits(url, entry.hits, PARSER_VERSION)
+            stats["reparse"] += 1
+        if entry is not None and (args.cache_only or entry.age() < ttl_s):
+            hits_by_keyword[keyword] = [CnaeHit(**h) for h in entry.hits]
+            stats["cache"] += 1
+        elif args.cache_only:
+            offline_missing.append(keyword)
+        else:
+            to_fetch.append(keyword)
+
+    if offline_missing:
+        raise SystemExit(f"--cache-only: sem cache para {len(offline_missing)} keyword(s): {', '.join(offline_missing)}")
+
+    # 2) Rede: GET condicional em paralelo (304 reaproveita os hits salvos).
+    validators = {k: entries[k].validators() for k in to_fetch if entries[k] is not None}
+    fetched = fetch_all(to_fetch, args, validators) if to_fetch else {}
+    failed = {}
+    for keyword in to_fetch:
+        r = fetched[keyword]
+        url = build_search_url(keyword, args.base_url)
+        if isinstance(r, Exception):
+            failed[keyword] = r
+        elif r.status_code == 304 and entries[keyword] is not None:
+            cache.touch(url)
+            hits_by_keyword[keyword] = [CnaeHit(**h) for h in entries[keyword].hits]
+            stats["304"] += 1
+        else:
+            hits = parse_hits(r.text)
+            cache.put(
+                url, keyword, r.text, [asdict(h) for h in hits], PARSER_VERSION,
+                etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"),
+            )
+            hits_by_keyword[keyword] = hits
+            stats["200"] += 1
+    cache.close()
+
     output_rows = []
     dedup = set()  # (segmento, cnae, uf)
 
@@ -122,19 +416,9 @@ def main():
         prioridade = item["prioridade"]
         uf = item["uf"]
 
-        cache_key = re.sub(r"[^a-zA-Z0-9_-]+", "_", f"{segmento}__{keyword}".lower())
-        cache_path = cache_dir / f"{cache_key}.json"
-
-        if cache_path.exists():
-            hits_data = json.loads(cache_path.read_text(encoding="utf-8"))
-            hits = [CnaeHit(**h) for h in hits_data]
-        else:
-            hits = fetch_hits(keyword, timeout=args.timeout, sleep_s=args.sleep)
-            hits = hits[: args.max_per_keyword]
-            cache_path.write_text(
-                json.dumps([asdict(h) for h in hits], ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
+        if keyword in failed:
+            continue
+        hits = hits_by_keyword[keyword][: args.max_per_keyword]
 
         for h in hits:
             key = (segmento, h.cnae, uf)
@@ -161,6 +445,10 @@ def main():
             p = 99
         return (r["segmento"], p, r["cnae"])
 
+    if failed:
+        # O que deu certo ja ficou no cache: rodar de novo so busca as keywords que falharam.
+        raise SystemExit(f"Falha ao buscar {len(failed)} keyword(s): {', '.join(sorted(failed))} (cache: {args.cache})")
+
     output_rows.sort(key=sort_key)
 
     out_path = Path(args.out)
@@ -172,7 +460,10 @@ def main():
         for r in output_rows:
             w.writerow([r[k] for k in ["segmento", "keyword", "prioridade", "uf", "cnae", "descricao", "fonte", "url_detalhe"]])
 
-    print(f"OK: {out_path} | linhas: {len(output_rows)} | cache: {cache_dir}")
+    print(
+        f"OK: {out_path} | linhas: {len(output_rows)} | cache: {args.cache}"
+        f" (local: {stats['cache']}, 304: {stats['304']}, baixadas: {stats['200']}, reparse: {stats['reparse']})"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic Estabelecimentos files in the official Receita Federal layout.
+
+Same shape as the public dump: 30 columns, no header, every field quoted, ';'
+separator, latin-1, CNAE codes drawn from the official subclass lookup (with
+the seed codes mixed in). Useful to exercise/benchmark
+jobs/build_partners_from_cnpj.py without downloading the real files.
+
+Examples:
+  python tools/cnae/make_estab_sample.py --rows 1000000 --out data/cnpj_sample/Estabelecimentos0.csv
+  python tools/cnae/make_estab_sample.py --rows 5000000 --parts 10 --zip --out-dir data/cnpj_sample
+"""
+
+import argparse
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "jobs"))
+
+from cnae_index import CnaeIndex  # noqa: E402
+from estab_reader import ESTAB_LAYOUT  # noqa: E402
+
+UFS = ["SP", "MG", "RJ", "PR", "RS", "BA", "SC", "GO", "PE", "CE", "DF", "ES", "PA", "MT", "MS"]
+UF_WEIGHTS = np.array([28, 11, 9, 7, 7, 5, 5, 4, 4, 3, 3, 2, 2, 2, 2], dtype=float)
+SITUACOES = ["02", "08", "04", "03", "01"]
+SIT_WEIGHTS = np.array([55, 35, 6, 3, 1], dtype=float)
+NOMES = ["Haras", "Rancho", "Clinica Veterinaria", "Selaria", "Agropecuaria", "Comercio", "Servicos", "Associação"]
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Generate synthetic official-layout Estabelecimentos files.")
+    ap.add_argument("--rows", type=int, default=1_000_000, help="Total rows (split across --parts).")
+    ap.add_argument("--parts", type=int, default=1)
+    ap.add_argument("--out", default="", help="Single output file (only with --parts 1 and no --zip).")
+    ap.add_argument("--out-dir", default="data/cnpj_sample")
+    ap.add_argument("--zip", action="store_true", help="Write each part as Estabelecimentos<N>.zip (one member).")
+    ap.add_argument("--seed-rate", type=float, default=0.02)
+    ap.add_argument("--chunksize", type=int, default=200_000)
+    ap.add_argument("--random-state", type=int, default=42)
+    ap.add_argument("--seed", default="data/cnae_seed_mvp_mg_sp_go.csv")
+    ap.add_argument("--lookup", default="data/cnae_lookup_subclasses_2_3_corrigido.csv")
+    return ap.parse_args()
+
+
+def make_rows(rng: np.random.Generator, start: int, n: int, codes: np.ndarray, seed_codes: np.ndarray, seed_rate: float) -> pd.DataFrame:
+    def draw(size: int) -> np.ndarray:
+        picked = rng.choice(codes, size)
+        from_seed = rng.random(size) < seed_rate
+        picked[from_seed] = rng.choice(seed_codes, int(from_seed.sum()))
+        return picked
+
+    ids = np.arange(start, start + n)
+    n_sec = np.where(rng.random(n) < 0.5, 0, np.minimum(rng.geometric(0.25, n), 12))
+    flat = draw(int(n_sec.sum()))
+    bounds = np.concatenate([[0], np.cumsum(n_sec)])
+    secondary = [",".join(flat[bounds[i] : bounds[i + 1]]) if n_sec[i] else "" for i in range(n)]
+    uf = rng.choice(UFS, n, p=UF_WEIGHTS / UF_WEIGHTS.sum())
+    df = pd.DataFrame({c: "" for c in ESTAB_LAYOUT}, index=range(n))
+    df["cnpj_basico"] = [f"{i:08d}" for i in ids]
+    df["cnpj_ordem"] = "0001"
+    df["cnpj_dv"] = [f"{i % 97:02d}" for i in ids]
+    df["identificador_matriz_filial"] = "1"
+    df["nome_fantasia"] = [f"{NOMES[i % len(NOMES)]} {i}" for i in ids]
+    df["situacao_cadastral"] = rng.choice(SITUACOES, n, p=SIT_WEIGHTS / SIT_WEIGHTS.sum())
+    df["data_situacao_cadastral"] = "20200101"
+    df["data_inicio_atividade"] = [f"{2000 + i % 24}{1 + i % 12:02d}{1 + i % 28:02d}" for i in ids]
+    df["cnae_fiscal_principal"] = draw(n)
+    df["cnae_fiscal_secundaria"] = secondary
+    df["tipo_logradouro"] = "RUA"
+    df["logradouro"] = [f"DAS FLORES {i % 500}" for i in ids]
+    df["numero"] = [str(i % 2000) for i in ids]
+    df["bairro"] = "CENTRO"
+    df["cep"] = [f"{30000000 + i % 9000000:08d}" for i in ids]
+    df["uf"] = uf
+    df["municipio"] = [f"{4000 + i % 5570:04d}" for i in ids]
+    df["ddd_1"] = "32"
+    df["telefone_1"] = [f"3{i % 10000000:07d}" for i in ids]
+    df["correio_eletronico"] = [f"contato{i}@exemplo.com.br" if i % 3 == 0 else "" for i in ids]
+    return df
+
+
+def write_part(path: Path, rows_iter, as_zip: bool) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    member = path.with_suffix(".ESTABELE").name if as_zip else None
+    if as_zip:
+        zf = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        fh = zf.open(member, "w")
+    else:
+        fh = open(path, "wb")
+    try:
+        for df in rows_iter:
+            # Formato do dump oficial: todos os campos entre aspas, sem header.
+            fh.write(df.to_csv(sep=";", header=False, index=False, quoting=1).encode("latin-1", errors="replace"))
+    finally:
+        fh.close()
+        if as_zip:
+            zf.close()
+
+
+def main() -> int:
+    args = parse_args()
+    lookup = pd.read_csv(REPO_ROOT / args.lookup, sep=";", dtype=str)
+    codes = lookup["subclasse_num7"].dropna().astype(str).to_numpy()
+    seed_codes = np.array(sorted(CnaeIndex.compile(REPO_ROOT / args.lookup, REPO_ROOT / args.seed).seed7()))
+    rng = np.random.default_rng(args.random_state)
+
+    parts = max(1, args.parts)
+    per_part = -(-args.rows // parts)
+    start = 0
+    for part in range(parts):
+        n_part = min(per_part, args.rows - start)
+        if n_part <= 0:
+            break
+        if args.out and parts == 1 and not args.zip:
+            path = Path(args.out)
+        else:
+            path = Path(args.out_dir) / f"Estabelecimentos{part}.{'zip' if args.zip else 'csv'}"
+
+        def rows_iter(offset=start, total=n_part):
+            done = 0
+            while done < total:
+                n = min(args.chunksize, total - done)
+                yield make_rows(rng, offset + done, n, codes, seed_codes, args.seed_rate)
+                done += n
+
+        write_part(path, rows_iter(), args.zip)
+        print(f"OK -> {path} | linhas: {n_part}", flush=True)
+        start += n_part
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
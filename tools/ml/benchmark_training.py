@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Benchmark retraining scalability on synthetic leads/events.
+
+Synthesizes leads + events that follow the categorical and behavioural
+distributions of the reference dataset, aggregates them exactly like
+`TRAINING_SQL` in `scoring_service/app/ml_retrain.py`, and runs
+`train_models_from_dataframe` for each (size, search_mode).
+
+Each case runs in a fresh subprocess so peak RSS / CPU time are not polluted
+by previous cases. Results are written to:
+- <output-dir>/training_benchmark_<timestamp>.json (full run)
+- <output-dir>/training_benchmark_results.csv (appended, one row per case)
+
+Examples:
+  python tools/ml/benchmark_training.py --sizes 10000 --search-modes quick
+  python tools/ml/benchmark_training.py --sizes 10000,100000,1000000 --timeout-sec 7200
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SCORING_SERVICE_DIR = REPO_ROOT / "scoring_service"
+
+TARGET_COL = "label_qualified"
+PROFILE_COLS = ["uf", "cidade", "segmento_interesse", "orcamento_faixa", "prazo_compra"]
+# Colunas de perfil re-sorteadas pela marginal para evitar copias exatas do dataset de referencia.
+MIXED_PROFILE_COLS = ["segmento_interesse", "orcamento_faixa", "prazo_compra"]
+OTHER_EVENT_TYPES = ["form_submit", "whatsapp_reply", "asked_price", "proposal_click"]
+CSV_FIELDS = [
+    "label",
+    "started_at",
+    "rows",
+    "events",
+    "search_mode",
+    "status",
+    "gen_sec",
+    "wall_sec",
+    "cpu_sec",
+    "cpu_utilization",
+    "peak_rss_mb",
+    "model_size_bytes",
+    "winner",
+    "test_roc_auc",
+    "error",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark lead-scoring retraining on synthetic data.")
+    parser.add_argument(
+        "--reference-csv",
+        default="data/ml/lead_scoring_dataset.csv",
+        help="Dataset used as distribution reference for the generator.",
+    )
+    parser.add_argument(
+        "--sizes",
+        default="10000,100000,1000000",
+        help="Comma-separated number of synthetic leads per case.",
+    )
+    parser.add_argument(
+        "--search-modes",
+        default="quick,full",
+        help="Comma-separated search modes passed to train_models_from_dataframe.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default="data/ml/benchmarks",
+        help="Directory for JSON/CSV results.",
+    )
+    parser.add_argument(
+        "--label",
+        default="",
+        help="Label stored with results (default: current git commit).",
+    )
+    parser.add_argument(
+        "--random-state",
+        type=int,
+        default=42,
+        help="Seed for the generator and the training split.",
+    )
+    parser.add_argument(
+        "--timeout-sec",
+        type=float,
+        default=0,
+        help="Per-case timeout in seconds (0 = no timeout).",
+    )
+    parser.add_argument("--worker-case", default="", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def load_reference(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    missing = set(PROFILE_COLS + ["status", "n_events", "n_page_view", "n_hook_complete", "n_cta_click"]).difference(
+        df.columns
+    )
+    if missing:
+        raise ValueError(f"Reference dataset missing columns: {sorted(missing)}")
+    if TARGET_COL not in df.columns:
+        df[TARGET_COL] = df["status"].astype(str).str.upper().isin(["QUALIFICADO", "ENVIADO"]).astype(int)
+    for col in PROFILE_COLS + ["status"]:
+        df[col] = df[col].fillna("").astype(str)
+    return df
+
+
+def synthesize_leads_and_events(
+    reference: pd.DataFrame,
+    n_leads: int,
+    seed: int,
+    now: datetime,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Gera leads + eventos sinteticos.
+
+    - label sorteado com a taxa de qualificados da referencia
+    - perfil (uf/cidade juntos) e contagens de eventos amostrados de linhas da referencia com o mesmo label
+    - 30% das colunas de perfil comerciais re-sorteadas pela marginal para diversificar combinacoes
+    - timestamps: evento mais recente = now - recencia amostrada; os demais espalhados para tras
+    """
+    rng = np.random.default_rng(seed)
+    labels = (rng.random(n_leads) < float(reference[TARGET_COL].mean())).astype(int)
+
+    profile_idx = np.empty(n_leads, dtype=np.int64)
+    behaviour_idx = np.empty(n_leads, dtype=np.int64)
+    for label in (0, 1):
+        pool = np.flatnonzero(reference[TARGET_COL].to_numpy() == label)
+        mask = labels == label
+        profile_idx[mask] = rng.choice(pool, size=int(mask.sum()))
+        behaviour_idx[mask] = rng.choice(pool, size=int(mask.sum()))
+
+    leads = reference.iloc[profile_idx][PROFILE_COLS + ["status"]].reset_index(drop=True)
+    for col in MIXED_PROFILE_COLS:
+        swap = rng.random(n_leads) < 0.30
+        leads.loc[swap, col] = rng.choice(reference[col].to_numpy(), size=int(swap.sum()))
+    leads.insert(0, "lead_id", [f"synthetic-{seed}-{i:08d}" for i in range(n_leads)])
+
+    behaviour = reference.iloc[behaviour_idx]
+    n_page_view = behaviour["n_page_view"].fillna(0).to_numpy(dtype=np.int64)
+    n_hook = behaviour["n_hook_complete"].fillna(0).to_numpy(dtype=np.int64)
+    n_cta = behaviour["n_cta_click"].fillna(0).to_numpy(dtype=np.int64)
+    n_events = np.maximum(behaviour["n_events"].fillna(0).to_numpy(dtype=np.int64), n_page_view + n_hook + n_cta)
+
+    if "recency_last_event_hours" in reference.columns:
+        recency = behaviour["recency_last_event_hours"].fillna(9999).to_numpy(dtype=float)
+    else:
+        recency = rng.uniform(0, 3000, size=n_leads)
+    recency = np.clip(recency + rng.normal(0, 24, size=n_leads), 0, None)
+
+    total = int(n_events.sum())
+    lead_pos = np.repeat(np.arange(n_leads), n_events)
+    starts = np.repeat(np.cumsum(n_events) - n_events, n_events)
+    pos = np.arange(total) - starts
+    pv_end = np.repeat(n_page_view, n_events)
+    hook_end = pv_end + np.repeat(n_hook, n_events)
+    cta_end = hook_end + np.repeat(n_cta, n_events)
+    event_type = np.select(
+        [pos < pv_end, pos < hook_end, pos < cta_end],
+        [
+            np.array("page_view", dtype=object),
+            np.array("hook_complete", dtype=object),
+            np.where(rng.random(total) < 0.5, "cta_click", "whatsapp_click").astype(object),
+        ],
+        default=rng.choice(OTHER_EVENT_TYPES, size=total).astype(object),
+    )
+
+    # Posicao 0 de cada lead recebe offset zero para que MAX(ts) reproduza a recencia amostrada.
+    offset_hours = np.where(pos == 0, 0.0, rng.exponential(48.0, size=total)) + np.repeat(recency, n_events)
+    ts = pd.Timestamp(now) - pd.to_timedelta(offset_hours, unit="h")
+
+    events = pd.DataFrame(
+        {
+            "lead_id": leads["lead_id"].to_numpy()[lead_pos],
+            "event_type": event_type,
+            "ts": ts,
+        }
+    )
+    return leads, events
+
+
+def build_training_frame(leads: pd.DataFrame, events: pd.DataFrame, now: datetime) -> pd.DataFrame:
+    """Agrega eventos por lead com a mesma semantica do TRAINING_SQL do servico de scoring."""
+    etype = events["event_type"]
+    agg = (
+        events.assign(
+            is_page_view=(etype == "page_view").astype(int),
+            is_hook=(etype == "hook_complete").astype(int),
+            is_cta=etype.isin(["cta_click", "whatsapp_click"]).astype(int),
+        )
+        .groupby("lead_id", sort=False)
+        .agg(
+            n_events=("event_type", "size"),
+            n_page_view=("is_page_view", "sum"),
+            n_hook_complete=("is_hook", "sum"),
+            n_cta_click=("is_cta", "sum"),
+            last_event_at=("ts", "max"),
+        )
+    )
+    agg["recency_last_event_hours"] = (pd.Timestamp(now) - agg["last_event_at"]).dt.total_seconds() / 3600.0
+
+    df = leads.merge(agg, how="left", left_on="lead_id", right_index=True)
+    for col in ["n_events", "n_page_view", "n_hook_complete", "n_cta_click"]:
+        df[col] = df[col].fillna(0).astype(int)
+    df["recency_last_event_hours"] = df["recency_last_event_hours"].fillna(9999)
+    df[TARGET_COL] = df["status"].str.upper().isin(["QUALIFICADO", "ENVIADO"]).astype(int)
+    return df
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux reporta KiB; macOS reporta bytes.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _cpu_seconds() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _model_size_bytes(*models: Any) -> int:
+    total = 0
+    for model in models:
+        if model is None:
+            continue
+        buf = io.BytesIO()
+        joblib.dump(model, buf)
+        total += buf.getbuffer().nbytes
+    return total
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa um caso no processo atual (chamado pelo subprocesso worker)."""
+    sys.path.insert(0, str(SCORING_SERVICE_DIR))
+    from app.ml_retrain import train_models_from_dataframe
+
+    now = datetime.now(timezone.utc)
+    reference = load_reference(Path(case["reference_csv"]))
+
+    gen_started = time.perf_counter()
+    leads, events = synthesize_leads_and_events(reference, int(case["rows"]), int(case["random_state"]), now)
+    dataset = build_training_frame(leads, events, now)
+    n_events = int(len(events))
+    del leads, events
+    gen_sec = time.perf_counter() - gen_started
+
+    cpu_started = _cpu_seconds()
+    wall_started = time.perf_counter()
+    artifacts = train_models_from_dataframe(
+        dataset,
+        random_state=int(case["random_state"]),
+        search_mode=case["search_mode"],
+    )
+    wall_sec = time.perf_counter() - wall_started
+    cpu_sec = _cpu_seconds() - cpu_started
+
+    winner_metrics = next(
+        (m for m in artifacts.report.get("metrics", []) if m.get("model") == artifacts.winner_id),
+        {},
+    )
+    return {
+        "status": "ok",
+        "events": n_events,
+        "gen_sec": round(gen_sec, 3),
+        "wall_sec": round(wall_sec, 3),
+        "cpu_sec": round(cpu_sec, 3),
+        "cpu_utilization": round(cpu_sec / wall_sec, 3) if wall_sec > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "model_size_bytes": _model_size_bytes(artifacts.best_model, artifacts.runner_up_model),
+        "winner": artifacts.winner_id,
+        "test_roc_auc": winner_metrics.get("test_roc_auc"),
+    }
+
+
+def spawn_case(case: Dict[str, Any], timeout_sec: float) -> Dict[str, Any]:
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--worker-case", json.dumps(case)]
+    try:
+        proc = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=timeout_sec if timeout_sec > 0 else None,
+        )
+    except subprocess.TimeoutExpired:
+        return {"status": "timeout", "error": f"exceeded {timeout_sec:.0f}s"}
+
+    lines = [line for line in (proc.stdout or "").splitlines() if line.strip()]
+    if proc.returncode != 0 or not lines:
+        err = (proc.stderr or proc.stdout or "unknown error").strip().splitlines()
+        return {"status": "error", "error": err[-1] if err else "unknown error"}
+    return json.loads(lines[-1])
+
+
+def git_label() -> str:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=REPO_ROOT,
+        )
+        return proc.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def append_csv(path: Path, rows: List[Dict[str, Any]]) -> None:
+    write_header = not path.exists()
+    with path.open("a", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> int:
+    args = parse_args()
+
+    if args.worker_case:
+        print(json.dumps(run_case(json.loads(args.worker_case))))
+        return 0
+
+    reference_csv = Path(args.reference_csv)
+    if not reference_csv.exists():
+        print(f"Reference dataset not found: {reference_csv}", file=sys.stderr)
+        return 2
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    modes = [x.strip().lower() for x in args.search_modes.split(",") if x.strip()]
+    label = args.label or git_label()
+    started_at = datetime.now(timezone.utc).isoformat()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results: List[Dict[str, Any]] = []
+    for rows in sizes:
+        for mode in modes:
+            case = {
+                "reference_csv": str(reference_csv.resolve()),
+                "rows": rows,
+                "search_mode": mode,
+                "random_state": args.random_state,
+            }
+            print(f">>> rows={rows} search_mode={mode}", flush=True)
+            outcome = spawn_case(case, args.timeout_sec)
+            result = {"label": label, "started_at": started_at, "rows": rows, "search_mode": mode, **outcome}
+            results.append(result)
+            print(
+                f"    status={result.get('status')} wall={result.get('wall_sec', '-')}s "
+                f"cpu_util={result.get('cpu_utilization', '-')} rss={result.get('peak_rss_mb', '-')}MB "
+                f"size={result.get('model_size_bytes', '-')}B auc={result.get('test_roc_auc', '-')}",
+                flush=True,
+            )
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    json_path = output_dir / f"training_benchmark_{stamp}.json"
+    csv_path = output_dir / "training_benchmark_results.csv"
+    payload = {
+        "label": label,
+        "started_at": started_at,
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "reference_csv": str(reference_csv),
+        "results": results,
+    }
+    json_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    append_csv(csv_path, results)
+
+    print("\nResults:")
+    print(f"- {json_path}")
+    print(f"- {csv_path}")
+    return 1 if any(r.get("status") != "ok" for r in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
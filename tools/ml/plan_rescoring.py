@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Selective rescoring after a retrain, prioritized by the chance of a status change.
+
+`/admin/retrain` only affects new scores; stored scores keep coming from the
+previous model. This planner converges them without a full backfill:
+
+1. Sample: takes --sample-size ML-scored leads whose `score_meta.model_version`
+   differs from the active model (report `trained_at`) and scores the same current
+   feature rows with the previous champion and with the new one. The previous
+   champion comes from --previous-artifacts-dir or from the training registry run
+   whose `trained_at` matches the stored `model_version`; leads whose old model is
+   not found fall back to the stored score (counted in `shift.baseline`).
+2. Band: the --quantile of |new - old| on the sample is the distance to the
+   40/70 thresholds within which a lead may change status.
+3. Plan: stale leads within the band are processed first, nearest threshold
+   first; --include-rest adds the remaining stale leads after them.
+
+CRM-managed leads are left out (the write keeps their score), and ENVIADO leads
+are rescored but never counted as status changes (the write keeps their status).
+
+Without --apply only the plan (sample stats + estimated counts) is printed and
+saved to --output. With --apply the planned leads are rescored in pages (same
+policy as /score, COPY + single UPDATE per page); --only-moving writes only the
+leads whose score actually changed by at least --min-delta points.
+
+Examples:
+  python tools/ml/plan_rescoring.py
+  python tools/ml/plan_rescoring.py --apply
+  python tools/ml/plan_rescoring.py --apply --only-moving --include-rest
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from backfill_lead_scores import (
+    CRM_MANAGED_SQL,
+    DEFAULT_DATABASE_URL,
+    DIRECT_PAGE_SQL,
+    DIRECT_STAGE_SQL,
+    ENSURE_SCORE_SCHEMA_SQL,
+    _normalize_db_url,
+    build_where,
+    fmt_duration,
+    load_direct_scorer,
+    score_direct_page,
+    write_direct_page,
+)
+
+try:
+    import psycopg
+except ImportError:  # pragma: no cover
+    psycopg = None
+
+DEFAULT_OUTPUT = "data/ml/rescoring_plan.json"
+# Leads com score ML gravado por outra versao de modelo (ou antes do versionamento). Scores de
+# regras/fallback ou do CRM ficam de fora: o retreino nao muda esses scores.
+STALE_SQL = (
+    "l.score IS NOT NULL AND lower(l.score_engine) = 'ml' "
+    "AND COALESCE(l.score_meta->>'model_version', '') <> %(version)s "
+    f"AND NOT COALESCE({CRM_MANAGED_SQL}, false)"
+)
+# Status que a escrita preserva: o lead e recalculado, mas nao conta como mudanca de status.
+STICKY_STATUS = "ENVIADO"
+DISTANCE_SQL = "LEAST(ABS(l.score - %(warming)s), ABS(l.score - %(qualified)s))"
+SAMPLE_SQL = f"""
+SELECT l.id::text AS id, l.score, l.status, COALESCE(l.score_meta->>'model_version', '') AS model_version
+FROM leads l
+WHERE {STALE_SQL}
+ORDER BY random()
+LIMIT %(limit)s
+"""
+COUNT_SQL = f"""
+SELECT
+  COUNT(*)::int AS stale,
+  COUNT(*) FILTER (WHERE {DISTANCE_SQL} <= %(band)s)::int AS near_threshold
+FROM leads l
+WHERE {STALE_SQL}
+"""
+# Keyset em (distancia ao limiar, id): leads mais perto de 40/70 primeiro.
+PLAN_PAGE_SQL = f"""
+SELECT l.id::text AS id, l.score, l.status, {DISTANCE_SQL} AS distance
+FROM leads l
+WHERE {STALE_SQL}
+  AND {DISTANCE_SQL} BETWEEN %(min_distance)s AND %(max_distance)s
+  AND ({DISTANCE_SQL}, l.id) > (%(after_distance)s, %(after_id)s::uuid)
+ORDER BY distance, l.id
+LIMIT %(limit)s
+"""
+NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Plan and run selective rescoring after a model retrain.")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL),
+        help="Postgres URL (default: env DATABASE_URL).",
+    )
+    parser.add_argument(
+        "--artifacts-dir",
+        default="data/ml/artifacts",
+        help="Directory with the (new) scoring joblib artifacts.",
+    )
+    parser.add_argument(
+        "--previous-artifacts-dir",
+        default="",
+        help=(
+            "Artifacts of the model that wrote the stale scores "
+            "(default: registry run matching each lead's model_version)."
+        ),
+    )
+    parser.add_argument(
+        "--registry-dir",
+        default="",
+        help="Training registry used to find previous champions (default: <artifacts-dir>/registry).",
+    )
+    parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=2000,
+        help="Stale leads rescored to estimate the score shift.",
+    )
+    parser.add_argument(
+        "--quantile",
+        type=float,
+        default=0.95,
+        help="Quantile of |score shift| on the sample used as the threshold band.",
+    )
+    parser.add_argument(
+        "--min-band",
+        type=int,
+        default=2,
+        help="Lower bound for the band (in score points).",
+    )
+    parser.add_argument(
+        "--include-rest",
+        action="store_true",
+        help="After the near-threshold leads, also rescore the remaining stale leads.",
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Rescore and write the planned leads (default: only print/save the plan).",
+    )
+    parser.add_argument(
+        "--only-moving",
+        action="store_true",
+        help="With --apply, write only leads whose score moves by at least --min-delta.",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=int,
+        default=1,
+        help="Minimum |score change| considered a move (with --only-moving).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Leads per page (score + UPDATE).",
+    )
+    parser.add_argument(
+        "--max-leads",
+        type=int,
+        default=0,
+        help="Stop after N planned leads (0 = no limit).",
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT,
+        help="JSON file with the plan and the run summary.",
+    )
+    return parser.parse_args()
+
+
+def quantile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = min(len(ordered) - 1, max(0, int(math.ceil(q * len(ordered))) - 1))
+    return float(ordered[pos])
+
+
+def fetch_features(conn: Any, lead_ids: List[str]) -> List[Dict[str, Any]]:
+    where_clause, params = build_where(False, None, lead_ids)
+    with conn.cursor() as cur:
+        cur.execute(DIRECT_PAGE_SQL.format(where_clause=where_clause), params + [len(lead_ids)])
+        columns = [d.name for d in cur.description]
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+    conn.commit()
+    return rows
+
+
+def rescore(conn: Any, stored: List[Dict[str, Any]], scorer: Tuple[Any, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+    """Devolve (linha de features, resultado novo, linha gravada) na ordem das features."""
+    lead_cls, score_fn = scorer
+    by_id = {row["id"]: row for row in stored}
+    rows = fetch_features(conn, list(by_id))
+    scored = score_direct_page(rows, lead_cls, score_fn)
+    return [(row, result, by_id[row["id"]]) for row, result in zip(rows, scored)]
+
+
+def find_registry_run(registry_dir: Path, version: str) -> Optional[Path]:
+    """Diretorio do run do registry de treinos cujo `trained_at` e `version` (formato atual)."""
+    from app.ml_retrain import REGISTRY_FORMAT_VERSION, TRAINING_REGISTRY_FILE
+
+    try:
+        runs = json.loads((registry_dir / TRAINING_REGISTRY_FILE).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    for run in reversed(runs if isinstance(runs, list) else []):
+        if run.get("trained_at") != version or run.get("format_version") != REGISTRY_FORMAT_VERSION:
+            continue
+        run_dir = registry_dir / str(run.get("artifact", ""))
+        if run_dir.is_dir():
+            return run_dir
+    return None
+
+
+def load_previous_scorers(
+    versions: List[str],
+    scorer: Tuple[Any, Any],
+    args: argparse.Namespace,
+) -> Dict[str, Optional[Tuple[Any, Any]]]:
+    """Scorer do campeao anterior por model_version gravado (None quando o modelo nao foi achado)."""
+    from app.main import load_champion_dir
+
+    lead_cls, score_fn = scorer
+    if args.previous_artifacts_dir:
+        champion = load_champion_dir(args.previous_artifacts_dir)
+        previous = (lead_cls, partial(score_fn, champion=champion)) if champion["best_model"] is not None else None
+        return {version: previous for version in versions}
+
+    registry_dir = Path(args.registry_dir) if args.registry_dir else Path(args.artifacts_dir) / "registry"
+    scorers: Dict[str, Optional[Tuple[Any, Any]]] = {}
+    for version in versions:
+        run_dir = find_registry_run(registry_dir, version) if version else None
+        champion = load_champion_dir(str(run_dir)) if run_dir is not None else None
+        if champion is None or champion["best_model"] is None:
+            scorers[version] = None
+            continue
+        scorers[version] = (lead_cls, partial(score_fn, champion=champion))
+    return scorers
+
+
+def estimate_shift(
+    conn: Any,
+    params: Dict[str, Any],
+    scorer: Tuple[Any, Any],
+    args: argparse.Namespace,
+    thresholds: Tuple[int, int],
+) -> Dict[str, Any]:
+    """
+    Compara campeao anterior x campeao novo nas mesmas linhas de features de uma amostra de
+    leads desatualizados; sem o modelo anterior, compara com o score gravado.
+    """
+    sample = [
+        dict(zip(("id", "score", "status", "model_version"), row))
+        for row in conn.execute(SAMPLE_SQL, {**params, "limit": max(0, args.sample_size)}).fetchall()
+    ]
+    conn.commit()
+    if not sample:
+        return {"sample_size": 0, "band": args.min_band}
+
+    by_version: Dict[str, List[Dict[str, Any]]] = {}
+    for row in sample:
+        by_version.setdefault(row["model_version"], []).append(row)
+    previous_scorers = load_previous_scorers(sorted(by_version), scorer, args)
+
+    shifts: List[float] = []
+    status_changes = 0
+    status_comparable = 0
+    moved_distances: List[float] = []
+    baseline = {"previous_champion": 0, "stored_score": 0}
+    for version, rows in by_version.items():
+        previous = previous_scorers.get(version)
+        for start in range(0, len(rows), max(1, args.batch_size)):
+            triples = rescore(conn, rows[start : start + args.batch_size], scorer)
+            if previous is not None:
+                before = score_direct_page([row for row, _result, _old in triples], *previous)
+                baseline["previous_champion"] += len(triples)
+            else:
+                before = [old for _row, _result, old in triples]
+                baseline["stored_score"] += len(triples)
+            for (_row, result, old), prev in zip(triples, before):
+                shift = abs(int(result["score"]) - int(prev["score"]))
+                shifts.append(shift)
+                if old["status"] == STICKY_STATUS:
+                    continue
+                status_comparable += 1
+                if result["status"] != prev["status"]:
+                    status_changes += 1
+                    moved_distances.append(min(abs(int(old["score"]) - t) for t in thresholds))
+
+    band = max(args.min_band, int(math.ceil(quantile(shifts, args.quantile))))
+    return {
+        "sample_size": len(shifts),
+        "mean_abs_shift": round(sum(shifts) / len(shifts), 3),
+        "p50_abs_shift": quantile(shifts, 0.50),
+        "p95_abs_shift": quantile(shifts, 0.95),
+        "max_abs_shift": max(shifts),
+        "status_change_rate": round(status_changes / status_comparable, 4) if status_comparable else None,
+        # Quanto dos leads que mudaram de status estava dentro da faixa escolhida.
+        "status_changes_within_band": (
+            round(sum(1 for d in moved_distances if d <= band) / len(moved_distances), 4) if moved_distances else None
+        ),
+        "quantile": args.quantile,
+        "band": band,
+        # Quantos leads da amostra foram comparados com o modelo anterior x com o score gravado.
+        "baseline": baseline,
+    }
+
+
+def iter_plan_pages(conn: Any, params: Dict[str, Any], min_distance: int, max_distance: int, batch_size: int):
+    after = (-1, NIL_UUID)
+    while True:
+        page_params = {
+            **params,
+            "min_distance": min_distance,
+            "max_distance": max_distance,
+            "after_distance": after[0],
+            "after_id": after[1],
+            "limit": max(1, batch_size),
+        }
+        with conn.cursor() as cur:
+            cur.execute(PLAN_PAGE_SQL, page_params)
+            rows = [dict(zip(("id", "score", "status", "distance"), row)) for row in cur.fetchall()]
+        conn.commit()
+        if not rows:
+            return
+        yield rows
+        after = (rows[-1]["distance"], rows[-1]["id"])
+
+
+def apply_plan(
+    conn: Any,
+    write_conn: Any,
+    params: Dict[str, Any],
+    tiers: List[Tuple[str, int, int]],
+    scorer: Tuple[Any, Any],
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    counters = {"rescored": 0, "written": 0, "moved": 0, "status_changed": 0}
+    started = time.time()
+    # Com --apply os leads reescritos saem do filtro "desatualizado": o keyset continua valido.
+    for tier_name, min_distance, max_distance in tiers:
+        for page in iter_plan_pages(conn, params, min_distance, max_distance, args.batch_size):
+            if args.max_leads > 0:
+                page = page[: max(0, args.max_leads - counters["rescored"])]
+                if not page:
+                    break
+            triples = rescore(conn, page, scorer)
+            to_write_rows: List[Dict[str, Any]] = []
+            to_write_results: List[Dict[str, Any]] = []
+            for row, result, old in triples:
+                delta = abs(int(result["score"]) - int(old["score"]))
+                moved = delta >= max(1, args.min_delta)
+                counters["moved"] += int(moved)
+                counters["status_changed"] += int(
+                    old["status"] != STICKY_STATUS and result["status"] != old["status"]
+                )
+                if moved or not args.only_moving:
+                    to_write_rows.append(row)
+                    to_write_results.append(result)
+            counters["rescored"] += len(triples)
+            if to_write_rows:
+                counters["written"] += write_direct_page(write_conn, to_write_rows, to_write_results)
+
+            elapsed = max(1e-9, time.time() - started)
+            print(
+                f"[{tier_name}] distance<={page[-1]['distance']} rescored={counters['rescored']} "
+                f"written={counters['written']} status_changed={counters['status_changed']} "
+                f"rate={counters['rescored'] / elapsed:.1f} leads/s",
+                flush=True,
+            )
+            if args.max_leads > 0 and counters["rescored"] >= args.max_leads:
+                return {**counters, "elapsed_sec": round(time.time() - started, 3)}
+    return {**counters, "elapsed_sec": round(time.time() - started, 3)}
+
+
+def main() -> int:
+    args = parse_args()
+    if psycopg is None:
+        print("psycopg is required: pip install 'psycopg[binary]'", file=sys.stderr)
+        return 2
+
+    scorer = load_direct_scorer(Path(args.artifacts_dir))
+    from app.main import MODEL_VERSION, QUALIFIED_THRESHOLD, WARMING_THRESHOLD
+
+    if not MODEL_VERSION:
+        print("Active model has no version (missing trained_at in model_selection_report.json).", file=sys.stderr)
+        return 2
+
+    params = {"version": MODEL_VERSION, "warming": WARMING_THRESHOLD, "qualified": QUALIFIED_THRESHOLD}
+    db_url = _normalize_db_url(args.database_url)
+    try:
+        conn = psycopg.connect(db_url)
+    except Exception as e:
+        print(f"Error connecting to database: {e}", file=sys.stderr)
+        return 2
+
+    started = time.time()
+    with conn:
+        shift = estimate_shift(conn, params, scorer, args, (WARMING_THRESHOLD, QUALIFIED_THRESHOLD))
+        band = int(shift["band"])
+        counts = conn.execute(COUNT_SQL, {**params, "band": band}).fetchone()
+        conn.commit()
+        stale, near = (int(counts[0]), int(counts[1])) if counts else (0, 0)
+
+        tiers = [("near_threshold", 0, band)]
+        if args.include_rest:
+            tiers.append(("rest", band + 1, 100))
+
+        plan = {
+            "model_version": MODEL_VERSION,
+            "thresholds": [WARMING_THRESHOLD, QUALIFIED_THRESHOLD],
+            "shift": shift,
+            "stale_leads": stale,
+            "near_threshold_leads": near,
+            "planned_leads": stale if args.include_rest else near,
+            "tiers": [{"name": n, "min_distance": lo, "max_distance": hi} for n, lo, hi in tiers],
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        print("Rescoring plan:")
+        print(f"- model_version: {MODEL_VERSION}")
+        print(f"- stale_leads: {stale}")
+        print(f"- sample: {json.dumps(shift, ensure_ascii=False)}")
+        print(f"- near_threshold (|score - 40/70| <= {band}): {near}")
+        print(f"- planned_leads: {plan['planned_leads']} (include_rest={args.include_rest})")
+
+        if args.apply and plan["planned_leads"]:
+            with psycopg.connect(db_url) as write_conn:
+                with write_conn.cursor() as cur:
+                    cur.execute(ENSURE_SCORE_SCHEMA_SQL)
+                    cur.execute(DIRECT_STAGE_SQL)
+                write_conn.commit()
+                plan["run"] = apply_plan(conn, write_conn, params, tiers, scorer, args)
+            plan["run"]["only_moving"] = bool(args.only_moving)
+
+    elapsed = time.time() - started
+    if args.output:
+        out = Path(args.output)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(plan, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+
+    print("\nSummary:")
+    if "run" in plan:
+        run = plan["run"]
+        print(f"- rescored: {run['rescored']}")
+        print(f"- written: {run['written']} (only_moving={args.only_moving})")
+        print(f"- moved: {run['moved']}")
+        print(f"- status_changed: {run['status_changed']}")
+    elif not args.apply:
+        print("- dry plan only (use --apply to rescore)")
+    print(f"- elapsed: {fmt_duration(elapsed)}")
+    if args.output:
+        print(f"- plan: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
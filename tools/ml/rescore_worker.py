@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Incremental rescoring worker: keeps lead scores fresh as leads/events change.
+
+`backfill_lead_scores.py --only-missing` only fixes leads without diagnostics.
+This worker instead follows a watermark over `events.ts` and `leads.updated_at`
+and rescores every lead whose latest feature change is newer than its
+`score_scored_at`. Only events read by the scoring features count, and a lead
+UPDATE only counts when the profile columns differ from the `profile_hash`
+stored in `score_meta` at scoring time (CRM moves, handoffs and next actions
+are ignored). The write keeps `status` of ENVIADO leads and `status`/`score`
+of CRM-managed ones, and merges `score_meta` instead of replacing it.
+
+Each tick:
+- reads the changes since the watermark (minus --overlap-sec, to catch rows
+  committed late), already filtered to leads that are stale;
+- coalesces bursts: a lead is only rescored after --debounce-sec without new
+  changes, or once its oldest pending change is older than --max-delay-sec;
+- scores ready leads in micro-batches in-process (same policy as /score, via
+  the direct mode of backfill_lead_scores.py) and writes them back with
+  COPY + a single UPDATE per batch;
+- advances the watermark up to the oldest change still pending and persists it
+  in --state-file.
+
+Work is proportional to the change volume since the watermark, not to the
+table size. With --listen, a NOTIFY on that channel (see
+db/migrations/rescore_worker_notify.sql) wakes the worker before --poll-sec.
+
+Examples:
+  python tools/ml/rescore_worker.py
+  python tools/ml/rescore_worker.py --once
+  python tools/ml/rescore_worker.py --listen lead_changed --debounce-sec 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from backfill_lead_scores import (
+    DEFAULT_DATABASE_URL,
+    DIRECT_PAGE_SQL,
+    DIRECT_STAGE_SQL,
+    ENSURE_SCORE_SCHEMA_SQL,
+    FEATURE_EVENT_TYPES,
+    PROFILE_HASH_SQL,
+    _normalize_db_url,
+    build_where,
+    load_direct_scorer,
+    score_direct_page,
+    write_direct_page,
+)
+
+try:
+    import psycopg
+    from psycopg import sql
+except ImportError:  # pragma: no cover
+    psycopg = None
+
+DEFAULT_STATE_FILE = "data/ml/rescore_worker_state.json"
+# Mudancas por lead desde o watermark, ja restritas a leads com score mais antigo que a mudanca.
+# So contam eventos de feature e UPDATEs que mudaram o perfil (hash != o do ultimo score):
+# move no CRM, handoff e proxima acao tocam updated_at/events sem mudar feature nenhuma.
+CHANGES_CTE = """
+WITH changes AS (
+  SELECT e.lead_id AS id, MIN(e.ts) AS first_change, MAX(e.ts) AS last_change
+  FROM events e
+  JOIN leads l ON l.id = e.lead_id
+  WHERE e.ts >= %(since)s
+    AND e.event_type = ANY(%(event_types)s)
+    AND (l.score_scored_at IS NULL OR e.ts > l.score_scored_at)
+  GROUP BY e.lead_id
+  UNION ALL
+  SELECT l.id, l.updated_at, l.updated_at
+  FROM leads l
+  WHERE l.updated_at >= %(since)s
+    AND (
+      l.score_scored_at IS NULL
+      OR (l.updated_at > l.score_scored_at
+          AND {profile_hash} IS DISTINCT FROM l.score_meta->>'profile_hash')
+    )
+),
+stale AS (
+  SELECT id, MIN(first_change) AS first_change, MAX(last_change) AS last_change
+  FROM changes
+  GROUP BY id
+)
+""".format(profile_hash=PROFILE_HASH_SQL.format(t="l"))
+READY_LEADS_SQL = (
+    CHANGES_CTE
+    + """
+SELECT id::text AS id
+FROM stale
+WHERE last_change <= %(now)s - make_interval(secs => %(debounce)s)
+   OR first_change <= %(now)s - make_interval(secs => %(max_delay)s)
+ORDER BY first_change
+LIMIT %(limit)s
+"""
+)
+PENDING_SQL = (
+    CHANGES_CTE
+    + """
+SELECT COUNT(*)::int AS pending, MIN(first_change) AS oldest_change
+FROM stale
+"""
+)
+
+
+@dataclass
+class WorkerState:
+    watermark: Optional[str] = None
+    ticks: int = 0
+    rescored: int = 0
+    last_tick_at: Optional[str] = None
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(asdict(self), indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "WorkerState":
+        if not path.exists():
+            return cls()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rescore leads whose events/profile changed after their last score.")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL),
+        help="Postgres URL (default: env DATABASE_URL).",
+    )
+    parser.add_argument(
+        "--artifacts-dir",
+        default="data/ml/artifacts",
+        help="Directory with the scoring joblib artifacts.",
+    )
+    parser.add_argument(
+        "--state-file",
+        default=DEFAULT_STATE_FILE,
+        help="JSON file with the persisted watermark.",
+    )
+    parser.add_argument(
+        "--initial-lookback-hours",
+        type=float,
+        default=24.0,
+        help="Starting watermark when there is no state file (now - N hours).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=200,
+        help="Leads per micro-batch (score + UPDATE).",
+    )
+    parser.add_argument(
+        "--debounce-sec",
+        type=float,
+        default=10.0,
+        help="Wait this long without new changes before rescoring a lead.",
+    )
+    parser.add_argument(
+        "--max-delay-sec",
+        type=float,
+        default=120.0,
+        help="Rescore a continuously active lead at least this often.",
+    )
+    parser.add_argument(
+        "--overlap-sec",
+        type=float,
+        default=30.0,
+        help="Re-read this window before the watermark to catch rows committed late.",
+    )
+    parser.add_argument(
+        "--poll-sec",
+        type=float,
+        default=5.0,
+        help="Sleep between ticks (upper bound when --listen is set).",
+    )
+    parser.add_argument(
+        "--listen",
+        default="",
+        help="Optional LISTEN channel that wakes the worker early (e.g. lead_changed).",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Run a single tick and exit (cron mode).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report stale leads; do not score or write.",
+    )
+    return parser.parse_args()
+
+
+def fetch_ready_ids(conn: Any, params: Dict[str, Any]) -> List[str]:
+    rows = conn.execute(READY_LEADS_SQL, params).fetchall()
+    conn.commit()
+    return [row[0] for row in rows]
+
+
+def fetch_pending(conn: Any, params: Dict[str, Any]) -> Tuple[int, Optional[datetime]]:
+    row = conn.execute(PENDING_SQL, params).fetchone()
+    conn.commit()
+    return (int(row[0]), row[1]) if row else (0, None)
+
+
+def fetch_feature_rows(conn: Any, lead_ids: List[str]) -> List[Dict[str, Any]]:
+    where_clause, params = build_where(False, None, lead_ids)
+    with conn.cursor() as cur:
+        cur.execute(DIRECT_PAGE_SQL.format(where_clause=where_clause), params + [len(lead_ids)])
+        columns = [d.name for d in cur.description]
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+    conn.commit()
+    return rows
+
+
+def run_tick(conn: Any, args: argparse.Namespace, state: WorkerState, scorer: Optional[Tuple[Any, Any]]) -> Dict[str, Any]:
+    """Uma passada: micro-lotes de leads prontos ate esgotar, depois avanca o watermark."""
+    started = time.time()
+    db_now = conn.execute("SELECT now()").fetchone()[0]
+    conn.commit()
+    since = datetime.fromisoformat(state.watermark) - timedelta(seconds=args.overlap_sec)
+    params = {
+        "since": since,
+        "event_types": FEATURE_EVENT_TYPES,
+        "now": db_now,
+        "debounce": float(args.debounce_sec),
+        "max_delay": float(args.max_delay_sec),
+        "limit": max(1, args.batch_size),
+    }
+
+    rescored = 0
+    batches = 0
+    seen: set = set()
+    while True:
+        lead_ids = [x for x in fetch_ready_ids(conn, params) if x not in seen]
+        if not lead_ids:
+            break
+        # Em dry-run (ou se um lead sumir no meio) nada e gravado: `seen` evita reler o mesmo lote.
+        seen.update(lead_ids)
+        batches += 1
+        if args.dry_run:
+            rescored += len(lead_ids)
+        else:
+            lead_cls, score_fn = scorer
+            rows = fetch_feature_rows(conn, lead_ids)
+            if rows:
+                rescored += write_direct_page(conn, rows, score_direct_page(rows, lead_cls, score_fn))
+        if len(lead_ids) < params["limit"]:
+            break
+
+    pending, oldest_change = fetch_pending(conn, params)
+    # O watermark nunca passa de uma mudanca ainda pendente (em debounce).
+    watermark = db_now if oldest_change is None else min(db_now, oldest_change)
+    if not args.dry_run:
+        state.watermark = watermark.isoformat()
+    state.ticks += 1
+    state.rescored += rescored
+    state.last_tick_at = datetime.now(timezone.utc).isoformat()
+    return {
+        "rescored": rescored,
+        "batches": batches,
+        "pending": pending,
+        "watermark": watermark.isoformat(),
+        "elapsed_sec": round(time.time() - started, 3),
+    }
+
+
+def wait_for_changes(listen_conn: Any, timeout: float, stop: threading.Event) -> int:
+    """Dorme ate `timeout`; com LISTEN acorda na primeira notificacao e drena as demais."""
+    if listen_conn is None:
+        stop.wait(timeout)
+        return 0
+    received = 0
+    deadline = time.monotonic() + timeout
+    # Espera em fatias curtas para atender SIGTERM sem esperar o --poll-sec inteiro.
+    while not received and not stop.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        for _ in listen_conn.notifies(timeout=min(1.0, remaining), stop_after=1):
+            received += 1
+    if received:
+        for _ in listen_conn.notifies(timeout=0.05):
+            received += 1
+    return received
+
+
+def main() -> int:
+    args = parse_args()
+    if psycopg is None:
+        print("psycopg is required: pip install 'psycopg[binary]'", file=sys.stderr)
+        return 2
+
+    state_path = Path(args.state_file)
+    state = WorkerState.load(state_path)
+    if not state.watermark:
+        start = datetime.now(timezone.utc) - timedelta(hours=args.initial_lookback_hours)
+        state.watermark = start.isoformat()
+
+    stop = threading.Event()
+
+    def request_stop(signum: int, _frame: Any) -> None:
+        print(f"Signal {signum} received: stopping after the current tick.", flush=True)
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    scorer = None if args.dry_run else load_direct_scorer(Path(args.artifacts_dir))
+    db_url = _normalize_db_url(args.database_url)
+    listen_conn = None
+    try:
+        conn = psycopg.connect(db_url)
+        if args.listen:
+            listen_conn = psycopg.connect(db_url, autocommit=True)
+            listen_conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(args.listen)))
+    except Exception as e:
+        print(f"Error connecting to database: {e}", file=sys.stderr)
+        return 2
+
+    print("Rescore worker configuration:")
+    print(f"- watermark: {state.watermark}")
+    print(f"- batch_size: {args.batch_size}")
+    print(f"- debounce_sec: {args.debounce_sec} / max_delay_sec: {args.max_delay_sec}")
+    print(f"- listen: {args.listen or '-'} / poll_sec: {args.poll_sec}")
+    print(f"- dry_run: {args.dry_run}", flush=True)
+
+    with conn:
+        if not args.dry_run:
+            with conn.cursor() as cur:
+                cur.execute(ENSURE_SCORE_SCHEMA_SQL)
+                cur.execute(DIRECT_STAGE_SQL)
+            conn.commit()
+
+        while not stop.is_set():
+            try:
+                tick = run_tick(conn, args, state, scorer)
+            except Exception as e:
+                conn.rollback()
+                print(f"[tick] failed: {e}", file=sys.stderr, flush=True)
+                if args.once:
+                    return 1
+            else:
+                if not args.dry_run:
+                    state.save(state_path)
+                if tick["rescored"] or tick["pending"] or args.once:
+                    print(
+                        f"[tick {state.ticks}] rescored={tick['rescored']} batches={tick['batches']} "
+                        f"pending={tick['pending']} watermark={tick['watermark']} elapsed={tick['elapsed_sec']}s",
+                        flush=True,
+                    )
+            if args.once:
+                break
+            wait_for_changes(listen_conn, args.poll_sec, stop)
+
+    if listen_conn is not None:
+        listen_conn.close()
+    print(f"Stopped. total_rescored={state.rescored} ticks={state.ticks}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
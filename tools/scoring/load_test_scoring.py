@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Load test + latency benchmark for the scoring service `/score` endpoint.
+
+Two transports:
+- asgi: imports `scoring_service/app/main.py` in-process and drives it through
+  httpx.ASGITransport (no network, no container).
+- http: sends real HTTP requests to --url; without --url a local uvicorn is
+  started on a free port using the same artifacts.
+
+Both modes run fully offline against the checked-in joblib artifacts
+(--artifacts-dir). For each payload shape (number of events per request) it
+reports p50/p95/p99 latency, RPS and which engine served the requests
+(best_model / runner_up_model / surrogate_model / rules). Percentiles are
+nearest-rank over 200 responses only; non-200 latencies go to error_latency_ms.
+
+Examples:
+  python tools/scoring/load_test_scoring.py
+  python tools/scoring/load_test_scoring.py --transport http --concurrency 16 --events 0,10,1000
+  python tools/scoring/load_test_scoring.py --transport http --url http://localhost:8000 --requests 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SCORING_SERVICE_DIR = REPO_ROOT / "scoring_service"
+
+UFS = ["MG", "SP", "GO", "RJ", "PR"]
+CIDADES = {"MG": "Juiz de Fora", "SP": "Sorocaba", "GO": "Goiania", "RJ": "Niteroi", "PR": "Londrina"}
+SEGMENTOS = ["CAVALOS", "EQUIPAMENTOS", "SERVICOS", "EVENTOS"]
+ORCAMENTOS = ["0-5k", "5k-20k", "20k-60k", "60k+"]
+PRAZOS = ["7d", "30d", "90d"]
+EVENT_TYPES = ["page_view", "page_view", "page_view", "hook_complete", "cta_click", "whatsapp_click"]
+ARTIFACT_ENV = {
+    "SCORING_MODEL_PATH": "lead_scoring_best_model.joblib",
+    "SCORING_RUNNER_UP_MODEL_PATH": "lead_scoring_runner_up_model.joblib",
+    "SCORING_SURROGATE_MODEL_PATH": "lead_scoring_surrogate_model.joblib",
+    "SCORING_CALIBRATION_PATH": "lead_scoring_calibration.json",
+    "SCORING_MODEL_REPORT_PATH": "model_selection_report.json",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the scoring service /score endpoint.")
+    parser.add_argument(
+        "--transport",
+        choices=["asgi", "http"],
+        default="asgi",
+        help="asgi = in-process app; http = real HTTP server.",
+    )
+    parser.add_argument(
+        "--url",
+        default="",
+        help="Base URL of a running scoring service (http transport). Empty = start local uvicorn.",
+    )
+    parser.add_argument(
+        "--artifacts-dir",
+        default="data/ml/artifacts",
+        help="Directory with joblib artifacts used by the in-process/local service.",
+    )
+    parser.add_argument(
+        "--events",
+        default="0,10,1000",
+        help="Comma-separated payload shapes (events per request).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Concurrent in-flight requests.",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=500,
+        help="Measured requests per payload shape.",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=20,
+        help="Unmeasured warmup requests per payload shape.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="Per-request timeout in seconds.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Seed for synthetic payloads.",
+    )
+    parser.add_argument(
+        "--output",
+        default="",
+        help="Optional JSON file for the results.",
+    )
+    return parser.parse_args()
+
+
+def artifact_env(artifacts_dir: Path) -> Dict[str, str]:
+    return {key: str((artifacts_dir / name).resolve()) for key, name in ARTIFACT_ENV.items()}
+
+
+def build_payloads(n_events: int, count: int, seed: int) -> List[Dict[str, Any]]:
+    """Gera payloads variados (perfil + eventos) para evitar medir sempre o mesmo caminho."""
+    rng = random.Random(seed + n_events)
+    now = datetime.now(timezone.utc)
+    payloads = []
+    for i in range(count):
+        uf = rng.choice(UFS)
+        events = [
+            {
+                "event_type": rng.choice(EVENT_TYPES),
+                "ts": (now - timedelta(hours=rng.uniform(0, 2000))).isoformat(),
+            }
+            for _ in range(n_events)
+        ]
+        payloads.append(
+            {
+                "lead": {
+                    "id": f"loadtest-{n_events}-{i}",
+                    "nome": f"Lead carga {i}",
+                    "uf": uf,
+                    "cidade": CIDADES[uf],
+                    "segmento_interesse": rng.choice(SEGMENTOS),
+                    "orcamento_faixa": rng.choice(ORCAMENTOS),
+                    "prazo_compra": rng.choice(PRAZOS),
+                },
+                "events": events,
+            }
+        )
+    return payloads
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    # Nearest-rank: menor valor com pelo menos pct% das amostras ate ele.
+    idx = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def engine_label(body: Any) -> str:
+    meta = body.get("meta") if isinstance(body, dict) else None
+    if not isinstance(meta, dict):
+        return "unknown"
+    if meta.get("engine") == "ml":
+        return str(meta.get("model_name") or "ml")
+    return str(meta.get("engine") or "unknown")
+
+
+async def run_shape(
+    client: "httpx.AsyncClient",
+    payloads: List[Dict[str, Any]],
+    warmup: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    for payload in payloads[:warmup]:
+        await client.post("/score", json=payload)
+
+    measured = payloads[warmup:]
+    latencies: List[float] = []
+    # Respostas de erro costumam voltar bem mais rapido; ficam fora dos percentis das respostas 200.
+    error_latencies: List[float] = []
+    engines: Counter = Counter()
+    errors: Counter = Counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in measured:
+        queue.put_nowait(payload)
+
+    async def worker() -> None:
+        while True:
+            try:
+                payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                resp = await client.post("/score", json=payload)
+            except Exception as exc:
+                errors[type(exc).__name__] += 1
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            if resp.status_code != 200:
+                error_latencies.append(elapsed_ms)
+                errors[f"http_{resp.status_code}"] += 1
+                continue
+            latencies.append(elapsed_ms)
+            engines[engine_label(resp.json())] += 1
+
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    wall_sec = time.perf_counter() - wall_started
+
+    latencies.sort()
+    error_latencies.sort()
+    return {
+        "requests": len(measured),
+        "ok": sum(engines.values()),
+        "errors": dict(errors),
+        "wall_sec": round(wall_sec, 3),
+        "rps": round(len(measured) / wall_sec, 1) if wall_sec > 0 else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "error_latency_ms": {
+            "p50": percentile(error_latencies, 50),
+            "max": error_latencies[-1] if error_latencies else None,
+        },
+        "engines": dict(engines),
+    }
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def start_local_server(artifacts_dir: Path, timeout: float) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {**os.environ, **artifact_env(artifacts_dir)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SCORING_SERVICE_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"uvicorn did not become healthy within {timeout:.0f}s")
+
+
+async def run_all(args: argparse.Namespace, shapes: List[int]) -> Dict[str, Any]:
+    artifacts_dir = Path(args.artifacts_dir)
+    server: Optional[subprocess.Popen] = None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.transport == "asgi":
+        # Variaveis precisam existir antes do import: o app carrega os modelos no import.
+        os.environ.update(artifact_env(artifacts_dir))
+        sys.path.insert(0, str(SCORING_SERVICE_DIR))
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://scoring.local"
+    else:
+        transport = None
+        base_url = args.url.rstrip("/")
+        if not base_url:
+            server, base_url = start_local_server(artifacts_dir, timeout=60.0)
+
+    try:
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url=base_url,
+            timeout=args.timeout,
+            limits=limits,
+        ) as client:
+            health = (await client.get("/health")).json()
+            results = {}
+            for n_events in shapes:
+                payloads = build_payloads(n_events, args.warmup + args.requests, args.seed)
+                results[str(n_events)] = await run_shape(client, payloads, args.warmup, args.concurrency)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    return {"health": health, "results": results, "base_url": base_url}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Transport: {report['transport']}  concurrency={report['concurrency']}  target={report['base_url']}")
+    print(f"ML status: {json.dumps(report['health'].get('ml', {}), ensure_ascii=False)}")
+    print(f"\n{'events':>7} {'reqs':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  engines / errors")
+    for shape, res in report["results"].items():
+        lat = res["latency_ms"]
+
+        def fmt(value: Optional[float]) -> str:
+            return f"{value:9.2f}" if value is not None else f"{'-':>9}"
+
+        extras = json.dumps(res["engines"])
+        if res["errors"]:
+            extras += f" errors={json.dumps(res['errors'])}"
+            if res["error_latency_ms"]["p50"] is not None:
+                extras += f" error_p50_ms={res['error_latency_ms']['p50']:.2f}"
+        print(
+            f"{shape:>7} {res['requests']:>6} {res['rps'] or 0:>9.1f} "
+            f"{fmt(lat['p50'])} {fmt(lat['p95'])} {fmt(lat['p99'])}  {extras}"
+        )
+
+
+def main() -> int:
+    args = parse_args()
+    if httpx is None:
+        print("httpx is required: pip install httpx", file=sys.stderr)
+        return 2
+    if args.transport == "asgi" and args.url:
+        print("--url is only valid with --transport http", file=sys.stderr)
+        return 2
+
+    shapes = [int(x) for x in args.events.split(",") if x.strip()]
+    outcome = asyncio.run(run_all(args, shapes))
+    report = {
+        "transport": args.transport,
+        "concurrency": args.concurrency,
+        "requests_per_shape": args.requests,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        **outcome,
+    }
+    print_report(report)
+
+    if args.output:
+        out = Path(args.output)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\nResults: {out}")
+
+    failed = any(res["errors"] for res in report["results"].values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,13 +10,22 @@ EN:    Growth Equestre (MVP) Streamlit admin panel to monitor leads, scoring, an
 
 import os
 import base64
+import gzip
+import threading
+import time
 import requests
 import streamlit as st
 import json
 import html
+import math
+import tempfile
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.retry import Retry
 
 try:
     import pandas as pd
@@ -26,11 +35,69 @@ except Exception:
     # EN:    Fallback — if pandas is not available, we use Streamlit’s simple tables.
     pd = None
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    # PT-BR: Sem pyarrow, a exportação Parquet some das opções (CSV continua disponível).
+    # ES:    Sin pyarrow, la exportación Parquet desaparece de las opciones (CSV sigue disponible).
+    # EN:    Without pyarrow, the Parquet export is hidden (CSV is still available).
+    pa = pq = None
+
 # PT-BR: URL base do backend (Node/Express). Pode ser sobrescrita via variável de ambiente.
 # ES:    URL base del backend (Node/Express). Puede sobrescribirse con variable de entorno.
 # EN:    Backend base URL (Node/Express). Can be overridden via environment variable.
 BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:3000")
 
+# PT-BR: Pool HTTP compartilhado com o backend (conexões keep-alive reaproveitadas entre reruns).
+# ES:    Pool HTTP compartido con el backend (conexiones keep-alive reutilizadas entre reruns).
+# EN:    Shared HTTP pool to the backend (keep-alive connections reused across reruns).
+HTTP_POOL_SIZE = int(os.environ.get("UI_HTTP_POOL_SIZE", "16"))
+HTTP_RETRIES = int(os.environ.get("UI_HTTP_RETRIES", "2"))
+
+# PT-BR: Cache (TTL) das leituras pesadas; cada rota pertence a um grupo de dados ("tag").
+#        Um POST invalida só os grupos que ele altera (ver mutation_tags).
+# ES:    Caché (TTL) de las lecturas pesadas; cada ruta pertenece a un grupo de datos ("tag").
+#        Un POST invalida solo los grupos que modifica (ver mutation_tags).
+# EN:    TTL cache for read-heavy calls; each route belongs to a data group ("tag").
+#        A POST only invalidates the groups it changes (see mutation_tags).
+CACHE_TTL_SECONDS = int(os.environ.get("UI_CACHE_TTL_SECONDS", "60"))
+CACHED_GET_TAGS = {
+    "/crm/board": ("leads",),
+    "/leads": ("leads",),
+    "/leads/page": ("leads",),
+    "/leads/count": ("leads",),
+    "/partners": ("partners",),
+    "/partners/summary": ("partners",),
+    "/ml/model-info": ("ml",),
+}
+ALL_CACHE_TAGS = ("leads", "partners", "ml")
+# PT-BR: Máximo de chamadas simultâneas quando uma página busca seus dados em paralelo.
+# ES:    Máximo de llamadas simultáneas cuando una página busca sus datos en paralelo.
+# EN:    Max concurrent calls when a page fetches its data in parallel.
+FETCH_MAX_WORKERS = int(os.environ.get("UI_FETCH_WORKERS", "6"))
+# PT-BR: Tamanho das páginas pedidas ao backend ao gerar exportações (memória limitada).
+# ES:    Tamaño de las páginas pedidas al backend al generar exportaciones (memoria acotada).
+# EN:    Page size requested from the backend while building exports (bounded memory).
+EXPORT_PAGE_SIZE = int(os.environ.get("UI_EXPORT_PAGE_SIZE", "500"))
+# PT-BR: Idade máxima dos arquivos de exportação no diretório temporário (sessões encerradas
+#        não apagam os seus); os mais antigos são removidos ao gerar uma nova exportação.
+# ES:    Edad máxima de los archivos de exportación en el directorio temporal (las sesiones
+#        terminadas no borran los suyos); los más antiguos se eliminan al generar otra exportación.
+# EN:    Max age of export files in the temp dir (ended sessions don't delete theirs);
+#        older ones are removed whenever a new export is built.
+EXPORT_TTL_SECONDS = int(os.environ.get("UI_EXPORT_TTL_SECONDS", "3600"))
+EXPORT_PREFIXES = ("leads_", "partners_")
+# PT-BR: Formatos de exportação: rótulo -> (extensão, mime).
+# ES:    Formatos de exportación: etiqueta -> (extensión, mime).
+# EN:    Export formats: label -> (extension, mime).
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+}
+if pq is not None:
+    EXPORT_FORMATS["Parquet"] = (".parquet", "application/vnd.apache.parquet")
+
 
 # =============================================================================
 # UI CONFIG
@@ -48,6 +115,136 @@ st.set_page_config(
 # =============================================================================
 # HELPERS (HTTP + UI)
 # =============================================================================
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """
+    PT-BR: Sessão HTTP única do processo (compartilhada por todos os usuários e reruns),
+           com pool keep-alive e retentativas. GET repete em falha de conexão e em 502/503/504;
+           POST só repete quando a conexão nem chegou a abrir (nada foi enviado).
+    ES:    Sesión HTTP única del proceso (compartida por todos los usuarios y reruns),
+           con pool keep-alive y reintentos. GET reintenta ante fallos de conexión y 502/503/504;
+           POST solo reintenta cuando la conexión ni siquiera se abrió (nada fue enviado).
+    EN:    Single process-wide HTTP session (shared by all users and reruns), with a
+           keep-alive pool and retries. GET retries on connection errors and 502/503/504;
+           POST only retries when the connection never opened (nothing was sent).
+    """
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,
+        status=HTTP_RETRIES,
+        backoff_factor=0.1,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def record_backend_call(method, path, status, elapsed_s, error=None, started_at=None):
+    """
+    PT-BR: Registra uma chamada ao backend no rerun atual (lido pelo painel de debug).
+    ES:    Registra una llamada al backend en el rerun actual (leído por el panel de debug).
+    EN:    Records a backend call in the current rerun (read by the debug panel).
+    """
+    calls = st.session_state.setdefault("backend_calls", [])
+    rerun_started = st.session_state.get("rerun_started")
+    calls.append(
+        {
+            "Método": method,
+            "Rota": path,
+            "Status": str(status) if status is not None else "erro",
+            "Início (ms)": round((started_at - rerun_started) * 1000, 1) if started_at and rerun_started else None,
+            "ms": round(elapsed_s * 1000, 1),
+            "Erro": error or "",
+        }
+    )
+
+
+def backend_request(method, path, timeout=15, **kwargs):
+    """
+    PT-BR: Request no backend pelo pool compartilhado, cronometrado (status e latência vão
+           para o painel de debug). Exceções de rede são repassadas para quem chamou.
+    ES:    Request al backend por el pool compartido, cronometrado (status y latencia van
+           al panel de debug). Las excepciones de red se propagan a quien llamó.
+    EN:    Backend request through the shared pool, timed (status and latency go to the
+           debug panel). Network exceptions propagate to the caller.
+    """
+    t0 = time.perf_counter()
+    status, error = None, None
+    try:
+        r = get_http_session().request(method, f"{BACKEND_URL}{path}", timeout=timeout, **kwargs)
+        status = r.status_code
+        return r
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record_backend_call(method, path, status, time.perf_counter() - t0, error, started_at=t0)
+
+
+@st.cache_resource(show_spinner=False)
+def get_cache_generations():
+    """
+    PT-BR: Geração de cada tag de cache, compartilhada pelo processo. Invalidar = incrementar:
+           a geração entra na chave do cache, então as entradas antigas deixam de ser usadas
+           (e saem pelo TTL) sem afetar as outras tags.
+    ES:    Generación de cada tag de caché, compartida por el proceso. Invalidar = incrementar:
+           la generación forma parte de la clave, así las entradas antiguas dejan de usarse
+           (y salen por TTL) sin afectar a las demás tags.
+    EN:    Process-wide generation per cache tag. Invalidating = incrementing: the
+           generation is part of the cache key, so stale entries stop being used (and
+           expire via TTL) without touching other tags.
+    """
+    return {"lock": threading.Lock(), "gen": {tag: 0 for tag in ALL_CACHE_TAGS}}
+
+
+def invalidate_cache(tags=ALL_CACHE_TAGS):
+    """
+    PT-BR: Invalida as tags informadas (padrão: todas).
+    ES:    Invalida las tags indicadas (por defecto: todas).
+    EN:    Invalidates the given tags (default: all).
+    """
+    generations = get_cache_generations()
+    with generations["lock"]:
+        for tag in tags:
+            generations["gen"][tag] = generations["gen"].get(tag, 0) + 1
+
+
+def mutation_tags(path, payload=None):
+    """
+    PT-BR: Tags de cache alteradas por um POST. Rotas desconhecidas invalidam tudo (seguro).
+    ES:    Tags de caché modificadas por un POST. Rutas desconocidas invalidan todo (seguro).
+    EN:    Cache tags changed by a POST. Unknown routes invalidate everything (safe default).
+    """
+    if path == "/admin/dedup-leads":
+        return () if (payload or {}).get("dry_run") else ("leads",)
+    if path in ("/leads", "/leads/bulk-delete", "/handoff", "/events", "/demo/seed-leads", "/demo/reset-seeded-leads"):
+        return ("leads",)
+    if path.startswith("/crm/"):
+        # /crm/move, /crm/leads/{id}/notes, /crm/apply-rule: mudam etapa/atividade do lead
+        return ("leads",)
+    if path.startswith("/leads/") and path.endswith(("/update", "/score")):
+        return ("leads",)
+    return ALL_CACHE_TAGS
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=256, show_spinner=False)
+def _cached_get(path, params_key, generation, _timeout=15):
+    """
+    PT-BR: GET cacheado por (rota, parâmetros, geração das tags). Erros não são cacheados.
+    ES:    GET en caché por (ruta, parámetros, generación de las tags). Los errores no se cachean.
+    EN:    GET cached by (route, params, tag generation). Errors are not cached.
+    """
+    r = backend_request("GET", path, params=dict(params_key), timeout=_timeout)
+    r.raise_for_status()
+    return r.json()
+
+
 def safe_get(path, params=None, timeout=15):
     """
     PT-BR: Executa um GET no backend com tratamento seguro de erro e retorno padronizado.
@@ -57,10 +254,24 @@ def safe_get(path, params=None, timeout=15):
     EN:    Performs a backend GET with safe error handling and standardized return.
            Returns (json, None) on success or (None, error_message) on failure.
     """
+    tags = CACHED_GET_TAGS.get(path)
     try:
-        r = requests.get(f"{BACKEND_URL}{path}", params=params, timeout=timeout)
-        r.raise_for_status()
-        return r.json(), None
+        if tags is None:
+            r = backend_request("GET", path, params=params, timeout=timeout)
+            r.raise_for_status()
+            return r.json(), None
+
+        generations = get_cache_generations()["gen"]
+        calls_before = len(st.session_state.get("backend_calls") or [])
+        data = _cached_get(
+            path,
+            tuple(sorted((params or {}).items())),
+            tuple(generations.get(tag, 0) for tag in tags),
+            _timeout=timeout,
+        )
+        if len(st.session_state.get("backend_calls") or []) == calls_before:
+            record_backend_call("GET", path, "cache", 0.0, started_at=time.perf_counter())
+        return data, None
     except Exception as e:
         return None, str(e)
 
@@ -76,7 +287,7 @@ def safe_post(path, payload=None, timeout=15):
     """
     r = None
     try:
-        r = requests.post(f"{BACKEND_URL}{path}", json=payload, timeout=timeout)
+        r = backend_request("POST", path, json=payload, timeout=timeout)
         r.raise_for_status()
         return r.json(), None
     except Exception as e:
@@ -85,6 +296,45 @@ def safe_post(path, payload=None, timeout=15):
             return None, f"{e} | body={body}"
         except Exception:
             return None, str(e)
+    finally:
+        # PT-BR: Mesmo em erro o backend pode ter aplicado parte da mudança: invalida sempre.
+        # ES:    Incluso con error el backend pudo aplicar parte del cambio: invalida siempre.
+        # EN:    Even on errors the backend may have applied part of the change: always invalidate.
+        invalidate_cache(mutation_tags(path, payload))
+
+
+def safe_get_many(specs):
+    """
+    PT-BR: Busca em paralelo as dependências de dados de uma página.
+           `specs` = {nome: (rota, params, timeout)}; retorna {nome: (json, erro)} como o safe_get.
+           O tempo da página passa a ser o da chamada mais lenta, não a soma de todas.
+    ES:    Busca en paralelo las dependencias de datos de una página.
+           `specs` = {nombre: (ruta, params, timeout)}; devuelve {nombre: (json, error)} como safe_get.
+           El tiempo de la página pasa a ser el de la llamada más lenta, no la suma de todas.
+    EN:    Fetches a page's data dependencies in parallel.
+           `specs` = {name: (route, params, timeout)}; returns {name: (json, error)} like safe_get.
+           Page time becomes the slowest call instead of the sum of all calls.
+    """
+    if len(specs) <= 1:
+        return {name: safe_get(path, params=params, timeout=timeout) for name, (path, params, timeout) in specs.items()}
+
+    # PT-BR: As threads recebem o contexto do rerun para usar session_state/cache do Streamlit.
+    # ES:    Los threads reciben el contexto del rerun para usar session_state/caché de Streamlit.
+    # EN:    Worker threads get the rerun context so they can use Streamlit session_state/cache.
+    ctx = get_script_run_ctx()
+
+    def run(path, params, timeout):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return safe_get(path, params=params, timeout=timeout)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(FETCH_MAX_WORKERS, len(specs)), thread_name_prefix="ui-fetch") as pool:
+        futures = {name: pool.submit(run, *spec) for name, spec in specs.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    st.session_state.setdefault("backend_fanouts", []).append(
+        {"calls": len(specs), "ms": round((time.perf_counter() - t0) * 1000, 1)}
+    )
+    return results
 
 
 def show_error(user_msg, debug_msg=None):
@@ -228,6 +478,30 @@ def badge_status(status: str) -> str:
     return "👀 CURIOSO"
 
 
+def iter_csv_lines(rows, columns, sep=";", header=True):
+    """
+    PT-BR: Gera o CSV linha a linha (mesmo escape do to_csv), para escrever em partes.
+    ES:    Genera el CSV línea por línea (mismo escape que to_csv), para escribir por partes.
+    EN:    Yields the CSV line by line (same escaping as to_csv), for chunked writing.
+    """
+    if header:
+        yield sep.join(columns) + "\n"
+
+    for r in rows:
+        values = []
+        for c in columns:
+            v = r.get(c, "")
+            if isinstance(v, (dict, list)):
+                v = json.dumps(v, ensure_ascii=False)
+            v = "" if v is None else str(v)
+            v = v.replace("\n", " ").replace("\r", " ")
+            if sep in v or '"' in v:
+                v = v.replace('"', '""')
+                v = f'"{v}"'
+            values.append(v)
+        yield sep.join(values) + "\n"
+
+
 def to_csv(rows, columns=None, sep=";", encoding="utf-8-sig"):
     """
     PT-BR: Serializa lista de dicts para CSV com escape básico de separador/aspas.
@@ -244,24 +518,231 @@ def to_csv(rows, columns=None, sep=";", encoding="utf-8-sig"):
         columns = list(rows[0].keys())
 
     buf = StringIO()
-    buf.write(sep.join(columns) + "\n")
-
-    for r in rows:
-        values = []
-        for c in columns:
-            v = r.get(c, "")
-            if isinstance(v, (dict, list)):
-                v = json.dumps(v, ensure_ascii=False)
-            v = "" if v is None else str(v)
-            v = v.replace("\n", " ").replace("\r", " ")
-            if sep in v or '"' in v:
-                v = v.replace('"', '""')
-                v = f'"{v}"'
-            values.append(v)
-        buf.write(sep.join(values) + "\n")
+    buf.writelines(iter_csv_lines(rows, columns, sep=sep))
     return buf.getvalue()
 
 
+LEAD_EXPORT_COLUMNS = [
+    "id", "nome", "whatsapp", "email", "uf", "cidade", "segmento_interesse", "orcamento_faixa",
+    "prazo_compra", "score", "status", "motivos_resumo", "created_at",
+]
+
+
+def lead_export_row(lead: dict) -> dict:
+    """
+    PT-BR: Linha do CSV de leads (dados reais, sem a decoração da UI).
+    ES:    Fila del CSV de leads (datos reales, sin la decoración de la UI).
+    EN:    Lead CSV row (real data, without UI decoration).
+    """
+    row = {c: lead.get(c) for c in LEAD_EXPORT_COLUMNS}
+    row["motivos_resumo"] = format_motivos(lead.get("score_motivos"))
+    return row
+
+
+def iter_lead_pages(params: dict, page_size: int = EXPORT_PAGE_SIZE, timeout=30):
+    """
+    PT-BR: Percorre /leads/page seguindo next_cursor; gera uma lista de leads por página.
+           Não usa o cache (exportações não devem ocupar o cache das telas).
+    ES:    Recorre /leads/page siguiendo next_cursor; genera una lista de leads por página.
+           No usa la caché (las exportaciones no deben ocupar la caché de las pantallas).
+    EN:    Walks /leads/page following next_cursor; yields one list of leads per page.
+           Bypasses the cache (exports should not fill the screens' cache).
+    """
+    cursor = None
+    while True:
+        page_params = dict(params or {}, page_size=page_size)
+        if cursor:
+            page_params["after"] = cursor
+        r = backend_request("GET", "/leads/page", params=page_params, timeout=timeout)
+        r.raise_for_status()
+        payload = r.json() or {}
+        items = payload.get("items") or []
+        if items:
+            yield items
+        cursor = payload.get("next_cursor")
+        if not cursor:
+            return
+
+
+PARTNER_EXPORT_COLUMNS = [
+    "cnpj", "razao_social", "nome_fantasia", "uf", "municipio_cod", "municipio_nome",
+    "segmento", "prioridade", "cnae_principal",
+]
+
+
+def partner_export_row(partner: dict) -> dict:
+    """
+    PT-BR: Linha do CSV de parceiros (nomes como exibidos na guia Parceiros).
+    ES:    Fila del CSV de socios (nombres como se muestran en la pestaña Parceiros).
+    EN:    Partner CSV row (names as shown on the Parceiros tab).
+    """
+    p = decorate_partner_for_ui(partner)
+    row = {c: p.get(c) for c in PARTNER_EXPORT_COLUMNS}
+    row["razao_social"] = p.get("__ui_razao_social")
+    row["nome_fantasia"] = p.get("__ui_nome_fantasia")
+    return row
+
+
+def iter_partner_pages(params: dict, page_size: int = EXPORT_PAGE_SIZE, timeout=30):
+    """
+    PT-BR: Percorre /partners com limit/offset (ordem estável no backend) até a última página.
+    ES:    Recorre /partners con limit/offset (orden estable en el backend) hasta la última página.
+    EN:    Walks /partners with limit/offset (stable backend order) up to the last page.
+    """
+    offset = 0
+    while True:
+        r = backend_request(
+            "GET", "/partners", params=dict(params or {}, limit=page_size, offset=offset), timeout=timeout
+        )
+        r.raise_for_status()
+        items = r.json() or []
+        if items:
+            yield items
+        if len(items) < page_size:
+            return
+        offset += len(items)
+
+
+def _export_value(v):
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False)
+    return None if v is None else str(v)
+
+
+def sweep_stale_exports(max_age=EXPORT_TTL_SECONDS):
+    """
+    PT-BR: Remove do diretório temporário exportações (leads_/partners_) mais antigas que
+           `max_age` segundos. Retorna quantos arquivos foram apagados.
+    ES:    Elimina del directorio temporal exportaciones (leads_/partners_) más antiguas que
+           `max_age` segundos. Devuelve cuántos archivos se borraron.
+    EN:    Removes exports (leads_/partners_) older than `max_age` seconds from the temp
+           dir. Returns how many files were deleted.
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for prefix in EXPORT_PREFIXES:
+        for suffix, _ in EXPORT_FORMATS.values():
+            for path in Path(tempfile.gettempdir()).glob(f"{prefix}*{suffix}"):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except OSError:
+                    pass
+    return removed
+
+
+def write_export(pages, row_fn, columns, fmt, prefix, sep=";"):
+    """
+    PT-BR: Grava uma exportação num arquivo temporário, página a página (memória limitada
+           a uma página). CSV/CSV gzip usam o mesmo escape do to_csv; Parquet grava colunas
+           texto, um row group por página. Retorna (caminho, linhas).
+    ES:    Escribe una exportación en un archivo temporal, página por página (memoria acotada
+           a una página). CSV/CSV gzip usan el mismo escape que to_csv; Parquet escribe
+           columnas de texto, un row group por página. Devuelve (ruta, filas).
+    EN:    Writes an export to a temp file, page by page (memory bounded to one page).
+           CSV/gzip CSV use the same escaping as to_csv; Parquet writes text columns, one
+           row group per page. Returns (path, rows).
+    """
+    suffix, _ = EXPORT_FORMATS[fmt]
+    sweep_stale_exports()
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+    os.close(fd)
+    rows = 0
+    try:
+        if fmt == "Parquet":
+            schema = pa.schema([(c, pa.string()) for c in columns])
+            with pq.ParquetWriter(path, schema) as writer:
+                for page_items in pages:
+                    out = [row_fn(x) for x in page_items]
+                    writer.write_table(
+                        pa.Table.from_pydict({c: [_export_value(r.get(c)) for r in out] for c in columns}, schema=schema)
+                    )
+                    rows += len(out)
+        else:
+            opener = gzip.open if fmt == "CSV (gzip)" else open
+            with opener(path, "wt", encoding="utf-8-sig", newline="") as fh:
+                fh.write(sep.join(columns) + "\n")
+                for page_items in pages:
+                    fh.writelines(iter_csv_lines((row_fn(x) for x in page_items), columns, sep=sep, header=False))
+                    rows += len(page_items)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, rows
+
+
+def render_export(container, state_key, sig, label, file_stem, build, disabled=False):
+    """
+    PT-BR: Botão "Gerar" + download de uma exportação sob demanda. Nada é gerado nos reruns
+           comuns: `build(formato)` só roda no clique e a sessão guarda apenas o caminho do
+           arquivo. Filtros diferentes (`sig`) descartam a exportação anterior, e o download
+           também a descarta (o arquivo deixa de ser relido a cada rerun).
+    ES:    Botón "Generar" + descarga de una exportación bajo demanda. Nada se genera en los
+           reruns comunes: `build(formato)` solo corre al hacer clic y la sesión guarda solo
+           la ruta del archivo. Filtros distintos (`sig`) descartan la exportación anterior, y
+           la descarga también la descarta (el archivo deja de releerse en cada rerun).
+    EN:    "Generate" button + download for an on-demand export. Nothing is built on regular
+           reruns: `build(format)` only runs on click and the session only keeps the file
+           path. Different filters (`sig`) discard the previous export, and so does the
+           download (the file is no longer re-read on every rerun).
+    """
+    fmt = container.selectbox("Formato", list(EXPORT_FORMATS), key=f"{state_key}_format")
+    sig = json.dumps([sig, fmt], sort_keys=True)
+    export = st.session_state.get(state_key)
+    if export and export.get("sig") != sig:
+        discard_export(state_key)
+        export = None
+
+    if container.button(f"📄 Gerar {fmt} ({label})", key=f"{state_key}_btn", disabled=disabled):
+        discard_export(state_key)
+        try:
+            with st.spinner(f"Gerando {fmt}..."):
+                path, rows = build(fmt)
+            export = {"sig": sig, "path": path, "rows": rows, "fmt": fmt, "at": time.strftime("%H:%M:%S")}
+            st.session_state[state_key] = export
+        except Exception as e:
+            show_error(f"Não foi possível gerar o arquivo ({fmt}) agora.", str(e))
+            export = None
+
+    if export and os.path.exists(export["path"]):
+        suffix, mime = EXPORT_FORMATS[export["fmt"]]
+        with open(export["path"], "rb") as fh:
+            container.download_button(
+                f"⬇️ Baixar {export['fmt']} ({export['rows']} linhas, gerado às {export['at']})",
+                data=fh,
+                file_name=f"{file_stem}{suffix}",
+                mime=mime,
+                key=f"{state_key}_dl",
+                on_click=discard_export,
+                args=(state_key,),
+            )
+
+
+def go_to_leads_page(direction, cursor, page_number):
+    """
+    PT-BR: Callback da paginação de leads: guarda o cursor (after/before) e o número da página.
+    ES:    Callback de la paginación de leads: guarda el cursor (after/before) y el número de página.
+    EN:    Leads pagination callback: stores the cursor (after/before) and page number.
+    """
+    st.session_state["leads_page_cursor"] = {direction: cursor} if direction and cursor else {}
+    st.session_state["leads_page_number"] = max(1, int(page_number))
+
+
+def discard_export(state_key: str):
+    """
+    PT-BR: Remove a exportação guardada na sessão (e o arquivo temporário).
+    ES:    Elimina la exportación guardada en la sesión (y el archivo temporal).
+    EN:    Drops the export kept in the session (and its temp file).
+    """
+    export = st.session_state.pop(state_key, None)
+    if export and export.get("path"):
+        try:
+            os.remove(export["path"])
+        except OSError:
+            pass
+
+
 def kv_table(data: dict, title: str = None):
     """
     PT-BR: Renderiza dict em tabela Campo/Valor para leitura rápida (sem JSON bruto).
@@ -902,9 +1383,37 @@ def kpi(container, title, value):
     )
 
 
+def render_backend_calls_panel():
+    """
+    PT-BR: Painel de debug (sidebar) com as chamadas ao backend feitas neste rerun.
+    ES:    Panel de debug (sidebar) con las llamadas al backend hechas en este rerun.
+    EN:    Debug panel (sidebar) with the backend calls made in this rerun.
+    """
+    calls = st.session_state.get("backend_calls") or []
+    with st.sidebar.expander(f"Chamadas ao backend (debug) — {len(calls)}", expanded=False):
+        if not calls:
+            st.caption("Nenhuma chamada ao backend neste rerun.")
+            return
+        total_ms = sum(c["ms"] for c in calls)
+        st.caption(f"Soma: {total_ms:.0f} ms • mais lenta: {max(c['ms'] for c in calls):.0f} ms")
+        for fanout in st.session_state.get("backend_fanouts") or []:
+            st.caption(f"Em paralelo: {fanout['calls']} chamadas em {fanout['ms']:.0f} ms")
+        if pd is not None:
+            st.dataframe(pd.DataFrame(calls), use_container_width=True, hide_index=True)
+        else:
+            st.table(calls)
+
+
 # =============================================================================
 # SIDEBAR NAV
 # =============================================================================
+# PT-BR: Zera o registro de chamadas ao backend a cada rerun (painel de debug).
+# ES:    Reinicia el registro de llamadas al backend en cada rerun (panel de debug).
+# EN:    Resets the backend call log on every rerun (debug panel).
+st.session_state["backend_calls"] = []
+st.session_state["backend_fanouts"] = []
+st.session_state["rerun_started"] = time.perf_counter()
+
 # PT-BR: Navegação principal do painel via sidebar.
 # ES:    Navegación principal del panel vía sidebar.
 # EN:    Main navigation for the panel via sidebar.
@@ -931,6 +1440,12 @@ with st.sidebar.expander("Configurações", expanded=False):
         key="debug_toggle",
         help="Mostra detalhes técnicos em erros (útil para dev).",
     )
+    if st.button(
+        "Recarregar dados do backend",
+        key="cache_refresh_btn",
+        help=f"Leituras ficam em cache por {CACHE_TTL_SECONDS}s; ações no painel já atualizam os dados.",
+    ):
+        invalidate_cache()
 
     st.markdown("---")
     st.caption("Manutenção: deduplicação de leads")
@@ -999,7 +1514,18 @@ st.caption("Acompanhe leads, priorize atendimento e explore parceiros por UF/seg
 # PAGE: VISÃO GERAL
 # =============================================================================
 if page == "Visão geral":
-    board_payload, board_err = safe_get("/crm/board", params={}, timeout=15)
+    # PT-BR: Dependências da página buscadas juntas (a UF vem do filtro do rerun anterior).
+    # ES:    Dependencias de la página buscadas juntas (la UF viene del filtro del rerun anterior).
+    # EN:    Page dependencies fetched together (UF comes from the previous rerun's filter).
+    overview_uf = st.session_state.get("overview_uf") or ""
+    overview_data = safe_get_many(
+        {
+            "board": ("/crm/board", {}, 15),
+            "ml": ("/ml/model-info", None, 15),
+            "summary": ("/partners/summary", {"uf": overview_uf} if overview_uf else {}, 15),
+        }
+    )
+    board_payload, board_err = overview_data["board"]
     board_items = extract_crm_board_items(board_payload)
 
     # Fallback para /leads se /crm/board indisponivel.
@@ -1031,7 +1557,7 @@ if page == "Visão geral":
     kpi(colE, "Enviado", enviados)
     kpi(colF, "Conversão p/ qualificado", f"{conversao:.1f}%")
 
-    ml_info, ml_err = safe_get("/ml/model-info", timeout=15)
+    ml_info, ml_err = overview_data["ml"]
     winner_txt = "Indisponivel"
     fine_tuning_txt = "Sem dados"
     meta_txt = ""
@@ -1087,7 +1613,7 @@ if page == "Visão geral":
     c1, c2 = st.columns([1, 2])
     uf = c1.selectbox("UF", ["", "MG", "SP", "GO"], key="overview_uf")
 
-    summary, err = safe_get("/partners/summary", params={"uf": uf} if uf else {}, timeout=15)
+    summary, err = overview_data["summary"]
     if err:
         show_error("Não foi possível carregar o resumo de parceiros.", err)
         summary = []
@@ -1154,50 +1680,67 @@ elif page == "Leads":
     left_top, right_top = st.columns([1, 1])
     refresh = left_top.button("🔄 Atualizar lista", key="refresh_leads_btn")
     if refresh:
+        invalidate_cache(("leads",))
         st.toast("Lista atualizada.")
 
-    leads, err = safe_get("/leads", params=params, timeout=15)
+    # PT-BR: Paginação no backend por cursor; filtros/tamanho novos voltam para a 1ª página.
+    # ES:    Paginación en el backend por cursor; filtros/tamaño nuevos vuelven a la 1ª página.
+    # EN:    Backend cursor pagination; new filters/page size go back to the first page.
+    page_size = int(st.session_state.get("leads_page_size") or 50)
+    page_sig = json.dumps([params, page_size], sort_keys=True)
+    if st.session_state.get("leads_page_sig") != page_sig:
+        st.session_state["leads_page_sig"] = page_sig
+        st.session_state["leads_page_cursor"] = {}
+        st.session_state["leads_page_number"] = 1
+    page_number = int(st.session_state.get("leads_page_number") or 1)
+
+    leads_data = safe_get_many(
+        {
+            "page": ("/leads/page", dict(params, page_size=page_size, **st.session_state["leads_page_cursor"]), 15),
+            "count": ("/leads/count", params, 15),
+        }
+    )
+    page_payload, err = leads_data["page"]
     if err:
         show_error("Não foi possível carregar leads agora.", err)
-        leads = []
+        page_payload = {}
+    page_payload = page_payload if isinstance(page_payload, dict) else {}
+    leads = page_payload.get("items") or []
+    count_payload, _ = leads_data["count"]
+    total_leads = int((count_payload or {}).get("total") or 0) if isinstance(count_payload, dict) else 0
+
     leads_ui = [
         decorate_lead_for_ui(l, seed_hint=f"{(l.get('id') or 'lead')}-{idx}", fill_missing_uf=False)
         for idx, l in enumerate(leads)
     ]
     leads_ui_by_id = {x.get("id"): x for x in leads_ui if x.get("id")}
 
-    export_rows = []
-    for l in leads:
-        export_rows.append({
-            "id": l.get("id"),
-            "nome": l.get("nome"),
-            "whatsapp": l.get("whatsapp"),
-            "email": l.get("email"),
-            "uf": l.get("uf"),
-            "cidade": l.get("cidade"),
-            "segmento_interesse": l.get("segmento_interesse"),
-            "orcamento_faixa": l.get("orcamento_faixa"),
-            "prazo_compra": l.get("prazo_compra"),
-            "score": l.get("score"),
-            "status": l.get("status"),
-            "motivos_resumo": format_motivos(l.get("score_motivos")),
-            "created_at": l.get("created_at"),
-        })
-    csv_data = to_csv(export_rows, columns=list(export_rows[0].keys()) if export_rows else None)
-
-    right_top.download_button(
-        "⬇️ Baixar CSV (leads filtrados)",
-        data=csv_data.encode("utf-8-sig") if csv_data else b"",        file_name="leads_filtrados.csv",
-        mime="text/csv",
-        disabled=(len(export_rows) == 0),
-        key="dl_leads_filtered",
+    # PT-BR: Exportação separada da tela: gerada só quando pedida, página a página.
+    # ES:    Exportación separada de la pantalla: se genera solo cuando se pide, página por página.
+    # EN:    Export decoupled from the screen: built only on request, page by page.
+    render_export(
+        right_top,
+        "leads_export",
+        params,
+        "leads filtrados",
+        "leads_filtrados",
+        lambda fmt: write_export(iter_lead_pages(params), lead_export_row, LEAD_EXPORT_COLUMNS, fmt, "leads_"),
+        disabled=(total_leads == 0 and not leads),
     )
 
     if not leads:
         st.info("Nenhum lead encontrado com os filtros atuais.")
+        if page_number > 1:
+            st.button(
+                "⏮️ Voltar ao início",
+                key="leads_page_first_empty",
+                on_click=go_to_leads_page,
+                args=(None, None, 1),
+            )
     else:
+        offset = (page_number - 1) * page_size
         display = []
-        for idx, l in enumerate(leads_ui, start=1):
+        for idx, l in enumerate(leads_ui, start=offset + 1):
             display.append({
                 "N": idx,
                 "Nome": l.get("__ui_nome"),
@@ -1228,6 +1771,40 @@ elif page == "Leads":
         else:
             st.table(display)
 
+        total_pages = max(page_number, math.ceil(total_leads / page_size)) if total_leads else page_number
+        p1, p2, p3, p4, p5 = st.columns([1, 1, 2, 1, 1])
+        p1.button(
+            "⏮️ Início",
+            key="leads_page_first",
+            disabled=page_number <= 1,
+            on_click=go_to_leads_page,
+            args=(None, None, 1),
+        )
+        p2.button(
+            "◀️ Anterior",
+            key="leads_page_prev",
+            disabled=not page_payload.get("prev_cursor"),
+            on_click=go_to_leads_page,
+            args=("before", page_payload.get("prev_cursor"), page_number - 1),
+        )
+        # PT-BR: A contagem é de registros brutos; duplicatas ocultas na página aparecem à parte.
+        # ES:    El conteo es de registros brutos; los duplicados ocultos en la página se muestran aparte.
+        # EN:    The count is of raw records; duplicates hidden on the page are shown separately.
+        raw_count = int(page_payload.get("raw_count") or len(leads))
+        hidden = int(page_payload.get("hidden_duplicates") or 0)
+        p3.caption(
+            f"Página {page_number} de {total_pages} • registros {offset + 1}–{offset + raw_count} de {total_leads}"
+            + (f" • {hidden} duplicado(s) oculto(s)" if hidden else "")
+        )
+        p4.button(
+            "Próxima ▶️",
+            key="leads_page_next",
+            disabled=not page_payload.get("next_cursor"),
+            on_click=go_to_leads_page,
+            args=("after", page_payload.get("next_cursor"), page_number + 1),
+        )
+        p5.selectbox("Por página", [25, 50, 100, 200], index=1, key="leads_page_size", label_visibility="collapsed")
+
         st.markdown("#### Exclusão de registros")
         bulk_delete_options = []
         for l in leads_ui:
@@ -2089,9 +2666,16 @@ elif page == "Parceiros":
     topA, topB, topC = st.columns([1, 1, 2])
     refresh = topB.button("🔄 Atualizar", key="refresh_partners")
     if refresh:
+        invalidate_cache(("partners",))
         st.toast("Atualizado." )
 
-    partners, err = safe_get("/partners", params=params, timeout=15)
+    partners_data = safe_get_many(
+        {
+            "partners": ("/partners", params, 15),
+            "summary": ("/partners/summary", {"uf": uf} if uf else {}, 15),
+        }
+    )
+    partners, err = partners_data["partners"]
     if err:
         show_error("Não foi possível carregar parceiros agora.", err)
         partners = []
@@ -2099,33 +2683,22 @@ elif page == "Parceiros":
     partners_ui = [decorate_partner_for_ui(p) for p in (partners or [])]
     partners_ui = sorted(partners_ui, key=partner_sort_key)
 
-    export_rows = []
-    for p in partners_ui:
-        export_rows.append({
-            "cnpj": p.get("cnpj"),
-            "razao_social": p.get("__ui_razao_social"),
-            "nome_fantasia": p.get("__ui_nome_fantasia"),
-            "uf": p.get("uf"),
-            "municipio_cod": p.get("municipio_cod"),
-            "municipio_nome": p.get("municipio_nome"),
-            "segmento": p.get("segmento"),
-            "prioridade": p.get("prioridade"),
-            "cnae_principal": p.get("cnae_principal"),
-        })
-    csv_data = to_csv(export_rows, columns=list(export_rows[0].keys()) if export_rows else None)
-
-    topA.download_button(
-        "⬇️ Baixar CSV (parceiros filtrados)",
-        data=csv_data.encode("utf-8-sig") if csv_data else b"",        file_name="partners_filtrados.csv",
-        mime="text/csv",
-        disabled=(len(export_rows) == 0),
-        key="dl_partners_filtered",
+    render_export(
+        topA,
+        "partners_export",
+        params,
+        "parceiros filtrados",
+        "partners_filtrados",
+        lambda fmt: write_export(
+            iter_partner_pages(params), partner_export_row, PARTNER_EXPORT_COLUMNS, fmt, "partners_"
+        ),
+        disabled=not partners_ui,
     )
     topC.caption("Dica: exporte para usar como lista de prospecção (priorize prioridade 1/2)." )
 
     st.divider()
 
-    summary, err2 = safe_get("/partners/summary", params={"uf": uf} if uf else {}, timeout=15)
+    summary, err2 = partners_data["summary"]
     if err2:
         summary = []
 
@@ -3028,3 +3601,12 @@ else:
         - Mostrar motivos do score (explicabilidade)
         """
     )
+
+# =============================================================================
+# DEBUG: CHAMADAS AO BACKEND
+# =============================================================================
+# PT-BR: Renderizado por último para incluir todas as chamadas da página atual.
+# ES:    Se renderiza al final para incluir todas las llamadas de la página actual.
+# EN:    Rendered last so it includes every call made by the current page.
+if st.session_state.get("debug_mode"):
+    render_backend_calls_panel()